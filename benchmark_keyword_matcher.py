@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Keyword Matcher Micro-benchmark
+
+Compares the compiled single-pass matcher used by
+extract_confidence_from_response / parse_violation_type against the
+original per-phrase `in` scans, on recorded Gemini responses. Outputs are
+checked to be identical before timing.
+
+Usage:
+    python benchmark_keyword_matcher.py [--responses PATH] [--cassette PATH] [--repeat N]
+"""
+
+import argparse
+import json
+import sqlite3
+import timeit
+from typing import List
+
+from tools.fake_gemini import DEFAULT_RESPONSES_PATH
+from tools.keyword_matcher import KeywordMatcher, ahocorasick
+from tools.response_parsing import (
+    extract_confidence_from_response,
+    parse_violation_type,
+    CONFIDENCE_LEVELS,
+    VIOLATION_KEYWORDS,
+    VIOLATION_MATCHER
+)
+
+def legacy_extract_confidence(response_text: str) -> float:
+    """Original implementation: one substring scan per phrase."""
+    if not response_text:
+        return 0.0
+    response_upper = response_text.upper()
+    high_confidence = ["CLEARLY", "DEFINITELY", "CERTAINLY", "OBVIOUSLY", "UNDOUBTEDLY", "WITHOUT DOUBT", "CONFIRMED", "IDENTIFIED"]
+    medium_high = ["YES", "VIOLATION", "DETECTED", "FOUND", "PRESENT", "SHOWS", "CONTAINS", "DISPLAYS"]
+    medium = ["LIKELY", "PROBABLY", "APPEARS", "SEEMS", "INDICATES", "SUGGESTS", "MIGHT BE"]
+    medium_low = ["UNCERTAIN", "NOT CLEARLY", "MAYBE", "POSSIBLY", "MIGHT", "COULD BE", "UNSURE"]
+    low_confidence = ["NO", "NOT DETECTED", "CLEAN", "SAFE", "NONE FOUND", "ABSENT", "NOT PRESENT"]
+    high_count = sum(1 for phrase in high_confidence if phrase in response_upper)
+    medium_high_count = sum(1 for phrase in medium_high if phrase in response_upper)
+    medium_count = sum(1 for phrase in medium if phrase in response_upper)
+    medium_low_count = sum(1 for phrase in medium_low if phrase in response_upper)
+    low_count = sum(1 for phrase in low_confidence if phrase in response_upper)
+    if high_count > 0:
+        return 0.9
+    elif medium_high_count > 0:
+        return 0.8
+    elif medium_count > 0:
+        return 0.6
+    elif medium_low_count > 0:
+        return 0.4
+    elif low_count > 0:
+        return 0.1
+    return 0.5
+
+def legacy_parse_violation_type(response_text: str) -> List[str]:
+    """Original implementation: one substring scan per keyword."""
+    violations = []
+    if not response_text:
+        return violations
+    response_upper = response_text.upper()
+    if any(word in response_upper for word in ["BLOOD", "WOUND", "GORE", "INJURY"]):
+        violations.append("blood/gore")
+    if any(word in response_upper for word in ["WEAPON", "GUN", "KNIFE", "EXPLOSIVE"]):
+        violations.append("weapons")
+    if any(word in response_upper for word in ["CORPSE", "DEAD", "HANGING", "AUTOPSY"]):
+        violations.append("death/corpses")
+    if any(word in response_upper for word in ["SELF-HARM", "CUTTING", "BURNING", "SUICIDAL"]):
+        violations.append("self-harm")
+    if any(word in response_upper for word in ["ABUSE", "TORTURE", "CRUELTY"]):
+        violations.append("abuse/torture")
+    if any(word in response_upper for word in ["DRUG", "PARAPHERNALIA", "SYRINGE", "PIPE"]):
+        violations.append("drugs/paraphernalia")
+    if any(word in response_upper for word in ["ALCOHOL", "BEER", "WINE", "LIQUOR"]):
+        violations.append("alcohol")
+    if any(word in response_upper for word in ["SMOKING", "CIGARETTE", "TOBACCO", "VAPE"]):
+        violations.append("smoking")
+    if any(word in response_upper for word in ["HATE", "SYMBOL", "EXTREMIST", "RACIST"]):
+        violations.append("hate symbols")
+    if any(word in response_upper for word in ["PII", "PERSONAL", "IDENTIFIABLE", "PRIVATE"]):
+        violations.append("personal information")
+    if any(word in response_upper for word in ["THREAT", "ABUSIVE", "HARASSMENT"]):
+        violations.append("threatening/abusive text")
+    if any(word in response_upper for word in ["QR", "CODE", "BARCODE"]):
+        violations.append("qr codes")
+    return violations
+
+def load_responses(responses_path: str, cassette_path: str | None = None) -> List[str]:
+    """Recorded response texts from the fixture JSON and, optionally, a Gemini cassette."""
+    with open(responses_path, "r") as f:
+        texts = [text for options in json.load(f).values() for text in options]
+    if cassette_path:
+        with sqlite3.connect(cassette_path) as conn:
+            texts.extend(row[0] for row in conn.execute("SELECT response_text FROM responses"))
+    return texts
+
+def check_identical(texts: List[str]) -> int:
+    """Assert both implementations agree; returns the number of texts checked."""
+    for text in texts:
+        assert extract_confidence_from_response(text) == legacy_extract_confidence(text), text
+        assert parse_violation_type(text) == legacy_parse_violation_type(text), text
+    return len(texts)
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmark for confidence/violation keyword parsing")
+    parser.add_argument("--responses", default=DEFAULT_RESPONSES_PATH, help="Recorded responses JSON")
+    parser.add_argument("--cassette", help="Optional Gemini cassette (SQLite) with more recorded responses")
+    parser.add_argument("--repeat", type=int, default=2000, help="Passes over the response set")
+    args = parser.parse_args()
+
+    texts = load_responses(args.responses, args.cassette)
+    checked = check_identical(texts)
+    print(f"✅ Identical outputs on {checked} recorded responses")
+
+    def run_legacy():
+        for text in texts:
+            legacy_extract_confidence(text)
+            legacy_parse_violation_type(text)
+
+    def run_compiled():
+        for text in texts:
+            extract_confidence_from_response(text)
+            parse_violation_type(text)
+
+    calls = len(texts) * args.repeat
+    legacy_seconds = min(timeit.repeat(run_legacy, number=args.repeat, repeat=3))
+    compiled_seconds = min(timeit.repeat(run_compiled, number=args.repeat, repeat=3))
+
+    print("\n⏱️ KEYWORD PARSING (confidence + violation types per response)")
+    print(f"   Legacy scans          : {legacy_seconds / calls * 1e6:8.2f} µs/response")
+    print(f"   Compiled ({VIOLATION_MATCHER.backend:<9})  : {compiled_seconds / calls * 1e6:8.2f} µs/response")
+    print(f"   Speedup               : {legacy_seconds / compiled_seconds:8.2f}x")
+
+    # Matcher-only timings per available backend
+    backends = ["automaton", "regex", "scan"] if ahocorasick is not None else ["regex", "scan"]
+    uppers = [text.upper() for text in texts]
+    print("\n🧩 Matcher backends (both tables, pre-uppercased text)")
+    for backend in backends:
+        confidence = KeywordMatcher(CONFIDENCE_LEVELS, backend=backend)
+        violation = KeywordMatcher(VIOLATION_KEYWORDS, backend=backend)
+
+        def run_backend():
+            for text in uppers:
+                confidence.match(text)
+                violation.match(text)
+
+        seconds = min(timeit.repeat(run_backend, number=args.repeat, repeat=3))
+        print(f"   {backend:<10}: {seconds / calls * 1e6:8.2f} µs/response")
+
+if __name__ == "__main__":
+    main()
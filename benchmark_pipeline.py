@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+"""
+Offline Pipeline Benchmark
+
+Runs the central moderation pipeline against a local Gemini stand-in
+(tools/fake_gemini.py) that replays recorded responses with a configurable
+latency distribution and error rate. No network access or API quota is used.
+
+Reports throughput, p50/p95/p99 per-image latency, CPU time and peak memory
+for each execution mode.
+
+Usage:
+    python benchmark_pipeline.py [--synthetic N] [--modes serial sequential threads packed]
+                                 [--workers W] [--latency SPEC] [--error-rate R] [--pack-size K]
+
+Example:
+    python benchmark_pipeline.py --synthetic 100 --latency lognormal:1200:0.4 --error-rate 0.02
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import resource
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Any
+
+from PIL import Image, ImageDraw
+
+from tools import gemini_vision
+from tools.central_moderation_pipeline import run_central_moderation_pipeline, run_central_moderation_batch
+from tools.fake_gemini import FakeGeminiModel, DEFAULT_RESPONSES_PATH
+from tools.gemini_files import LocalFilesBackend, UploadedFileStore
+from tools.gemini_context_cache import LocalContextCacheBackend, PromptCache
+from tools.gemini_packing import PACK_SIZE
+from tools.adaptive_limiter import AdaptiveLimiter
+from tools.request_hedging import Hedger, HEDGE_BUDGET
+
+TEST_IMAGES_DIR = "data/test_images"
+# Images per Gemini request in the packed mode (--pack-size)
+pack_size = PACK_SIZE
+IMAGE_EXTS = ('.png', '.jpg', '.jpeg')
+
+def percentile(values: List[float], p: float) -> float:
+    """Linear-interpolated percentile (p in 0..100)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * p / 100.0
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+def make_synthetic_images(count: int, out_dir: str, seed: int = 0) -> List[str]:
+    """Generate random shape/text images of mixed sizes and formats."""
+    rng = random.Random(seed)
+    os.makedirs(out_dir, exist_ok=True)
+    paths = []
+    for i in range(count):
+        size = (rng.randint(256, 2048), rng.randint(256, 2048))
+        background = tuple(rng.randint(0, 255) for _ in range(3))
+        img = Image.new("RGB", size, background)
+        draw = ImageDraw.Draw(img)
+        for _ in range(rng.randint(3, 12)):
+            x0, y0 = rng.randint(0, size[0] - 1), rng.randint(0, size[1] - 1)
+            x1, y1 = rng.randint(x0, size[0]), rng.randint(y0, size[1])
+            color = tuple(rng.randint(0, 255) for _ in range(3))
+            if rng.random() < 0.5:
+                draw.rectangle([x0, y0, x1, y1], fill=color)
+            else:
+                draw.ellipse([x0, y0, x1, y1], fill=color)
+        if rng.random() < 0.3:
+            draw.text((10, 10), f"Synthetic sample {i} +91 98765 43210", fill=(0, 0, 0))
+        ext = ".png" if rng.random() < 0.3 else ".jpg"
+        path = os.path.join(out_dir, f"synthetic_{i:05d}{ext}")
+        img.save(path)
+        paths.append(path)
+    return paths
+
+def stage_test_images(out_dir: str) -> List[str]:
+    """Copy the bundled test images so ingestion never overwrites the originals."""
+    os.makedirs(out_dir, exist_ok=True)
+    paths = []
+    for name in sorted(os.listdir(TEST_IMAGES_DIR)):
+        if name.lower().endswith(IMAGE_EXTS):
+            target = os.path.join(out_dir, name)
+            shutil.copyfile(os.path.join(TEST_IMAGES_DIR, name), target)
+            paths.append(target)
+    return paths
+
+class PeakRssSampler:
+    """Samples resident memory in a background thread to get a per-mode peak."""
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.peak_bytes = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    @staticmethod
+    def current_rss() -> int:
+        try:
+            with open("/proc/self/statm") as f:
+                return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+        except (OSError, ValueError):
+            # ru_maxrss is the lifetime peak (KB on Linux), best available fallback
+            return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak_bytes = max(self.peak_bytes, self.current_rss())
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self.peak_bytes = self.current_rss()
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak_bytes = max(self.peak_bytes, self.current_rss())
+
+def _timed_run(image_path: str, agent_workers: int | None = None) -> Dict[str, Any]:
+    start = time.perf_counter()
+    report = run_central_moderation_pipeline(image_path, max_workers=agent_workers)
+    return {
+        "latency": time.perf_counter() - start,
+        "status": report.get("status"),
+        "decision": report.get("final_decision"),
+    }
+
+def _run_serial(image_paths: List[str], workers: int) -> List[Dict[str, Any]]:
+    # One image at a time, one agent at a time (the original pipeline behaviour)
+    return [_timed_run(path, agent_workers=1) for path in image_paths]
+
+def _run_sequential(image_paths: List[str], workers: int) -> List[Dict[str, Any]]:
+    # One image at a time, independent agents in parallel
+    return [_timed_run(path) for path in image_paths]
+
+def _run_threads(image_paths: List[str], workers: int) -> List[Dict[str, Any]]:
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(_timed_run, image_paths))
+
+def _run_packed(image_paths: List[str], workers: int) -> List[Dict[str, Any]]:
+    # Offline batch mode: chunks of workers * pack_size images, Gemini requests
+    # packed; every image in a chunk waits for the whole chunk
+    chunk_size = workers * pack_size
+    runs = []
+    for i in range(0, len(image_paths), chunk_size):
+        start = time.perf_counter()
+        reports = run_central_moderation_batch(image_paths[i:i + chunk_size], pack_size)
+        latency = time.perf_counter() - start
+        runs += [{"latency": latency, "status": r.get("status"), "decision": r.get("final_decision")} for r in reports]
+    return runs
+
+# Execution mode name -> runner(image_paths, workers)
+EXECUTION_MODES = {
+    "serial": _run_serial,
+    "sequential": _run_sequential,
+    "threads": _run_threads,
+    "packed": _run_packed,
+}
+
+def benchmark_mode(mode: str, image_paths: List[str], workers: int) -> Dict[str, Any]:
+    runner = EXECUTION_MODES[mode]
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+    # The pipeline prints progress for every agent; keep benchmark output readable.
+    # stdout is redirected once per mode since redirect_stdout is process-wide.
+    with PeakRssSampler() as sampler, contextlib.redirect_stdout(io.StringIO()):
+        runs = runner(image_paths, workers)
+    wall = time.perf_counter() - wall_start
+    cpu = time.process_time() - cpu_start
+
+    latencies = [r["latency"] for r in runs]
+    decisions: Dict[str, int] = {}
+    for r in runs:
+        decisions[r["decision"]] = decisions.get(r["decision"], 0) + 1
+
+    return {
+        "mode": mode,
+        "images": len(runs),
+        "errors": sum(1 for r in runs if r["status"] != "success"),
+        "wall_seconds": round(wall, 3),
+        "throughput_ips": round(len(runs) / wall, 3) if wall > 0 else 0.0,
+        "p50_seconds": round(percentile(latencies, 50), 3),
+        "p95_seconds": round(percentile(latencies, 95), 3),
+        "p99_seconds": round(percentile(latencies, 99), 3),
+        "cpu_seconds": round(cpu, 3),
+        "peak_rss_mb": round(sampler.peak_bytes / (1024 * 1024), 1),
+        "decisions": decisions,
+    }
+
+def print_results(results: List[Dict[str, Any]]) -> None:
+    print("\n" + "="*100)
+    print("⏱️ PIPELINE BENCHMARK RESULTS")
+    print("="*100)
+    print(f"{'Mode':<12}{'Images':>8}{'Errors':>8}{'Img/s':>10}{'p50 s':>10}{'p95 s':>10}{'p99 s':>10}{'CPU s':>10}{'Peak MB':>10}")
+    print("-"*100)
+    for r in results:
+        print(f"{r['mode']:<12}{r['images']:>8}{r['errors']:>8}{r['throughput_ips']:>10.2f}"
+              f"{r['p50_seconds']:>10.3f}{r['p95_seconds']:>10.3f}{r['p99_seconds']:>10.3f}"
+              f"{r['cpu_seconds']:>10.2f}{r['peak_rss_mb']:>10.1f}")
+    print("="*100)
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmark for the central moderation pipeline")
+    parser.add_argument("--synthetic", type=int, default=20, help="Number of synthetic images to add")
+    parser.add_argument("--modes", nargs="+", default=["serial", "sequential", "threads"], choices=sorted(EXECUTION_MODES))
+    parser.add_argument("--workers", type=int, default=4, help="Worker count for parallel modes")
+    parser.add_argument("--latency", default="lognormal:1200:0.4", help="Fake Gemini latency spec (ms)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of fake Gemini calls that fail")
+    parser.add_argument("--responses", default=DEFAULT_RESPONSES_PATH, help="Recorded responses JSON")
+    parser.add_argument("--upload-mode", choices=["inline", "local"], default="inline",
+                        help="Send images inline, or upload once to the local Files API stand-in")
+    parser.add_argument("--prompt-cache", action="store_true",
+                        help="Serve static prompts from the local context-cache stand-in")
+    parser.add_argument("--quota", type=int, default=None,
+                        help="Fake Gemini rejects requests beyond this many in flight with 429")
+    parser.add_argument("--adaptive", action="store_true",
+                        help="Govern Gemini calls with the adaptive concurrency limiter")
+    parser.add_argument("--hedge", type=float, default=None, metavar="PERCENTILE",
+                        help="Hedge Gemini calls slower than this percentile of recent latency")
+    parser.add_argument("--hedge-budget", type=float, default=HEDGE_BUDGET,
+                        help="Maximum fraction of calls that may be hedged")
+    parser.add_argument("--pack-size", type=int, default=PACK_SIZE, help="Images per Gemini request in the packed mode")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", dest="json_path", help="Write results as JSON to this path")
+    args = parser.parse_args()
+    global pack_size
+    pack_size = args.pack_size
+
+    fake = FakeGeminiModel.from_file(args.responses, latency=args.latency, error_rate=args.error_rate,
+                                     seed=args.seed, max_concurrency=args.quota)
+    previous_model = gemini_vision.set_model(fake)
+    file_store = UploadedFileStore(LocalFilesBackend()) if args.upload_mode == "local" else None
+    previous_file_store = gemini_vision.use_file_store(file_store)
+    prompt_cache = PromptCache(LocalContextCacheBackend()) if args.prompt_cache else None
+    previous_prompt_cache = gemini_vision.use_prompt_cache(prompt_cache)
+    limiter = AdaptiveLimiter() if args.adaptive else None
+    previous_limiter = gemini_vision.use_limiter(limiter)
+    hedger = Hedger(args.hedge, args.hedge_budget) if args.hedge else None
+    previous_hedger = gemini_vision.use_hedger(hedger)
+
+    # "/data/" in the path makes ingestion write to a sibling "/output/" dir
+    workspace = tempfile.mkdtemp(prefix="moderation_bench_")
+    try:
+        image_paths = stage_test_images(os.path.join(workspace, "data", "test_images"))
+        image_paths += make_synthetic_images(args.synthetic, os.path.join(workspace, "data", "synthetic"), args.seed)
+        print(f"🖼️ Benchmarking {len(image_paths)} images (latency={args.latency}, error_rate={args.error_rate})")
+
+        results = []
+        for mode in args.modes:
+            print(f"🔄 Running mode: {mode}")
+            results.append(benchmark_mode(mode, image_paths, args.workers))
+
+        print_results(results)
+        print(f"🤖 Fake Gemini calls: {fake.calls} (injected errors: {fake.errors})")
+        if fake.calls:
+            print(f"📦 Average upload payload: {fake.bytes_received / fake.calls / 1024:.1f} KB per call")
+            print(f"📝 Average prompt text sent: {fake.prompt_chars / fake.calls:.0f} chars per call")
+        if limiter is not None:
+            metrics = limiter.metrics()
+            print(f"🎚️ Adaptive limit: {metrics['limit']} (peak in flight {metrics['peak_in_flight']}, "
+                  f"throttled {metrics['throttled']}, decreases {metrics['decreases']}, "
+                  f"waited {metrics['waited_seconds']:.1f}s)")
+        if hedger is not None:
+            metrics = hedger.metrics()
+            print(f"🪞 Hedged {metrics['hedged']} of {metrics['calls']} calls (rate {metrics['hedge_rate']:.1%}, "
+                  f"hedge won {metrics['hedge_wins']})")
+        if file_store is not None:
+            stats = file_store.stats()
+            print(f"📤 File uploads: {stats['uploads']} ({stats['bytes_uploaded'] / 1024:.1f} KB), reused {stats['hits']} times")
+        sent = fake.bytes_received + (file_store.bytes_uploaded if file_store is not None else 0)
+        print(f"📶 Image bytes sent per image: {sent / (len(image_paths) * len(args.modes)) / 1024:.1f} KB")
+
+        if args.json_path:
+            with open(args.json_path, "w") as f:
+                json.dump(results, f, indent=2)
+            print(f"📄 Results exported to: {args.json_path}")
+    finally:
+        gemini_vision.set_model(previous_model)
+        gemini_vision.use_file_store(previous_file_store)
+        gemini_vision.use_prompt_cache(previous_prompt_cache)
+        gemini_vision.use_limiter(previous_limiter)
+        gemini_vision.use_hedger(previous_hedger)
+        if file_store is not None:
+            file_store.close()
+        shutil.rmtree(workspace, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Report Size Benchmark
+
+Runs the central pipeline (with the offline Gemini stand-in) over the test
+images plus synthetic images and compares the serialized size of compact
+and verbose reports: pretty JSON as written by export_json_report, minified
+JSON lines as used for bulk storage, and gzip of the JSONL.
+
+Usage:
+    python benchmark_report_size.py [--synthetic N] [--responses PATH]
+"""
+
+import argparse
+import contextlib
+import gzip
+import io
+import json
+import os
+import shutil
+import tempfile
+
+from benchmark_pipeline import make_synthetic_images, stage_test_images
+from tools import gemini_vision
+from tools.central_moderation_pipeline import run_central_moderation_pipeline
+from tools.fake_gemini import FakeGeminiModel, DEFAULT_RESPONSES_PATH
+from tools.report_format import compact_report, expand_report
+
+def measure(reports):
+    pretty = sum(len(json.dumps(r, indent=2, default=str).encode("utf-8")) for r in reports)
+    jsonl = "".join(json.dumps(r, separators=(",", ":"), default=str) + "\n" for r in reports).encode("utf-8")
+    return {"pretty_bytes": pretty, "jsonl_bytes": len(jsonl), "gzip_bytes": len(gzip.compress(jsonl))}
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare compact and verbose report sizes")
+    parser.add_argument("--synthetic", type=int, default=10, help="Number of synthetic images to add")
+    parser.add_argument("--responses", default=DEFAULT_RESPONSES_PATH, help="Recorded responses JSON")
+    parser.add_argument("--json", dest="json_path", help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    previous_model = gemini_vision.set_model(FakeGeminiModel.from_file(args.responses))
+    workspace = tempfile.mkdtemp(prefix="moderation_report_size_")
+    try:
+        image_paths = stage_test_images(os.path.join(workspace, "data", "test_images"))
+        image_paths += make_synthetic_images(args.synthetic, os.path.join(workspace, "data", "synthetic"))
+        print(f"🖼️ Building reports for {len(image_paths)} images")
+        with contextlib.redirect_stdout(io.StringIO()):
+            reports = [run_central_moderation_pipeline(path) for path in image_paths]
+    finally:
+        gemini_vision.set_model(previous_model)
+        shutil.rmtree(workspace, ignore_errors=True)
+
+    results = {
+        "compact": measure([compact_report(r) for r in reports]),
+        "verbose": measure([expand_report(r) for r in reports]),
+    }
+
+    count = len(reports)
+    print("\n" + "="*72)
+    print("📦 REPORT SIZE PER IMAGE (bytes)")
+    print("="*72)
+    print(f"{'View':<10}{'Pretty JSON':>16}{'JSONL':>16}{'JSONL gzip':>16}")
+    print("-"*72)
+    for view, sizes in results.items():
+        print(f"{view:<10}{sizes['pretty_bytes'] / count:>16.0f}{sizes['jsonl_bytes'] / count:>16.0f}{sizes['gzip_bytes'] / count:>16.0f}")
+    print("-"*72)
+    ratio = results["verbose"]["jsonl_bytes"] / results["compact"]["jsonl_bytes"]
+    print(f"Verbose/compact JSONL ratio: {ratio:.1f}x")
+    print("="*72)
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump({"images": count, **results}, f, indent=2)
+        print(f"📄 Results exported to: {args.json_path}")
+
+if __name__ == "__main__":
+    main()
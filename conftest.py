@@ -0,0 +1,36 @@
+import pytest
+
+from tools import gemini_vision
+
+# Module-level Gemini settings a test may swap, with the setter that installs each
+GEMINI_SETTINGS = {
+    "model": gemini_vision.set_model,
+    "cassette": gemini_vision.use_cassette,
+    "request_collector": gemini_vision.use_request_collector,
+    "file_store": gemini_vision.use_file_store,
+    "prompt_cache": gemini_vision.use_prompt_cache,
+    "limiter": gemini_vision.use_limiter,
+    "scheduler": gemini_vision.use_scheduler,
+    "hedger": gemini_vision.use_hedger,
+}
+
+@pytest.fixture
+def use_model():
+    """
+    Install a Gemini model without a cassette or request collector:
+    `use_model(FakeGeminiModel(...))` returns the model. May be called
+    several times. The test may also install a file store, prompt cache,
+    limiter, scheduler or hedger through gemini_vision's use_* setters; all
+    of them are restored when the test ends, whether or not it passed.
+    """
+    previous = {name: getattr(gemini_vision, name) for name in GEMINI_SETTINGS}
+
+    def install(model):
+        gemini_vision.set_model(model)
+        gemini_vision.use_cassette(None)
+        gemini_vision.use_request_collector(None)
+        return model
+
+    yield install
+    for name, setter in GEMINI_SETTINGS.items():
+        setter(previous[name])
@@ -10,15 +10,16 @@ Usage:
     
 Example:
     python demo_central_pipeline.py data/test_images/blood.jpg
+    python demo_central_pipeline.py clip.mp4    # GIF/WebP/video: keyframes, one report
 """
 
 import sys
 import os
 from tools.central_moderation_pipeline import (
-    run_central_moderation_pipeline,
     print_moderation_report,
     export_json_report
 )
+from tools.frame_moderation import run_frame_moderation
 
 def main():
     """Run the central moderation pipeline demo."""
@@ -50,11 +51,13 @@ def main():
     print("   🧪 Drugs → 🍾 Alcohol/Smoking → ☠️ Hate → 🔐 PII → 📷 QR")
     print()
     
-    # Run the pipeline
-    report = run_central_moderation_pipeline(image_path)
+    # Run the pipeline (on each keyframe for animations and videos)
+    report = run_frame_moderation(image_path)
     
     # Print the comprehensive report
     print_moderation_report(report)
+    for frame in report.get("frames", []):
+        print(f"   🎞️ {frame['timestamp']:7.2f}s: {frame['final_decision']} {', '.join(frame['violations'])}")
     
     # Export JSON report
     json_filename = f"central_pipeline_report_{os.path.basename(image_path).split('.')[0]}.json"
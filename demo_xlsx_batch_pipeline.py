@@ -1,15 +1,26 @@
+import argparse
+import csv
+import functools
 import os
 import sys
-import requests
-import tempfile
-import pandas as pd
-from tools.central_moderation_pipeline import run_central_moderation_pipeline, print_moderation_report
+from collections import OrderedDict
+from tools.central_moderation_pipeline import run_central_moderation_pipeline, run_central_moderation_batch, print_moderation_report
+from tools.input_readers import iter_rows, count_rows, shard_bounds, parse_shard
+from tools.priority_scheduler import lane_scope
+from tools.image_fetch import DEFAULT_CACHE_PATH, ImageFetcher, fetch_image, normalize_url, remove_download, use_fetcher
 import time
 
-# Path to the Excel file and sheet name
+# Path to the input sheet (Excel, CSV or JSONL) and sheet name
 EXCEL_PATH = r"data/test_images/dateSetContentMod.xlsx"
 SHEET_NAME = "indiamart images (rejected)"
-OUTPUT_PATH = r"data/test_images/dateSetContentMod_results.xlsx"
+# Results are appended row by row and only recent verdicts are kept, so memory is bounded for any sheet size
+OUTPUT_PATH = r"data/test_images/dateSetContentMod_results.csv"
+# With --pack-size K, this many packs' worth of images are moderated together
+PACKS_PER_CHUNK = 8
+# Batch-prediction job files are written here (--batch-job)
+JOB_DIR = r"data/batch_jobs"
+# Verdicts kept for repeated rows, least recently used URLs first out
+VERDICT_CACHE_SIZE = 100_000
 
 # Define all possible violation types (flags)
 VIOLATION_FLAGS = [
@@ -17,89 +28,184 @@ VIOLATION_FLAGS = [
     "hate", "pii_text", "qr_code"
 ]
 
-# Helper to download image if URL, else return local path
-def get_local_image_path(image_url):
-    if image_url.startswith('http://') or image_url.startswith('https://'):
-        response = requests.get(image_url, stream=True)
-        if response.status_code == 200:
-            tmp = tempfile.NamedTemporaryFile(delete=False, suffix='.jpg')
-            for chunk in response.iter_content(1024):
-                tmp.write(chunk)
-            tmp.close()
-            return tmp.name
-        else:
-            print(f"Failed to download image: {image_url}")
-            return None
-    else:
-        return image_url if os.path.exists(image_url) else None
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Run the central moderation pipeline over an input sheet")
+    parser.add_argument("--input", default=EXCEL_PATH, help="Excel (.xlsx), CSV or JSONL file with an image_url column")
+    parser.add_argument("--sheet", default=SHEET_NAME, help="Excel sheet name")
+    parser.add_argument("--output", default=OUTPUT_PATH, help="CSV file the results are appended to")
+    parser.add_argument("--store", help="Optional Parquet/Arrow result store (tools/result_store.py)")
+    parser.add_argument("--shard", help="Process shard i of n by row index range, e.g. 0/4")
+    parser.add_argument("--start", type=int, default=0, help="First row index to process")
+    parser.add_argument("--stop", type=int, default=None, help="Stop before this row index")
+    parser.add_argument("--pack-size", type=int, default=1,
+                        help="Send up to this many images per Gemini request (offline batch mode, tools/gemini_packing.py)")
+    parser.add_argument("--batch-job", choices=["gemini", "local"],
+                        help="Resolve Gemini requests with batch-prediction jobs (tools/gemini_batch_jobs.py); "
+                             "'local' runs the jobs in-process")
+    parser.add_argument("--job-size", type=int, default=1000, help="Images per batch-prediction job")
+    parser.add_argument("--job-dir", default=JOB_DIR, help="Directory for batch job input/output files")
+    parser.add_argument("--lane", default="backfill",
+                        help="Priority lane for the Gemini calls when GEMINI_PRIORITY_LANES=on (tools/priority_scheduler.py)")
+    parser.add_argument("--fetch-cache", default=DEFAULT_CACHE_PATH,
+                        help="Fetch cache database: conditional re-fetches and remembered dead URLs (tools/image_fetch.py); "
+                             "'off' to disable")
+    args = parser.parse_args(argv)
+    if args.batch_job and args.pack_size > 1:
+        # Batch-job requests are sent one image each; packing would be silently skipped
+        parser.error("--pack-size cannot be combined with --batch-job")
+    return args
 
-def main():
-    # Read Excel
-    df = pd.read_excel(EXCEL_PATH, sheet_name=SHEET_NAME)
-    df = df.reset_index(drop=True)
-    # Ensure the column exists
-    if 'image_url' not in df.columns:
-        print("No 'image_url' column found!")
-        return
-    # Prepare output column
-    if 'CM_ADK Decision' not in df.columns:
-        df['CM_ADK Decision'] = ''
+def main(argv=None):
+    args = parse_args(argv)
+    sheet_name = args.sheet if args.input.lower().endswith((".xlsx", ".xlsm")) else None
+    start, stop = args.start, args.stop
+    output_path = args.output
+    if args.shard:
+        shard_index, num_shards = parse_shard(args.shard)
+        start, stop = shard_bounds(count_rows(args.input, sheet_name), shard_index, num_shards)
+        # One output file per shard so workers never write to the same file
+        root, ext = os.path.splitext(output_path)
+        output_path = f"{root}.shard{shard_index}of{num_shards}{ext}"
+        print(f"Shard {shard_index}/{num_shards}: rows {start}..{stop - 1}")
+
+    fetcher = ImageFetcher(None if args.fetch_cache == "off" else args.fetch_cache)
+    previous_fetcher = use_fetcher(fetcher)
+
+    store = None
+    try:
+        if args.store:
+            from tools.result_store import ResultStore
+            store = ResultStore(args.store)
+
+        total_images = 0
+        duplicate_rows = 0
+        total_time_taken = 0.0
+        per_image_times = []
+        batch_start_time = time.time()
+        # With --pack-size or --batch-job, images are moderated in chunks so their
+        # Gemini requests can be sent together
+        resolve = None
+        chunk_size = args.pack_size * PACKS_PER_CHUNK if args.pack_size > 1 else 1
+        if args.batch_job:
+            from tools.gemini_batch_jobs import GeminiBatchBackend, LocalBatchBackend, run_batch_job
+            backend = GeminiBatchBackend() if args.batch_job == "gemini" else LocalBatchBackend()
+            resolve = functools.partial(run_batch_job, backend=backend, job_dir=args.job_dir)
+            chunk_size = args.job_size
     
-    # Before the loop, ensure columns exist
-    for flag in VIOLATION_FLAGS:
-        if flag not in df.columns:
-            df[flag] = 0  # or False, or ""
+        # Normalized image_url -> the output columns of its verdict, for the last
+        # VERDICT_CACHE_SIZE URLs seen. A repeated row reuses its URL's verdict; one
+        # that was evicted is fetched (from the fetch cache) and moderated again.
+        verdicts = OrderedDict()
 
-    total_images = 0
-    total_time_taken = 0.0
-    per_image_times = []
-    batch_start_time = time.time()
+        def remember(key, columns):
+            verdicts[key] = columns
+            verdicts.move_to_end(key)
+            if len(verdicts) > VERDICT_CACHE_SIZE:
+                verdicts.popitem(last=False)
     
-    for idx, row in enumerate(df.itertuples(index=False)):
-        image_url = str(getattr(row, 'image_url', '')).strip()
-        if not image_url:
-            continue
-        print(f"Processing row {idx+1}: {image_url}")
-        local_path = get_local_image_path(image_url)
-        if not local_path:
-            print(f"  Skipping: Could not access image {image_url}")
-            df.at[idx, 'CM_ADK Decision'] = 'Error'
-            continue
-        start_time = time.time()
-        result = run_central_moderation_pipeline(local_path)
-        end_time = time.time()
-        elapsed = end_time - start_time
-        per_image_times.append(elapsed)
-        total_time_taken += elapsed
-        total_images += 1
-        print(f"⏱️ Time taken for this image: {elapsed:.2f} seconds")
-        # Print detailed summary for this image
-        print_moderation_report(result)
-        decision = result.get('final_decision', '').lower()
-        if decision == 'accept':
-            df.at[idx, 'CM_ADK Decision'] = 'A'
-        elif decision == 'reject':
-            df.at[idx, 'CM_ADK Decision'] = 'R'
-        else:
-            df.at[idx, 'CM_ADK Decision'] = decision[:1].upper() if decision else 'Error'
-        print(f"ContentModeration_ADK Decision: {df.at[idx, 'CM_ADK Decision']}")
-        # Set flags for this row
-        for flag in VIOLATION_FLAGS:
-            # If the violation is present in the violations list, set 1, else 0
-            df.at[idx, flag] = 1 if flag in result.get("violations", []) else 0
-        # Clean up temp file if downloaded
-        if local_path.startswith(tempfile.gettempdir()):
-            try:
-                os.remove(local_path)
-            except Exception:
-                pass
-        # Save results after each image
-        df.to_excel(OUTPUT_PATH, sheet_name=SHEET_NAME, index=False)
+        def verdict_columns(result):
+            decision = result.get('final_decision', '').lower()
+            if decision == 'accept':
+                columns = {'CM_ADK Decision': 'A'}
+            elif decision == 'reject':
+                columns = {'CM_ADK Decision': 'R'}
+            elif decision == 'retry':
+                # Deadline reached with missing_agents: retry (configs/decision_policy.yaml)
+                columns = {'CM_ADK Decision': 'Retry'}
+            else:
+                columns = {'CM_ADK Decision': decision[:1].upper() if decision else 'Error'}
+            # Set flags: 1 if the violation is present in the violations list, else 0
+            for flag in VIOLATION_FLAGS:
+                columns[flag] = 1 if flag in result.get("violations", []) else 0
+            return columns
+    
+        def moderate(pending, fetched):
+            # pending: [(out_row, key)] written out in input order; fetched: key -> (image_url, local_path) to moderate
+            nonlocal total_images, total_time_taken
+            images = list(fetched.items())
+            start_time = time.time()
+            with lane_scope(args.lane):
+                if resolve is not None or args.pack_size > 1:
+                    results = run_central_moderation_batch([local_path for _, (_, local_path) in images], args.pack_size, resolve=resolve)
+                else:
+                    results = [run_central_moderation_pipeline(local_path) for _, (_, local_path) in images]
+            elapsed = time.time() - start_time
+            decided = {}
+            for (key, (image_url, local_path)), result in zip(images, results):
+                per_image_times.append(elapsed / len(images))
+                total_time_taken += elapsed / len(images)
+                total_images += 1
+                # Print detailed summary for this image
+                print_moderation_report(result)
+                decided[key] = verdict_columns(result)
+                remember(key, decided[key])
+                print(f"ContentModeration_ADK Decision: {decided[key]['CM_ADK Decision']}")
+                if store is not None:
+                    store.add(dict(result, image_path=image_url))
+                # Clean up temp file (and its ingested copy) if downloaded
+                remove_download(local_path)
+            if images:
+                print(f"⏱️ Time taken for {len(images)} image(s): {elapsed:.2f} seconds")
+            # Save results after each chunk; rows whose URL was decided earlier already carry its verdict
+            for out_row, key in pending:
+                if key in decided:
+                    out_row.update(decided[key])
+                writer.writerow(out_row)
+            out.flush()
+    
+        writer = None
+        pending = []
+        fetched = {}
+        with open(output_path, "w", newline="", encoding="utf-8") as out:
+            for idx, row in iter_rows(args.input, sheet_name, start, stop):
+                # Ensure the column exists
+                if 'image_url' not in row:
+                    print("No 'image_url' column found!")
+                    return
+                if writer is None:
+                    # Output columns: input columns, decision, then one column per flag
+                    fieldnames = list(row) + [c for c in ['CM_ADK Decision'] + VIOLATION_FLAGS if c not in row]
+                    writer = csv.DictWriter(out, fieldnames=fieldnames, extrasaction="ignore")
+                    writer.writeheader()
+                out_row = dict(row, **{'CM_ADK Decision': ''}, **{flag: 0 for flag in VIOLATION_FLAGS})
+
+                image_url = str(row.get('image_url') or '').strip()
+                key = normalize_url(image_url) if image_url else None
+                if key in verdicts:
+                    duplicate_rows += 1
+                    verdicts.move_to_end(key)
+                    out_row.update(verdicts[key])
+                elif key in fetched:
+                    duplicate_rows += 1
+                elif key is not None:
+                    print(f"Processing row {idx+1}: {image_url}")
+                    fetch = fetch_image(image_url)
+                    if fetch.ok:
+                        fetched[key] = (image_url, fetch.path)
+                    else:
+                        print(f"  Skipping: Could not access image {image_url} ({fetch.status}: {fetch.error})")
+                        remember(key, {'CM_ADK Decision': 'Error'})
+                        out_row.update(verdicts[key])
+                pending.append((out_row, key))
+                if len(fetched) >= chunk_size:
+                    moderate(pending, fetched)
+                    pending = []
+                    fetched = {}
+            moderate(pending, fetched)
+    finally:
+        # Also on the early return for a sheet without an image_url column
+        if store is not None:
+            store.close()
+        use_fetcher(previous_fetcher)
+        fetch_metrics = fetcher.metrics()
+        fetcher.close()
     batch_end_time = time.time()
     batch_total_time = batch_end_time - batch_start_time
-    print(f"Done! Results saved to {OUTPUT_PATH}")
+    print(f"Done! Results saved to {output_path}")
     print("\n================ Efficiency Metrics ================")
     print(f"Total images processed: {total_images}")
+    print(f"Duplicate rows (verdict reused): {duplicate_rows}")
+    print(f"Fetches: {fetch_metrics}")
     print(f"Total batch processing time: {batch_total_time:.2f} seconds")
     if total_images > 0:
         avg_time = total_time_taken / total_images
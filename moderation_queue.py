@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Moderation Work Queue
+
+Spreads moderation over many hosts through a shared queue
+(tools/work_queue.py): producers enqueue the image_url column of a sheet,
+workers on any node run the central pipeline on each task and store the
+report, and the results are exported once the queue drains.
+
+Usage:
+    python moderation_queue.py enqueue --input SHEET [--sheet NAME] [--queue URL]
+    python moderation_queue.py work [--queue URL] [--workers N] [--idle-timeout S]
+    python moderation_queue.py status [--queue URL]
+    python moderation_queue.py export --store PATH [--queue URL]
+
+URL is sqlite:///path (one host) or redis://host:port/db (many hosts),
+default MODERATION_QUEUE or sqlite:///data/queue/moderation_queue.sqlite.
+
+Example:
+    python moderation_queue.py enqueue --input data/test_images/dateSetContentMod.xlsx --queue redis://queue-host:6379/0
+    python moderation_queue.py work --queue redis://queue-host:6379/0 --workers 4    # on every node
+    python moderation_queue.py export --store results.parquet --queue redis://queue-host:6379/0
+"""
+
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from tools.input_readers import iter_rows
+from tools.priority_scheduler import lane_scope
+from tools.work_queue import (
+    DEFAULT_QUEUE_URL,
+    MAX_ATTEMPTS,
+    VISIBILITY_TIMEOUT_SECONDS,
+    queue_from_url,
+    run_worker,
+)
+
+def enqueue(backend, args):
+    sheet_name = args.sheet if args.input.lower().endswith((".xlsx", ".xlsm")) else None
+    added = skipped = 0
+    for _, row in iter_rows(args.input, sheet_name):
+        image_url = str(row.get("image_url") or "").strip()
+        if not image_url:
+            continue
+        if backend.enqueue(image_url):
+            added += 1
+        else:
+            skipped += 1
+    print(f"📥 Enqueued {added} images ({skipped} already queued, done or dead-lettered)")
+
+def work(backend, args):
+    start = time.time()
+
+    def worker(_):
+        with lane_scope(args.lane):
+            return run_worker(backend, visibility_timeout=args.visibility_timeout,
+                              idle_timeout=args.idle_timeout, max_tasks=args.max_tasks)
+
+    with ThreadPoolExecutor(max_workers=args.workers) as executor:
+        totals = {"completed": 0, "failed": 0, "lost": 0}
+        for stats in executor.map(worker, range(args.workers)):
+            for key, value in stats.items():
+                totals[key] += value
+    print(f"✅ Completed {totals['completed']} tasks, {totals['failed']} failed attempts, "
+          f"{totals['lost']} lost leases in {time.time() - start:.2f} seconds")
+
+def status(backend, args):
+    print(backend.stats())
+    for task_id, payload, attempts, error in backend.dead_letters():
+        print(f"☠️ {payload} ({attempts} attempts): {error}")
+
+def export(backend, args):
+    from tools.result_store import ResultStore
+
+    count = 0
+    with ResultStore(args.store) as store:
+        for _, _, report in backend.results():
+            store.add(report)
+            count += 1
+    print(f"📤 Exported {count} reports to {args.store}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Distributed moderation through a shared work queue")
+    parser.add_argument("--queue", default=DEFAULT_QUEUE_URL, help="Queue URL (sqlite:///path or redis://host:port/db)")
+    parser.add_argument("--max-attempts", type=int, default=MAX_ATTEMPTS, help="Attempts before a task is dead-lettered")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    enqueue_parser = commands.add_parser("enqueue", help="Enqueue the image_url column of a sheet")
+    enqueue_parser.add_argument("--input", required=True, help="Excel (.xlsx), CSV or JSONL file with an image_url column")
+    enqueue_parser.add_argument("--sheet", default=None, help="Excel sheet name")
+
+    work_parser = commands.add_parser("work", help="Process tasks until the queue stays empty")
+    work_parser.add_argument("--workers", type=int, default=1, help="Worker threads on this node")
+    work_parser.add_argument("--visibility-timeout", type=float, default=VISIBILITY_TIMEOUT_SECONDS,
+                             help="Seconds a received task stays hidden from other workers (renewed while it runs)")
+    work_parser.add_argument("--idle-timeout", type=float, default=30.0, help="Stop after the queue has been empty this long")
+    work_parser.add_argument("--max-tasks", type=int, default=None, help="Stop each worker after this many tasks")
+    work_parser.add_argument("--lane", default="backfill",
+                             help="Priority lane for the Gemini calls when GEMINI_PRIORITY_LANES=on")
+
+    commands.add_parser("status", help="Show queue counts and dead letters")
+
+    export_parser = commands.add_parser("export", help="Write the stored reports to a Parquet/Arrow result store")
+    export_parser.add_argument("--store", required=True, help="Result store path (.parquet or .arrow)")
+
+    args = parser.parse_args()
+    backend = queue_from_url(args.queue, args.max_attempts)
+    {"enqueue": enqueue, "work": work, "status": status, "export": export}[args.command](backend, args)
+
+if __name__ == "__main__":
+    main()
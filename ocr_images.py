@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Batch OCR
+
+Runs the fast OCR stage (tools/ocr_stage.py) over images or directories in a
+process pool: text-free images are skipped by an edge-density check, the rest
+are OCR'd as rescaled, binarized grayscale. Settings default to configs/ocr.yaml.
+
+Usage:
+    python ocr_images.py PATHS... [--psm N] [--oem N] [--lang LANG] [--workers W]
+                                  [--min-edge-density D] [--no-binarize] [--jsonl PATH]
+
+Example:
+    python ocr_images.py data/test_images --psm 11 --workers 4 --jsonl ocr.jsonl
+"""
+
+import argparse
+import json
+import os
+import time
+
+from tools.ocr_stage import OcrConfig, extract_texts, load_ocr_config
+
+IMAGE_EXTS = ('.png', '.jpg', '.jpeg', '.webp', '.bmp', '.tif', '.tiff')
+
+def collect_images(paths):
+    images = []
+    for path in paths:
+        if os.path.isdir(path):
+            images.extend(
+                os.path.join(path, name) for name in sorted(os.listdir(path))
+                if name.lower().endswith(IMAGE_EXTS)
+            )
+        else:
+            images.append(path)
+    return images
+
+def main():
+    defaults = load_ocr_config()
+    parser = argparse.ArgumentParser(description="Batch OCR with text-presence gating and caching")
+    parser.add_argument("paths", nargs="+", help="Image files or directories")
+    parser.add_argument("--psm", type=int, default=defaults.psm, help="Tesseract page segmentation mode")
+    parser.add_argument("--oem", type=int, default=defaults.oem, help="Tesseract OCR engine mode")
+    parser.add_argument("--lang", default=defaults.lang, help="Tesseract language(s)")
+    parser.add_argument("--workers", type=int, default=None, help="OCR processes (default: CPU count)")
+    parser.add_argument("--min-edge-density", type=float, default=defaults.min_edge_density,
+                        help="Skip OCR below this edge density (0 disables the check)")
+    parser.add_argument("--no-binarize", action="store_true", help="OCR the grayscale image without thresholding")
+    parser.add_argument("--jsonl", help="Write one JSON result per image to this path")
+    args = parser.parse_args()
+
+    config = OcrConfig(
+        min_edge_density=args.min_edge_density,
+        edge_threshold=defaults.edge_threshold,
+        max_side=defaults.max_side,
+        min_side=defaults.min_side,
+        binarize=defaults.binarize and not args.no_binarize,
+        psm=args.psm,
+        oem=args.oem,
+        lang=args.lang,
+    )
+    images = collect_images(args.paths)
+    print(f"🔤 OCR on {len(images)} images ({config})")
+
+    start = time.perf_counter()
+    results = extract_texts(images, config, workers=args.workers)
+    wall = time.perf_counter() - start
+
+    skipped = sum(1 for r in results.values() if not r["text_detected"])
+    with_text = sum(1 for r in results.values() if r["text"].strip())
+    print(f"⏭️ Skipped (no text detected): {skipped}")
+    print(f"📝 Images with text: {with_text}")
+    print(f"⏱️ {wall:.2f}s total, {len(images) / wall if wall > 0 else 0:.2f} images/s")
+
+    if args.jsonl:
+        with open(args.jsonl, "w") as f:
+            for path in images:
+                f.write(json.dumps(dict(results[path], image_path=path)) + "\n")
+        print(f"📄 Results exported to: {args.jsonl}")
+
+if __name__ == "__main__":
+    main()
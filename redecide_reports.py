@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Re-decide Stored Reports
+
+Re-applies the decision policy (configs/decision_policy.yaml, or another
+policy file) to stored moderation reports without re-running any detector.
+The evaluation is vectorized over the whole table of reports.
+
+Usage:
+    python redecide_reports.py REPORTS... [--policy PATH] [--output PATH]
+
+REPORTS may be JSON report files (from export_json_report), JSONL files with
+one report per line, or Parquet/Arrow files with an agent_results column.
+
+Example:
+    python redecide_reports.py reports/*.json --policy configs/stricter_policy.yaml --output redecided.csv
+"""
+
+import argparse
+import json
+import os
+import time
+
+import pandas as pd
+
+from tools.decision_policy import load_policy, redecide_frame, DEFAULT_POLICY_PATH
+
+def load_reports(paths):
+    """Load stored reports from JSON/JSONL/Parquet/Arrow files into one DataFrame."""
+    frames = []
+    records = []
+    for path in paths:
+        ext = os.path.splitext(path)[1].lower()
+        if ext == ".parquet":
+            frames.append(pd.read_parquet(path))
+        elif ext in (".arrow", ".feather"):
+            frames.append(pd.read_feather(path))
+        elif ext == ".jsonl":
+            with open(path, "r") as f:
+                records.extend(json.loads(line) for line in f if line.strip())
+        else:
+            with open(path, "r") as f:
+                records.append(json.load(f))
+    if records:
+        frames.append(pd.DataFrame(records))
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-apply the decision policy to stored reports")
+    parser.add_argument("reports", nargs="+", help="Report files (JSON, JSONL, Parquet, Arrow)")
+    parser.add_argument("--policy", default=DEFAULT_POLICY_PATH, help="Decision policy YAML")
+    parser.add_argument("--output", help="Write re-decided rows to this CSV/Parquet path")
+    args = parser.parse_args()
+
+    reports = load_reports(args.reports)
+    if reports.empty:
+        print("❌ No reports found")
+        return
+
+    policy = load_policy(args.policy)
+    start_time = time.time()
+    redecided = redecide_frame(reports, policy)
+    elapsed = time.time() - start_time
+
+    if "image_path" in reports.columns:
+        redecided.insert(0, "image_path", reports["image_path"])
+
+    print(f"📊 Re-decided {len(redecided)} reports in {elapsed:.2f} seconds using {args.policy}")
+    print("\n🎯 Decisions:")
+    for decision, count in redecided["final_decision"].value_counts().items():
+        print(f"   {decision}: {count}")
+    if "decision_changed" in redecided.columns:
+        print(f"\n🔁 Changed decisions: {int(redecided['decision_changed'].sum())}")
+
+    if args.output:
+        if args.output.endswith(".parquet"):
+            redecided.to_parquet(args.output, index=False)
+        else:
+            redecided.to_csv(args.output, index=False)
+        print(f"📄 Results exported to: {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from tools import gemini_vision
+from tools.adaptive_limiter import AdaptiveLimiter, is_throttling_error
+from tools.fake_gemini import FakeGeminiError, FakeGeminiModel
+from tools.violence_detection_gemini import VIOLENCE_PROMPT
+
+IMAGE = "data/test_images/sample.jpg"
+
+def test_throttling_errors():
+    assert is_throttling_error(FakeGeminiError(429, "quota"))
+    assert is_throttling_error(FakeGeminiError(503, "unavailable"))
+    assert not is_throttling_error(FakeGeminiError(400, "bad request"))
+    assert not is_throttling_error(FileNotFoundError("missing"))
+
+def test_limit_grows_then_halves_on_throttling():
+    limiter = AdaptiveLimiter(initial_limit=4, max_limit=100)
+    for _ in range(4):
+        limiter.acquire()
+        limiter.release(0.0)
+    assert limiter.metrics()["limit"] == 8  # slow start: one slot per healthy response
+
+    limiter.acquire()
+    limiter.release(0.0, FakeGeminiError(429, "quota"))
+    assert limiter.metrics()["limit"] == 4
+    limiter.acquire()
+    limiter.release(0.0, FakeGeminiError(400, "bad request"))
+    assert limiter.metrics()["limit"] == 4
+
+    for _ in range(4):
+        limiter.acquire()
+        limiter.release(0.0)
+    assert limiter.metrics()["limit"] == 4  # additive increase: +1 per limit's worth of responses
+    limiter.acquire()
+    limiter.release(0.0)
+    assert limiter.metrics()["limit"] == 5
+
+def test_one_burst_of_failures_cuts_once():
+    limiter = AdaptiveLimiter(initial_limit=16, min_limit=2)
+    limiter.baseline_latency = 60.0
+    for _ in range(8):
+        limiter.acquire()
+    for _ in range(8):
+        limiter.release(0.0, FakeGeminiError(429, "quota"))
+    metrics = limiter.metrics()
+    assert metrics["limit"] == 8 and metrics["decreases"] == 1 and metrics["throttled"] == 8
+
+def test_latency_spikes_cut_the_limit():
+    limiter = AdaptiveLimiter(initial_limit=8, max_limit=8)
+    for _ in range(10):
+        limiter.acquire()
+        limiter.release(0.1)
+    limiter.acquire()
+    limiter.release(1.0)
+    assert limiter.metrics()["limit"] == 4 and limiter.metrics()["latency_spikes"] == 1
+
+def _burst(use_model, limiter):
+    use_model(FakeGeminiModel({"violence": ["NO"]}, latency="fixed:20", max_concurrency=4))
+    gemini_vision.use_limiter(limiter)
+    with ThreadPoolExecutor(max_workers=16) as executor:
+        results = list(executor.map(
+            lambda _: gemini_vision.analyze_image_with_prompt(IMAGE, VIOLENCE_PROMPT, agent="violence"),
+            range(96),
+        ))
+    return sum(1 for r in results if r["status"] == "error")
+
+def test_limiter_keeps_calls_within_quota(use_model):
+    limiter = AdaptiveLimiter(initial_limit=2)
+    assert _burst(use_model, limiter) < _burst(use_model, None)
+    assert limiter.metrics()["in_flight"] == 0
@@ -0,0 +1,106 @@
+import threading
+import time
+import pytest
+from tools.agent_dag import DagNode, central_pipeline_dag, iter_dag, parse_condition, run_dag
+from tools.deadlines import current_deadline
+
+def make_tool(name, log, result=None, delay=0.0):
+    def tool(image_path):
+        log.append(name)
+        time.sleep(delay)
+        return dict(result or {"status": "success"}, seen=image_path)
+    return tool
+
+def test_parse_condition():
+    is_unsafe = parse_condition("nudity.label == unsafe")
+    assert is_unsafe({"nudity": {"label": "unsafe"}})
+    assert not is_unsafe({"nudity": {"label": "safe"}})
+    assert not is_unsafe({})
+    assert parse_condition("ocr.found != true")({"ocr": {"found": False}})
+    with pytest.raises(ValueError):
+        parse_condition("nudity is unsafe")
+
+def test_conditional_node_skipped_and_inputs_wired():
+    log = []
+    nodes = [
+        DagNode("ingestion", make_tool("ingestion", log, {"status": "success", "output_path": "out.jpg"})),
+        DagNode("nudity", make_tool("nudity", log, {"status": "success", "label": "safe"}),
+                depends_on=["ingestion"], inputs={"image_path": "ingestion.output_path"}),
+        DagNode("exceptions", make_tool("exceptions", log), depends_on=["nudity"],
+                run_if="nudity.label == unsafe"),
+    ]
+    results = run_dag(nodes, {"image_path": "in.jpg"})
+    assert results["ingestion"]["seen"] == "in.jpg"
+    assert results["nudity"]["seen"] == "out.jpg"
+    assert results["exceptions"]["status"] == "skipped"
+    assert "exceptions" not in log
+
+def test_failed_dependency_skips_downstream():
+    log = []
+    nodes = [
+        DagNode("ingestion", make_tool("ingestion", log, {"status": "error", "message": "bad image"})),
+        DagNode("violence", make_tool("violence", log), depends_on=["ingestion"]),
+    ]
+    results = run_dag(nodes, {"image_path": "in.jpg"})
+    assert results["violence"]["status"] == "skipped"
+    assert log == ["ingestion"]
+
+def test_tool_exception_becomes_error_result():
+    def broken(image_path):
+        raise RuntimeError("boom")
+    results = run_dag([DagNode("broken", broken)], {"image_path": "in.jpg"})
+    assert results["broken"] == {"status": "error", "message": "boom"}
+
+def test_independent_nodes_run_in_parallel():
+    active, peak = [0], [0]
+    lock = threading.Lock()
+
+    def tool(image_path):
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        time.sleep(0.05)
+        with lock:
+            active[0] -= 1
+        return {"status": "success"}
+
+    nodes = [DagNode(f"agent_{i}", tool) for i in range(4)]
+    run_dag(nodes, {"image_path": "in.jpg"})
+    assert peak[0] > 1
+
+    peak[0] = 0
+    run_dag(nodes, {"image_path": "in.jpg"}, max_workers=1)
+    assert peak[0] == 1
+
+def test_deadline_times_out_unfinished_nodes():
+    log = []
+    seen_deadlines = []
+
+    def hung(image_path):
+        seen_deadlines.append(current_deadline())
+        time.sleep(2.0)
+        return {"status": "success"}
+
+    nodes = [
+        DagNode("ingestion", make_tool("ingestion", log)),
+        DagNode("fast", make_tool("fast", log), depends_on=["ingestion"]),
+        DagNode("hung", hung, depends_on=["ingestion"]),
+        DagNode("after_hung", make_tool("after_hung", log), depends_on=["hung"]),
+    ]
+    deadline = time.monotonic() + 0.3
+    start = time.perf_counter()
+    results = dict((node.name, result) for node, result in iter_dag(nodes, {"image_path": "in.jpg"}, deadline=deadline))
+    assert time.perf_counter() - start < 1.0
+    assert results["fast"]["status"] == "success"
+    assert results["hung"]["status"] == "timeout"
+    assert results["after_hung"]["status"] == "timeout"
+    assert seen_deadlines == [deadline]
+
+def test_central_pipeline_graph():
+    nodes = {node.name: node for node in central_pipeline_dag()}
+    assert list(nodes)[0] == "ingestion"
+    assert nodes["nudity_exceptions"].run_if == "nudity.label == unsafe"
+    assert "nudity" in nodes["nudity_exceptions"].depends_on
+    for name, node in nodes.items():
+        if name != "ingestion":
+            assert "ingestion" in node.depends_on
@@ -6,7 +6,7 @@ result = detect_alcohol_smoke_with_gemini(image_path)
 
 print("🔍 Gemini-Powered Alcohol/Smoking Detection")
 print("-" * 40)
-print(f"Prompt     :\n{result.get('prompt')}\n")
+print(f"Prompt ID  : {result.get('prompt_id')}")
 print(f"Response   :\n{result.get('response_text')}\n")
 
 if result.get("status") != "success":
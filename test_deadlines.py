@@ -0,0 +1,83 @@
+import copy
+import shutil
+import time
+
+from tools import central_moderation_pipeline, gemini_vision
+from tools.adaptive_limiter import AdaptiveLimiter
+from tools.central_moderation_pipeline import run_central_moderation_pipeline
+from tools.decision_policy import default_policy
+from tools.deadlines import deadline_scope, remaining_seconds
+from tools.fake_gemini import FakeGeminiModel
+from tools.violence_detection_gemini import VIOLENCE_PROMPT
+
+IMAGE = "data/test_images/sample.jpg"
+
+def test_deadline_scope_is_per_thread_and_restored():
+    assert remaining_seconds() is None
+    with deadline_scope(time.monotonic() + 10):
+        assert 9 < remaining_seconds() <= 10
+        with deadline_scope(None):
+            assert remaining_seconds() is None
+        assert remaining_seconds() is not None
+    assert remaining_seconds() is None
+
+def test_gemini_call_is_bounded_by_the_deadline(use_model):
+    def call():
+        with deadline_scope(time.monotonic() + 0.2):
+            return gemini_vision.analyze_image_with_prompt(IMAGE, VIOLENCE_PROMPT, agent="violence")
+
+    start = time.perf_counter()
+    use_model(FakeGeminiModel.from_file(latency="fixed:5000"))
+    result = call()
+    assert result["status"] == "timeout"
+    assert time.perf_counter() - start < 1.0
+
+    def expired():
+        with deadline_scope(time.monotonic() - 1):
+            return gemini_vision.analyze_image_with_prompt(IMAGE, VIOLENCE_PROMPT, agent="violence")
+
+    fake = use_model(FakeGeminiModel.from_file())
+    assert expired()["status"] == "timeout"
+    assert fake.calls == 0
+
+def test_deadline_covers_the_wait_for_a_limiter_slot(use_model):
+    limiter = AdaptiveLimiter(initial_limit=1)
+    limiter.acquire()  # a slow call already holds the only slot
+    fake = use_model(FakeGeminiModel.from_file())
+    previous = gemini_vision.use_limiter(limiter)
+    try:
+        start = time.perf_counter()
+        with deadline_scope(time.monotonic() + 0.2):
+            result = gemini_vision.analyze_image_with_prompt(IMAGE, VIOLENCE_PROMPT, agent="violence")
+    finally:
+        gemini_vision.use_limiter(previous)
+        limiter.release(0.0)
+    assert result["status"] == "timeout"
+    assert time.perf_counter() - start < 1.0
+    assert fake.calls == 0 and limiter.metrics()["timed_out"] == 1
+
+def test_pipeline_returns_by_the_deadline_and_flags_missing_agents(tmp_path, use_model):
+    image_path = str(tmp_path / "sample.jpg")
+    shutil.copyfile(IMAGE, image_path)
+    use_model(FakeGeminiModel.from_file(latency="fixed:5000"))
+    report = run_central_moderation_pipeline(image_path, deadline_seconds=1.0)
+    assert report["timings"]["total_seconds"] < 2.0
+    assert report["status"] == "success"
+    assert set(report["missing_agents"]) >= {"violence", "drugs", "alcohol_smoking", "hate", "pii_text", "qr_code"}
+    assert report["final_decision"] == "Flag"  # configs/decision_policy.yaml: missing_agents: flag
+
+def test_pipeline_errors_use_the_policys_reject_decision(tmp_path, use_model, monkeypatch):
+    image_path = str(tmp_path / "sample.jpg")
+    shutil.copyfile(IMAGE, image_path)
+    policy = copy.copy(default_policy())
+    policy.reject_decision = "Block"
+    monkeypatch.setattr(central_moderation_pipeline, "default_policy", lambda: policy)
+    def fail(agent_results):
+        raise RuntimeError("policy store unavailable")
+
+    monkeypatch.setattr(central_moderation_pipeline, "timed_out_agents", fail)
+    use_model(FakeGeminiModel.from_file())
+    report = run_central_moderation_pipeline(image_path)
+    assert report["status"] == "error"
+    assert report["final_decision"] == "Block" and report["violations"][-1] == "pipeline_error"
+    assert report["error_message"] == "policy store unavailable"
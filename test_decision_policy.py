@@ -0,0 +1,132 @@
+import json
+import pytest
+import yaml
+from tools.decision_policy import DecisionPolicy, default_policy, redecide_frame
+from tools.response_parsing import parse_violation_type
+
+with open("data/recorded_responses/gemini_responses.json", "r") as f:
+    RESPONSES = json.load(f)
+
+GEMINI_AGENTS = ["violence", "drugs", "alcohol_smoking", "hate", "pii_text", "qr_code"]
+
+def legacy_decision(agent_results):
+    """The hardwired logic previously at the end of run_central_moderation_pipeline."""
+    violations = []
+    if agent_results["nudity"].get("label") == "unsafe":
+        violations.append("nudity")
+    for agent, fixed in [("violence", None), ("drugs", ["drugs"]), ("alcohol_smoking", None),
+                         ("hate", ["hate_symbols"]), ("pii_text", None), ("qr_code", ["qr_codes"])]:
+        text = agent_results[agent].get("response_text") or ""
+        if "YES" in text.upper():
+            violations.extend(fixed or parse_violation_type(text))
+    violations = set(violations)
+    if not violations:
+        return violations, "Accept"
+    high = ["nudity", "blood/gore", "weapons", "death/corpses", "self-harm", "abuse/torture"]
+    return violations, "Reject" if violations.intersection(high) else "Flag"
+
+def sample_reports():
+    reports = []
+    for i in range(40):
+        agent_results = {"nudity": {"status": "success", "label": "unsafe" if i % 7 == 0 else "safe"}}
+        for j, agent in enumerate(GEMINI_AGENTS):
+            options = RESPONSES[agent]
+            agent_results[agent] = {"status": "success", "response_text": options[(i + j) % len(options)]}
+        reports.append({"image_path": f"img_{i}.jpg", "final_decision": legacy_decision(agent_results)[1], "agent_results": agent_results})
+    return reports
+
+def test_default_policy_matches_legacy_logic():
+    policy = default_policy()
+    for report in sample_reports():
+        violations, decision = policy.evaluate(report["agent_results"])
+        expected_violations, expected_decision = legacy_decision(report["agent_results"])
+        assert set(violations) == expected_violations
+        assert decision == expected_decision
+
+def test_policy_changes_are_declarative():
+    policy = DecisionPolicy.from_dict({
+        "agents": {"qr_code": {"trigger": {"field": "response_text", "contains": "yes"}, "violations": ["qr_codes"]}},
+        "tiers": [{"decision": "Reject", "violations": ["qr_codes"]}],
+    })
+    assert policy.evaluate({"qr_code": {"response_text": "YES, center"}}) == (["qr_codes"], "Reject")
+    assert policy.evaluate({"qr_code": {"response_text": "NO"}}) == ([], "Accept")
+    assert policy.evaluate({}) == ([], "Accept")
+
+def test_missing_agent_modes():
+    config = {
+        "agents": {
+            "nudity": {"trigger": {"field": "label", "equals": "unsafe"}, "violations": ["nudity"]},
+            "qr_code": {"trigger": {"field": "response_text", "contains": "yes"}, "violations": ["qr_codes"]},
+        },
+        "tiers": [{"decision": "Reject", "violations": ["nudity"]}, {"decision": "Flag", "violations": ["qr_codes"]}],
+    }
+    clean = {"nudity": {"label": "safe"}, "qr_code": {"status": "timeout"}}
+    unsafe = {"nudity": {"label": "unsafe"}, "qr_code": {"status": "timeout"}}
+    expected = {"flag": "Flag", "decide": "Accept", "retry": "Retry"}
+    for mode, decision in expected.items():
+        policy = DecisionPolicy.from_dict(dict(config, missing_agents=mode))
+        assert policy.evaluate(clean) == ([], decision)
+        # The agents that finished already reject: missing ones cannot change that
+        assert policy.evaluate(unsafe) == (["nudity"], "Reject")
+    with pytest.raises(ValueError):
+        DecisionPolicy.from_dict(dict(config, missing_agents="ignore"))
+
+def test_vectorized_redecision_matches_row_evaluation():
+    pytest.importorskip("pandas")
+    reports = sample_reports()
+    policy = default_policy()
+    redecided = redecide_frame(reports, policy, with_violation_lists=True)
+    for report, (_, row) in zip(reports, redecided.iterrows()):
+        violations, decision = policy.evaluate(report["agent_results"])
+        assert row["final_decision"] == decision
+        assert set(row["violations"]) == set(violations)
+    assert not redecided["decision_changed"].any()
+
+    # Reports whose agents timed out under a deadline, in every missing_agents mode
+    for i, report in enumerate(reports[:14]):
+        report["agent_results"][GEMINI_AGENTS[i % len(GEMINI_AGENTS)]] = {"status": "timeout", "message": "deadline"}
+    config = {"agents": {agent: {"trigger": {"field": "response_text", "contains": "YES"}} for agent in GEMINI_AGENTS},
+              "tiers": [{"decision": "Reject", "violations": ["weapons", "blood/gore"]}]}
+    config["agents"]["nudity"] = {"trigger": {"field": "label", "equals": "unsafe"}, "violations": ["nudity"]}
+    config["tiers"][0]["violations"].append("nudity")
+    for policy in [default_policy()] + [DecisionPolicy.from_dict(dict(config, missing_agents=mode)) for mode in ("flag", "decide", "retry")]:
+        decisions = [policy.evaluate(report["agent_results"])[1] for report in reports]
+        assert list(redecide_frame(reports, policy)["final_decision"]) == decisions
+        if policy.missing_agents != "decide":
+            assert policy.retry_decision in decisions or policy.flag_decision in decisions
+
+def test_failed_reports_stay_rejected():
+    pytest.importorskip("pandas")
+    clean = {"nudity": {"status": "success", "label": "safe"}}
+    clean.update({agent: {"status": "success", "response_text": "NO"} for agent in GEMINI_AGENTS})
+    reports = [
+        # Ingestion failed: no other agent ran
+        {"status": "success", "final_decision": "Reject", "violations": ["image_processing_error"],
+         "agent_results": {"ingestion": {"status": "error", "message": "Unsupported format"}}},
+        # The pipeline raised after some agents finished
+        {"status": "error", "final_decision": "Reject", "violations": ["pipeline_error"],
+         "agent_results": dict(clean, ingestion={"status": "success"})},
+        {"status": "success", "final_decision": "Accept", "violations": [],
+         "agent_results": dict(clean, ingestion={"status": "success"})},
+    ]
+    for mode in ("flag", "decide", "retry"):
+        policy = DecisionPolicy.from_dict(dict(yaml.safe_load(open("configs/decision_policy.yaml")), missing_agents=mode))
+        redecided = redecide_frame(reports, policy, with_violation_lists=True)
+        assert list(redecided["final_decision"]) == ["Reject", "Reject", "Accept"]
+        assert [row for row in redecided["violations"]] == [["image_processing_error"], ["pipeline_error"], []]
+        assert not redecided["decision_changed"].any()
+
+def test_most_severe_decision_across_reports():
+    policy = default_policy()
+    assert policy.most_severe(["Accept", "Flag", "Accept"]) == "Flag"
+    assert policy.most_severe(["Flag", "Retry", "Reject"]) == "Reject"
+    assert policy.most_severe([]) == "Accept"
+
+if __name__ == "__main__":
+    test_default_policy_matches_legacy_logic()
+    test_policy_changes_are_declarative()
+    test_missing_agent_modes()
+    test_vectorized_redecision_matches_row_evaluation()
+    test_failed_reports_stay_rejected()
+    test_most_severe_decision_across_reports()
+    print("✅ Decision policy tests passed!")
@@ -0,0 +1,79 @@
+import shutil
+from multiprocessing import shared_memory
+
+import numpy as np
+import pytest
+
+from tools import detector_pool
+from tools.central_moderation_pipeline import run_central_moderation_pipeline
+from tools.detector_pool import DetectorPool
+from tools.fake_gemini import FakeGeminiModel
+from tools.nudity_detector import detect_nudity
+from tools.shared_images import SharedImage, decode_image, run_on_shared
+
+IMAGE = "data/test_images/sample.jpg"
+STATS = {"mean": "numpy.mean", "max": "numpy.max"}
+
+def test_shared_image_is_freed_by_the_last_release():
+    pixels = np.arange(2 * 3 * 3, dtype=np.uint8).reshape(2, 3, 3)
+    image = SharedImage(pixels)
+    image.retain(2)
+    assert run_on_shared(image.ref, lambda view: view.tolist()) == pixels.tolist()
+    image.release()
+    assert not image.released
+    image.release()
+    assert image.released
+    with pytest.raises(FileNotFoundError):
+        shared_memory.SharedMemory(name=image.ref.name)
+
+@pytest.mark.parametrize("transport", ["shared", "pickle"])
+def test_detectors_read_the_decoded_image(transport):
+    pixels = decode_image(IMAGE)
+    with DetectorPool(2, STATS, transport=transport) as pool:
+        results = pool.detect_many([IMAGE, IMAGE, "data/test_images/missing.jpg"])
+        assert pool.metrics()["images"] == 2
+    assert results[0] == results[1] == {"mean": pixels.mean(), "max": pixels.max()}
+    assert results[2]["mean"]["status"] == "error"
+
+def test_nudenet_in_the_pool_matches_in_process():
+    with DetectorPool(1) as pool:
+        assert pool.detect("data/test_images/nudeMen.jpg", ["nudity"])["nudity"] == detect_nudity("data/test_images/nudeMen.jpg")
+        with pytest.raises(ValueError):
+            pool.submit(IMAGE, ["unknown"])
+
+def test_pipeline_runs_nudity_in_the_pool(tmp_path, use_model):
+    image_path = str(tmp_path / "nude.jpg")
+    shutil.copyfile("data/test_images/nudeMen.jpg", image_path)
+    expected_path = str(tmp_path / "nude_expected.jpg")
+    shutil.copyfile("data/test_images/nudeMen.jpg", expected_path)
+
+    pool = DetectorPool(1)
+    use_model(FakeGeminiModel.from_file())
+    expected = run_central_moderation_pipeline(expected_path)
+    previous_pool = detector_pool.use_detector_pool(pool)
+    try:
+        report = run_central_moderation_pipeline(image_path)
+    finally:
+        detector_pool.use_detector_pool(previous_pool)
+        pool.close()
+    assert pool.metrics()["images"] == 1
+    assert report["agent_results"]["nudity"] == expected["agent_results"]["nudity"]
+
+def test_pipeline_nodes_share_one_decode_per_image(monkeypatch):
+    # The central DAG runs NudeNet only; with the ResNet node added both would share a block
+    assert detector_pool.pipeline_detectors() == ("nudity",)
+    monkeypatch.setattr(detector_pool, "pipeline_detectors", lambda: ("nudity", "violence_resnet"))
+    pixels = decode_image(IMAGE)
+    pool = DetectorPool(2, {"nudity": "numpy.mean", "violence_resnet": "numpy.max"})
+    previous = detector_pool.use_detector_pool(pool)
+    try:
+        # As the DAG runs them: each node asks for its own detector
+        assert detector_pool.detect_nudity(IMAGE) == pixels.mean()
+        assert detector_pool.detect_violence(IMAGE) == pixels.max()
+        assert pool.metrics()["images"] == 1
+        # A second request for the same image starts over
+        assert detector_pool.detect_violence(IMAGE) == pixels.max()
+        assert pool.metrics()["images"] == 2
+    finally:
+        detector_pool.use_detector_pool(previous)
+        pool.close()
@@ -0,0 +1,43 @@
+import random
+import pytest
+from tools.fake_gemini import FakeGeminiModel, FakeGeminiError, make_latency_sampler
+
+RESPONSES = {
+    "qr_code": ["QR NO", "QR YES"],
+    "unknown": ["NO"],
+}
+
+def _qr_prompt():
+    with open("configs/prompts/qr_prompt.txt", "r") as f:
+        return f.read()
+
+def test_latency_specs():
+    rng = random.Random(0)
+    assert make_latency_sampler("none")(rng) == 0.0
+    assert make_latency_sampler("fixed:250")(rng) == 0.25
+    assert 0.1 <= make_latency_sampler("uniform:100:200")(rng) <= 0.2
+    assert make_latency_sampler("lognormal:1000:0.5")(rng) > 0
+    with pytest.raises(ValueError):
+        make_latency_sampler("gaussian:1")
+
+def test_replay_is_deterministic_per_agent_and_image():
+    fake = FakeGeminiModel(RESPONSES)
+    first = fake.generate_content([_qr_prompt(), b"image-a"]).text
+    again = fake.generate_content([_qr_prompt(), b"image-a"]).text
+    assert first == again
+    assert first in RESPONSES["qr_code"]
+    assert fake.generate_content(["something else", b"image-a"]).text == "NO"
+    assert fake.calls == 3
+
+def test_error_injection():
+    fake = FakeGeminiModel(RESPONSES, error_rate=1.0)
+    with pytest.raises(FakeGeminiError) as exc:
+        fake.generate_content([_qr_prompt(), b"image-a"])
+    assert exc.value.code in (429, 503)
+    assert fake.errors == 1
+
+if __name__ == "__main__":
+    test_latency_specs()
+    test_replay_is_deterministic_per_agent_and_image()
+    test_error_injection()
+    print("✅ Fake Gemini tests passed!")
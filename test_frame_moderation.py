@@ -0,0 +1,86 @@
+import weakref
+
+import cv2
+import numpy as np
+import pytest
+from PIL import Image
+
+from tools.fake_gemini import FakeGeminiModel
+from tools.frame_moderation import iter_frames, media_type, run_frame_moderation, select_keyframes
+from tools.nudity_detector import detect_nudity, detect_nudity_batch
+
+SHOTS = ["data/test_images/sample.jpg", "data/test_images/gun.jpg", "data/test_images/nudeMen.jpg"]
+
+def shot(path, jitter=0):
+    pixels = cv2.cvtColor(cv2.resize(cv2.imread(path), (320, 240)), cv2.COLOR_BGR2RGB)
+    pixels[:2, :2] = jitter  # a change too small to matter
+    return Image.fromarray(pixels)
+
+def test_similar_consecutive_frames_collapse_to_keyframes():
+    frames = [(i, i / 2, shot(SHOTS[i // 10], jitter=i)) for i in range(30)]
+    keyframes, sampled = select_keyframes(frames)
+    assert sampled == 30 and [keyframe["frame_index"] for keyframe in keyframes] == [0, 10, 20]
+
+    keyframes, _ = select_keyframes(frames, max_keyframes=2)
+    assert [keyframe["frame_index"] for keyframe in keyframes][0] == 0 and len(keyframes) == 2
+
+def test_keyframe_cap_holds_while_streaming():
+    refs = []
+    peak = 0
+
+    def frames():
+        # 40 scene changes at 1600x1200: only the kept keyframes (shrunk) may stay alive
+        nonlocal peak
+        for i in range(40):
+            frame = shot(SHOTS[i % 3], jitter=i).resize((1600, 1200))
+            refs.append(weakref.ref(frame))
+            yield i, i / 2, frame
+            del frame
+            peak = max(peak, sum(ref() is not None for ref in refs))
+
+    keyframes, sampled = select_keyframes(frames(), max_keyframes=3)
+    assert sampled == 40 and len(keyframes) == 3 and keyframes[0]["frame_index"] == 0
+    assert peak <= 3 + 1  # plus the frame being hashed
+    assert [k["frame_index"] for k in keyframes] == sorted(k["frame_index"] for k in keyframes)
+    assert all(max(k["image"].size) <= 1024 for k in keyframes)
+
+def test_frames_are_sampled_by_time(tmp_path):
+    gif_path = str(tmp_path / "clip.gif")
+    frames = [Image.new("RGB", (32, 32), (i * 20, 0, 0)) for i in range(10)]
+    frames[0].save(gif_path, save_all=True, append_images=frames[1:], duration=250, loop=0)
+    assert media_type(gif_path) == "animation" and media_type(SHOTS[0]) == "image"
+    assert [timestamp for _, timestamp, _ in iter_frames(gif_path, sample_fps=2)] == [0.0, 0.5, 1.0, 1.5, 2.0]
+
+    video_path = str(tmp_path / "clip.mp4")
+    writer = cv2.VideoWriter(video_path, cv2.VideoWriter_fourcc(*"mp4v"), 10, (320, 240))
+    if not writer.isOpened():
+        pytest.skip("OpenCV was built without an MP4 encoder")
+    for path in SHOTS:
+        for i in range(20):
+            writer.write(cv2.cvtColor(np.asarray(shot(path, jitter=i)), cv2.COLOR_RGB2BGR))
+    writer.release()
+    assert media_type(video_path) == "video"
+    keyframes, sampled = select_keyframes(iter_frames(video_path, sample_fps=2))
+    assert sampled == 12 and [keyframe["timestamp"] for keyframe in keyframes] == [0.0, 2.0, 4.0]
+
+def test_nudenet_batches_match_single_images():
+    paths = SHOTS + ["data/test_images/missing.jpg"]
+    results = detect_nudity_batch(paths, batch_size=2)
+    assert results[:3] == [detect_nudity(path) for path in SHOTS]
+    assert results[3]["status"] == "error"
+
+def test_keyframes_are_moderated_as_one_report(tmp_path, monkeypatch, use_model):
+    gif_path = str(tmp_path / "clip.gif")
+    frames = [shot(path, jitter=i) for path in SHOTS[::2] for i in range(5)]
+    frames[0].save(gif_path, save_all=True, append_images=frames[1:], duration=200, loop=0)
+    # NudeNet runs once for all keyframes, never per pipeline
+    monkeypatch.setattr("tools.nudity_detector.detect_nudity", lambda image_path: pytest.fail("not batched"))
+
+    use_model(FakeGeminiModel.from_file())
+    report = run_frame_moderation(gif_path)
+
+    assert report["media"]["type"] == "animation" and report["media"]["keyframes"] == 2
+    assert [frame["timestamp"] for frame in report["frames"]] == [0.0, 1.0]
+    assert report["final_decision"] == "Reject" and "nudity" in report["violations"]
+    assert "nudity" in report["frames"][1]["violations"] and "nudity" not in report["frames"][0]["violations"]
+    assert set(report["frames"][0]["violations"]) <= set(report["violations"])
@@ -16,7 +16,7 @@ result = analyze_image_with_prompt(image_path, prompt)
 
 print("🔍 Gemini Analysis Result:")
 print("-" * 40)
-print(f"Prompt     : {result.get('prompt')}")
+print(f"Prompt ID  : {result.get('prompt_id')}")
 print(f"Response   :\n{result.get('response_text')}")
 if result.get("status") != "success":
     print("❌ ERROR:", result.get("message"))
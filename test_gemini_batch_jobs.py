@@ -0,0 +1,92 @@
+import functools
+import json
+import os
+
+from PIL import Image
+
+from tools import gemini_vision
+from tools.central_moderation_pipeline import run_central_moderation_batch, run_central_moderation_pipeline
+from tools.fake_gemini import FakeGeminiModel
+from tools.gemini_batch_jobs import LocalBatchBackend, run_batch_job
+from tools.gemini_batching import RequestCollector
+from tools.violence_detection_gemini import VIOLENCE_PROMPT
+
+RESPONSES = {"violence": ["YES, a weapon", "NO", "MAYBE"], "unknown": ["NO"]}
+
+def _images(tmp_path, count):
+    paths = []
+    for i in range(count):
+        path = os.path.join(tmp_path, f"image_{i}.png")
+        Image.new("RGB", (64, 64), (i * 40 % 256, 30, 120)).save(path)
+        paths.append(path)
+    return paths
+
+def _collect(paths):
+    collector = RequestCollector()
+    gemini_vision.use_request_collector(collector)
+    results = [gemini_vision.analyze_image_with_prompt(p, VIOLENCE_PROMPT, agent="violence") for p in paths]
+    gemini_vision.use_request_collector(None)
+    return collector, results
+
+def test_job_results_are_joined_back_by_key(tmp_path, use_model):
+    paths = _images(tmp_path, 4)
+    use_model(FakeGeminiModel(RESPONSES))
+    expected = [gemini_vision.analyze_image_with_prompt(p, VIOLENCE_PROMPT, agent="violence") for p in paths]
+    collector, results = _collect(paths)
+    backend = LocalBatchBackend(polls_until_done=3)
+    stats = run_batch_job(collector.requests, backend, str(tmp_path / "jobs"), poll_interval=0)
+    assert results == expected
+    assert stats["succeeded"] == 4 and stats["failed"] == 0 and backend.submitted == 1
+
+    job_files = sorted(os.listdir(tmp_path / "jobs"))
+    assert len(job_files) == 2
+    with open(tmp_path / "jobs" / job_files[0]) as f:
+        line = json.loads(f.readline())
+    assert line["key"] == "request-0"
+    assert "inline_data" in line["request"]["contents"][0]["parts"][1]
+
+def test_failed_lines_and_jobs_become_error_results(tmp_path, use_model):
+    class FailingBackend(LocalBatchBackend):
+        def poll(self, job_id):
+            return "failed"
+
+    paths = _images(tmp_path, 3)
+    use_model(FakeGeminiModel(RESPONSES, error_rate=1.0))
+    collector, results = _collect(paths)
+    stats = run_batch_job(collector.requests, LocalBatchBackend(), str(tmp_path / "a"), poll_interval=0)
+    assert stats["failed"] == 3
+    assert all(r["status"] == "error" and "Fake Gemini" in r["message"] for r in results)
+
+    collector, results = _collect(paths)
+    run_batch_job(collector.requests, FailingBackend(), str(tmp_path / "b"), poll_interval=0)
+    assert all(r["status"] == "error" and "failed" in r["message"] for r in results)
+
+    class UnreachableBackend(LocalBatchBackend):
+        def submit(self, job_path):
+            raise ConnectionError("Service unavailable")
+
+    collector, results = _collect(paths)
+    stats = run_batch_job(collector.requests, UnreachableBackend(), str(tmp_path / "c"), poll_interval=0)
+    assert stats["job_id"] is None and stats["failed"] == 3
+    assert all(r["status"] == "error" and "could not be submitted" in r["message"] for r in results)
+
+def test_batch_pipeline_with_a_batch_job(tmp_path, use_model):
+    paths = _images(tmp_path, 3)
+    use_model(FakeGeminiModel.from_file())
+    expected = [run_central_moderation_pipeline(p) for p in paths]
+    backend = LocalBatchBackend()
+    resolve = functools.partial(run_batch_job, backend=backend, job_dir=str(tmp_path / "jobs"), poll_interval=0)
+    reports = run_central_moderation_batch(paths, resolve=resolve)
+    assert backend.submitted == 1
+    assert [r["final_decision"] for r in reports] == [r["final_decision"] for r in expected]
+    assert [r["agent_results"] for r in reports] == [r["agent_results"] for r in expected]
+
+def test_unfinished_jobs_are_cancelled_at_the_timeout(tmp_path, use_model):
+    paths = _images(tmp_path, 2)
+    backend = LocalBatchBackend(polls_until_done=100)
+    use_model(FakeGeminiModel(RESPONSES))
+    collector, results = _collect(paths)
+    stats = run_batch_job(collector.requests, backend, str(tmp_path / "jobs"), poll_interval=0.01, timeout=0.05)
+    assert backend.poll(stats["job_id"]) == "cancelled"
+    assert stats["failed"] == 2
+    assert all(r["status"] == "error" and "cancelled" in r["message"] for r in results)
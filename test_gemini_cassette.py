@@ -0,0 +1,35 @@
+import os
+import tempfile
+import pytest
+from tools.gemini_cassette import GeminiCassette
+
+def test_cassette_round_trip_and_persistence():
+    workdir = tempfile.mkdtemp()
+    image_path = os.path.join(workdir, "image.jpg")
+    with open(image_path, "wb") as f:
+        f.write(b"not really a jpeg")
+    store_path = os.path.join(workdir, "cassettes", "gemini.sqlite")
+
+    cassette = GeminiCassette(store_path, mode="auto")
+    fingerprint, image_hash, prompt_hash = cassette.fingerprint_request(image_path, "Is this safe?", "gemini-2.5-pro")
+    assert cassette.lookup(fingerprint) is None
+    cassette.store(fingerprint, image_hash, prompt_hash, "gemini-2.5-pro", "NO")
+    cassette.close()
+
+    replay = GeminiCassette(store_path, mode="replay")
+    assert len(replay) == 1
+    assert replay.lookup(fingerprint) == "NO"
+    other_model, _, _ = replay.fingerprint_request(image_path, "Is this safe?", "gemini-1.5-pro")
+    other_prompt, _, _ = replay.fingerprint_request(image_path, "Is this unsafe?", "gemini-2.5-pro")
+    assert replay.lookup(other_model) is None
+    assert replay.lookup(other_prompt) is None
+    assert (replay.hits, replay.misses) == (1, 2)
+
+def test_invalid_mode():
+    with pytest.raises(ValueError):
+        GeminiCassette(os.path.join(tempfile.mkdtemp(), "c.sqlite"), mode="sometimes")
+
+if __name__ == "__main__":
+    test_cassette_round_trip_and_persistence()
+    test_invalid_mode()
+    print("✅ Cassette tests passed!")
@@ -0,0 +1,101 @@
+import threading
+import time
+
+from tools import gemini_vision
+from tools.fake_gemini import FakeGeminiModel
+from tools.gemini_context_cache import LocalContextCacheBackend, PromptCache
+from tools.prompt_registry import load_agent_prompts
+from tools.violence_detection_gemini import VIOLENCE_PROMPT
+
+IMAGE = "data/test_images/sample.jpg"
+RESPONSES = {"violence": ["YES, a weapon", "NO", "MAYBE"], "unknown": ["NO"]}
+
+def _run(use_model, prompt_cache, prompts):
+    fake = use_model(FakeGeminiModel(RESPONSES))
+    gemini_vision.use_prompt_cache(prompt_cache)
+    results = [gemini_vision.analyze_image_with_prompt(IMAGE, p, agent="violence") for p in prompts]
+    return fake, [r["response_text"] for r in results]
+
+def test_cached_prompts_give_the_same_answers_without_resending_text(use_model):
+    backend = LocalContextCacheBackend()
+    cache = PromptCache(backend)
+    plain, expected = _run(use_model, None, [VIOLENCE_PROMPT] * 3)
+    cached, answers = _run(use_model, cache, [VIOLENCE_PROMPT] * 3)
+    assert answers == expected
+    assert plain.prompt_chars == 3 * len(VIOLENCE_PROMPT)
+    assert cached.prompt_chars == 0
+    assert backend.created == 1 and cache.hits == 2
+
+def test_per_image_context_is_still_sent(use_model):
+    cache = PromptCache(LocalContextCacheBackend())
+    fake, _ = _run(use_model, cache, [VIOLENCE_PROMPT + "\n\nExtracted Text:\nhello"])
+    assert fake.prompt_chars == len("Extracted Text:\nhello")
+
+def test_entries_are_refreshed_before_expiry(use_model):
+    backend = LocalContextCacheBackend()
+    cache = PromptCache(backend, ttl_seconds=60, refresh_margin=120)  # always inside the margin
+    _run(use_model, cache, [VIOLENCE_PROMPT] * 2)
+    assert backend.created == 1 and backend.refreshed == 1
+    cache.close()
+    assert backend.deleted == 1
+
+def test_uncacheable_and_unknown_prompts_are_sent_inline(use_model):
+    class RejectingBackend(LocalContextCacheBackend):
+        def create(self, name, text, ttl_seconds):
+            raise ValueError("Cached content is too small")
+
+    cache = PromptCache(RejectingBackend())
+    fake, answers = _run(use_model, cache, [VIOLENCE_PROMPT, "Describe this image."])
+    assert fake.prompt_chars == len(VIOLENCE_PROMPT) + len("Describe this image.")
+    assert cache.stats()["uncacheable"] == 1
+
+def test_transient_create_failures_are_retried_later():
+    class ServiceUnavailable(Exception):
+        code = 503
+
+    class FlakyBackend(LocalContextCacheBackend):
+        failures = 1
+
+        def create(self, name, text, ttl_seconds):
+            if self.failures:
+                self.failures -= 1
+                raise ServiceUnavailable("The service is currently unavailable")
+            return super().create(name, text, ttl_seconds)
+
+    backend = FlakyBackend()
+    cache = PromptCache(backend, retry_seconds=0.2)
+    base = object()
+    assert cache.prepare(VIOLENCE_PROMPT, "image", base) == (base, [VIOLENCE_PROMPT, "image"])
+    assert cache.stats()["uncacheable"] == 0 and cache.stats()["retrying"] == 1
+    assert cache.prepare(VIOLENCE_PROMPT, "image", base)[0] is base  # not retried before the delay
+    time.sleep(0.25)
+    model, contents = cache.prepare(VIOLENCE_PROMPT, "image", base)
+    assert model is not base and contents == ["image"]
+    assert backend.created == 1 and cache.stats()["entries"] == 1
+
+def test_a_slow_create_does_not_hold_up_other_prompts():
+    other_prompt = load_agent_prompts()["drugs"]
+    started = threading.Event()
+    release = threading.Event()
+
+    class SlowBackend(LocalContextCacheBackend):
+        def create(self, name, text, ttl_seconds):
+            if text == VIOLENCE_PROMPT:
+                started.set()
+                release.wait(5)
+            return super().create(name, text, ttl_seconds)
+
+    cache = PromptCache(SlowBackend())
+    base = object()
+    slow = threading.Thread(target=cache.prepare, args=(VIOLENCE_PROMPT, "image", base))
+    slow.start()
+    assert started.wait(5)
+    try:
+        # Another prompt is created meanwhile; the same prompt goes inline instead of waiting
+        assert cache.prepare(other_prompt, "image", base)[0] is not base
+        assert cache.prepare(VIOLENCE_PROMPT, "image", base)[0] is base
+    finally:
+        release.set()
+        slow.join()
+    assert cache.prepare(VIOLENCE_PROMPT, "image", base)[0] is not base
+    assert cache.backend.created == 2
@@ -0,0 +1,55 @@
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image
+from tools import gemini_vision
+from tools.fake_gemini import FakeGeminiModel
+from tools.gemini_files import LocalFilesBackend, UploadedFileStore
+from tools.upload_encoding import UploadProfile
+
+PROFILE = UploadProfile(max_side=256, format="JPEG", quality=80)
+
+def _image(color, name):
+    path = os.path.join(tempfile.mkdtemp(), name)
+    Image.new("RGB", (512, 512), color).save(path)
+    return path
+
+def test_concurrent_agents_share_one_upload():
+    backend = LocalFilesBackend()
+    store = UploadedFileStore(backend)
+    path = _image((10, 20, 30), "shared.png")
+    with ThreadPoolExecutor(max_workers=7) as executor:
+        handles = list(executor.map(lambda _: store.handle_for(path, PROFILE), range(7)))
+    assert len({h.name for h in handles}) == 1
+    assert store.uploads == 1 and store.hits == 6
+
+def test_expiring_handles_are_replaced_and_deleted():
+    backend = LocalFilesBackend(ttl_seconds=5)
+    store = UploadedFileStore(backend, refresh_margin=10)  # always within the refresh margin
+    path = _image((200, 0, 0), "expiring.png")
+    first = store.handle_for(path, PROFILE)
+    second = store.handle_for(path, PROFILE)
+    assert first.name != second.name
+    assert first.name not in backend.files and backend.deleted == 1
+
+def test_lru_eviction_and_close_delete_remote_files():
+    backend = LocalFilesBackend()
+    store = UploadedFileStore(backend, max_entries=2)
+    for i in range(3):
+        store.handle_for(_image((i * 60, 0, 0), f"img{i}.png"), PROFILE)
+    assert len(backend.files) == 2 and backend.deleted == 1
+    store.close()
+    assert backend.files == {}
+
+def test_file_references_get_the_same_answers_without_resending_bytes(use_model):
+    path = _image((0, 90, 0), "answer.png")
+    prompt = "Is there a weapon? Answer YES or NO."
+    fake = use_model(FakeGeminiModel({"unknown": ["YES", "NO", "MAYBE"]}))
+    inline = gemini_vision.analyze_image_with_prompt(path, prompt)
+    inline_bytes = fake.bytes_received
+    store = UploadedFileStore(LocalFilesBackend())
+    gemini_vision.use_file_store(store)
+    by_reference = [gemini_vision.analyze_image_with_prompt(path, prompt) for _ in range(3)]
+    assert all(r["response_text"] == inline["response_text"] for r in by_reference)
+    assert fake.bytes_received == inline_bytes
+    assert store.uploads == 1
@@ -0,0 +1,73 @@
+import os
+
+from PIL import Image
+
+from tools import gemini_vision
+from tools.central_moderation_pipeline import run_central_moderation_batch, run_central_moderation_pipeline
+from tools.fake_gemini import FakeGeminiModel, FakeResponse
+from tools.gemini_batching import RequestCollector
+from tools.gemini_packing import analyze_images_with_prompt, parse_packed_response, resolve_packed
+from tools.violence_detection_gemini import VIOLENCE_PROMPT
+
+RESPONSES = {"violence": ["YES, a weapon", "NO", "MAYBE"], "unknown": ["NO"]}
+
+def _images(tmp_path, count):
+    paths = []
+    for i in range(count):
+        path = os.path.join(tmp_path, f"image_{i}.png")
+        Image.new("RGB", (64, 64), (i * 40 % 256, 90, 200)).save(path)
+        paths.append(path)
+    return paths
+
+def test_parse_packed_response():
+    text = '```json\n[{"image": 2, "answer": "NO"}, {"image": 1, "answer": " YES "}]\n```'
+    assert parse_packed_response(text, 2) == ["YES", "NO"]
+    assert parse_packed_response(text, 3) is None
+    assert parse_packed_response('[{"image": 1, "answer": "NO"}, {"image": 1, "answer": "NO"}]', 2) is None
+    assert parse_packed_response("YES, a weapon", 1) is None
+
+def test_packed_answers_match_single_image_calls(tmp_path, use_model):
+    paths = _images(tmp_path, 5)
+    use_model(FakeGeminiModel(RESPONSES))
+    expected = [gemini_vision.analyze_image_with_prompt(p, VIOLENCE_PROMPT, agent="violence") for p in paths]
+    fake = use_model(FakeGeminiModel(RESPONSES))
+    packed = analyze_images_with_prompt(paths, VIOLENCE_PROMPT, agent="violence")
+    assert packed == expected
+    assert fake.calls == 1
+
+def test_unparseable_reply_falls_back_to_single_calls(tmp_path, use_model):
+    class ProseModel(FakeGeminiModel):
+        def generate_content(self, contents, **kwargs):
+            response = super().generate_content(contents, **kwargs)
+            return FakeResponse("Image 1 looks fine.") if len(contents) > 2 else response
+
+    paths = _images(tmp_path, 3)
+    fake = use_model(ProseModel(RESPONSES))
+    results = analyze_images_with_prompt(paths, VIOLENCE_PROMPT, agent="violence")
+    assert [r["status"] for r in results] == ["success"] * 3
+    assert fake.calls == 4
+
+def test_collected_requests_are_resolved_in_place(tmp_path, use_model):
+    paths = _images(tmp_path, 5)
+    collector = RequestCollector()
+    fake = use_model(FakeGeminiModel(RESPONSES))
+    gemini_vision.use_request_collector(collector)
+    results = [gemini_vision.analyze_image_with_prompt(p, VIOLENCE_PROMPT, agent="violence") for p in paths]
+    results[0]["extra"] = "kept"
+    assert [r["status"] for r in results] == ["pending"] * 5
+    gemini_vision.use_request_collector(None)
+    stats = resolve_packed(collector.requests, pack_size=2)
+    assert [r["status"] for r in results] == ["success"] * 5
+    assert results[0]["extra"] == "kept"
+    assert stats["packed_calls"] == 2 and stats["single_calls"] == 1
+    assert fake.calls == 3
+
+def test_batch_pipeline_matches_per_image_pipeline(tmp_path, use_model):
+    paths = _images(tmp_path, 4)
+    single = use_model(FakeGeminiModel.from_file())
+    expected = [run_central_moderation_pipeline(p) for p in paths]
+    packed = use_model(FakeGeminiModel.from_file())
+    reports = run_central_moderation_batch(paths, pack_size=4)
+    assert [r["final_decision"] for r in reports] == [r["final_decision"] for r in expected]
+    assert [r["confidence_scores"] for r in reports] == [r["confidence_scores"] for r in expected]
+    assert packed.calls < single.calls
@@ -0,0 +1,146 @@
+import csv
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import demo_xlsx_batch_pipeline
+from tools import image_fetch
+from tools.fake_gemini import FakeGeminiModel
+from tools.image_fetch import ImageFetcher, fetch_image, is_downloaded, normalize_url
+
+IMAGE = open("data/test_images/sample.jpg", "rb").read()
+
+class Server(BaseHTTPRequestHandler):
+    requests = []
+
+    def do_GET(self):
+        Server.requests.append((self.path, self.headers.get("If-None-Match")))
+        if self.path.startswith("/cdn/asset"):
+            if self.headers.get("If-None-Match") == '"v1"':
+                self.send_response(304)
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header("ETag", '"v1"')
+        elif self.path == "/plain":
+            self.send_response(200)
+        elif self.path == "/slow":
+            time.sleep(0.5)
+            self.send_response(200)
+        else:
+            self.send_response(404)
+            self.end_headers()
+            return
+        self.send_header("Content-Length", str(len(IMAGE)))
+        self.end_headers()
+        self.wfile.write(IMAGE)
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def server():
+    Server.requests = []
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Server)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{httpd.server_port}"
+    httpd.shutdown()
+
+def test_normalize_url():
+    assert normalize_url(" HTTPS://CDN.Example.com:443/a/b.jpg?w=2&utm_source=mail&a=1#top ") == "https://cdn.example.com/a/b.jpg?a=1&w=2"
+    assert normalize_url("http://cdn.example.com:8080") == "http://cdn.example.com:8080/"
+    assert normalize_url("data/test_images/./sample.jpg") == "data/test_images/sample.jpg"
+
+def test_conditional_fetches_reuse_the_cached_copy(server, tmp_path):
+    fetcher = ImageFetcher(str(tmp_path / "fetch_cache.sqlite"))
+    first = fetcher.fetch(f"{server}/cdn/asset?id=7")
+    assert first.status == "cached" and first.path.endswith(".jpg") and not is_downloaded(first.path)
+    assert open(first.path, "rb").read() == IMAGE
+
+    # A new fetcher on the same cache (the next run) revalidates instead of downloading
+    fetcher = ImageFetcher(str(tmp_path / "fetch_cache.sqlite"))
+    again = fetcher.fetch(server.replace("http://", "HTTP://") + "/cdn/asset?id=7#preview")
+    assert (again.status, again.path) == ("not_modified", first.path)
+    assert Server.requests[-1] == ("/cdn/asset?id=7", '"v1"')
+
+    # Requests go to the URL as written; only the cache key is normalized
+    signed = fetcher.fetch(f"{server}/cdn/asset?sig=ab+cd/ef=&x")
+    assert signed.url == f"{server}/cdn/asset?sig=ab%20cd%2Fef%3D&x="
+    assert Server.requests[-1] == ("/cdn/asset?sig=ab+cd/ef=&x", None)
+
+    # Without validators there is nothing to revalidate: a temp download, as before
+    plain = fetcher.fetch(f"{server}/plain")
+    assert plain.status == "downloaded" and is_downloaded(plain.path)
+    assert fetcher.metrics()["cached_files"] == 2
+
+def test_dead_urls_are_not_requested_again_until_the_ttl(server, tmp_path):
+    fetcher = ImageFetcher(str(tmp_path / "fetch_cache.sqlite"), timeout=0.1, transient_ttl=0.0)
+    assert fetcher.fetch(f"{server}/gone.jpg").error == "HTTP 404"
+    assert fetcher.fetch(f"{server}/slow").error == "Timed out after 0.1 seconds"
+
+    fetcher = ImageFetcher(str(tmp_path / "fetch_cache.sqlite"), timeout=0.1, transient_ttl=0.0)
+    count = len(Server.requests)
+    result = fetcher.fetch(f"{server}/gone.jpg")
+    assert (result.status, result.error, len(Server.requests)) == ("known_failure", "HTTP 404", count)
+    # Timeouts are retried once their (here zero) TTL is over
+    assert fetcher.fetch(f"{server}/slow").status == "failed"
+    assert fetcher.metrics()["known_failures"] == 2
+
+def test_sheet_rows_share_one_moderation_per_url(server, tmp_path, monkeypatch, use_model):
+    input_path = tmp_path / "sheet.csv"
+    with open(input_path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["row", "image_url"])
+        for row, url in enumerate([f"{server}/cdn/asset", f"{server}/gone.jpg", f" {server}/cdn/asset#x ",
+                                   f"{server}/gone.jpg", f"{server}/cdn/asset?utm_source=mail"]):
+            writer.writerow([row, url])
+
+    moderated = []
+    run = demo_xlsx_batch_pipeline.run_central_moderation_pipeline
+    monkeypatch.setattr(demo_xlsx_batch_pipeline, "run_central_moderation_pipeline",
+                        lambda path: moderated.append(path) or run(path))
+    use_model(FakeGeminiModel.from_file())
+    demo_xlsx_batch_pipeline.main(["--input", str(input_path), "--output", str(tmp_path / "out.csv"),
+                                   "--fetch-cache", str(tmp_path / "cache" / "fetch_cache.sqlite")])
+
+    with open(tmp_path / "out.csv") as f:
+        rows = list(csv.DictReader(f))
+    assert len(moderated) == 1 and [row["row"] for row in rows] == ["0", "1", "2", "3", "4"]
+    decision = rows[0]["CM_ADK Decision"]
+    assert decision in ("A", "R", "F") and [row["CM_ADK Decision"] for row in rows] == [decision, "Error", decision, "Error", decision]
+    assert rows[2]["nudity"] == rows[0]["nudity"] and rows[4]["violence"] == rows[0]["violence"]
+    assert [path for path, _ in Server.requests] == ["/cdn/asset", "/gone.jpg"]
+
+def test_sheet_verdicts_are_bounded(server, tmp_path, monkeypatch, use_model):
+    input_path = tmp_path / "sheet.csv"
+    input_path.write_text("row,image_url\n" + "".join(
+        f"{row},{server}{path}\n" for row, path in enumerate(["/cdn/asset", "/gone.jpg", "/cdn/asset", "/cdn/asset"])))
+    monkeypatch.setattr(demo_xlsx_batch_pipeline, "VERDICT_CACHE_SIZE", 1)
+    moderated = []
+    run = demo_xlsx_batch_pipeline.run_central_moderation_pipeline
+    monkeypatch.setattr(demo_xlsx_batch_pipeline, "run_central_moderation_pipeline",
+                        lambda path: moderated.append(path) or run(path))
+    use_model(FakeGeminiModel.from_file())
+    demo_xlsx_batch_pipeline.main(["--input", str(input_path), "--output", str(tmp_path / "out.csv"),
+                                   "--fetch-cache", str(tmp_path / "cache" / "fetch_cache.sqlite")])
+
+    with open(tmp_path / "out.csv") as f:
+        decisions = [row["CM_ADK Decision"] for row in csv.DictReader(f)]
+    # The dead URL's verdict evicts the first one, so its next row is moderated again; the last reuses it
+    assert len(moderated) == 2
+    assert decisions == [decisions[0], "Error", decisions[0], decisions[0]]
+
+def test_sheet_without_image_urls_restores_the_fetcher(tmp_path):
+    input_path = tmp_path / "sheet.csv"
+    input_path.write_text("row,url\n0,https://example.com/a.jpg\n")
+    previous = image_fetch.fetcher
+    demo_xlsx_batch_pipeline.main(["--input", str(input_path), "--output", str(tmp_path / "out.csv"),
+                                   "--fetch-cache", str(tmp_path / "cache" / "fetch_cache.sqlite")])
+    assert image_fetch.fetcher is previous
+
+def test_local_paths_and_missing_files():
+    assert fetch_image("data/test_images/./sample.jpg").path == "data/test_images/sample.jpg"
+    missing = fetch_image("data/test_images/missing.jpg")
+    assert (missing.ok, missing.status) == (False, "missing")
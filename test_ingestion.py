@@ -1,4 +1,73 @@
+import os
+import shutil
+import struct
+import tempfile
+import zlib
+
+from PIL import Image
+
+from tools.image_fetch import DOWNLOAD_PREFIX, remove_download
 from tools.image_preprocessor import image_preprocessor
 
 result = image_preprocessor("data/test_images/sample.jpg")
 print(result)
+
+def test_small_images_pass_through_whatever_their_name(tmp_path):
+    image_path = str(tmp_path / "cdn-asset")
+    shutil.copyfile("data/test_images/sample.jpg", image_path)
+    original = open(image_path, "rb").read()
+    result = image_preprocessor(image_path)
+    assert result["status"] == "success" and result["format"] == "JPEG"
+    assert result["output_path"] == image_path and result["new_size"] == result["original_size"]
+    assert open(image_path, "rb").read() == original
+
+def test_large_images_are_resized_next_to_the_input(tmp_path):
+    image_path = str(tmp_path / "large.png")
+    Image.new("RGB", (2048, 1024), "red").save(image_path)
+    result = image_preprocessor(image_path)
+    assert result["output_path"] == str(tmp_path / "large.ingested.png")
+    assert result["new_size"] == (1024, 512)
+    with Image.open(image_path) as original:
+        assert original.size == (2048, 1024)
+
+def test_downloads_keep_their_bytes_and_are_removed_with_their_ingested_copy():
+    fd, image_path = tempfile.mkstemp(prefix=DOWNLOAD_PREFIX)
+    os.close(fd)
+    frames = [Image.new("RGB", (64, 32), color) for color in ("blue", "yellow")]
+    frames[0].save(image_path, format="GIF", save_all=True, append_images=frames[1:])
+    original = open(image_path, "rb").read()
+    try:
+        result = image_preprocessor(image_path)
+        assert result["output_path"] == image_path + ".ingested.png"
+        assert open(image_path, "rb").read() == original
+    finally:
+        remove_download(image_path)
+    assert not os.path.exists(image_path) and not os.path.exists(result["output_path"])
+
+def test_animations_are_reduced_to_their_first_frame(tmp_path):
+    for extension in ("gif", "webp"):
+        image_path = str(tmp_path / f"clip.{extension}")
+        frames = [Image.new("RGB", (64, 32), color) for color in ("blue", "yellow")]
+        frames[0].save(image_path, save_all=True, append_images=frames[1:])
+        result = image_preprocessor(image_path)
+        assert result["format"] == extension.upper() and result["animated"]
+        with Image.open(result["output_path"]) as first_frame:
+            assert first_frame.format == "PNG" and first_frame.size == (64, 32)
+            assert first_frame.convert("RGB").getpixel((0, 0))[2] > 200
+
+def test_bad_inputs_are_rejected_before_decoding(tmp_path):
+    not_an_image = tmp_path / "notes.jpg"
+    not_an_image.write_text("hello")
+    assert image_preprocessor(str(not_an_image))["message"] == "Unsupported file type: .jpg"
+
+    truncated = tmp_path / "truncated.jpg"
+    truncated.write_bytes(open("data/test_images/sample.jpg", "rb").read()[:2000])
+    assert image_preprocessor(str(truncated))["message"] == "Truncated JPEG image"
+
+    # A well-formed PNG whose header claims 8000x8000 pixels (above INGEST_MAX_PIXELS)
+    ihdr = struct.pack(">IIBBBBB", 8000, 8000, 8, 2, 0, 0, 0)
+    chunk = lambda kind, data: struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+    bomb = tmp_path / "bomb.png"
+    bomb.write_bytes(b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", ihdr) + chunk(b"IDAT", zlib.compress(b"")) + chunk(b"IEND", b""))
+    result = image_preprocessor(str(bomb))
+    assert result["status"] == "error" and "8000x8000" in result["message"]
@@ -0,0 +1,61 @@
+import json
+import os
+import tempfile
+import pytest
+from openpyxl import Workbook
+from tools.input_readers import count_rows, iter_rows, parse_shard, shard_bounds
+
+ROWS = [{"image_url": f"http://example.com/{i}.jpg", "label": "R" if i % 2 else "A"} for i in range(7)]
+
+def _write(name, writer):
+    path = os.path.join(tempfile.mkdtemp(), name)
+    writer(path)
+    return path
+
+def write_xlsx(path):
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("images")
+    ws.append(["image_url", "label"])
+    for row in ROWS:
+        ws.append([row["image_url"], row["label"]])
+    wb.save(path)
+
+def write_csv(path):
+    with open(path, "w") as f:
+        f.write("image_url,label\n" + "".join(f"{r['image_url']},{r['label']}\n" for r in ROWS))
+
+def write_jsonl(path):
+    with open(path, "w") as f:
+        f.write("".join(json.dumps(r) + "\n" for r in ROWS))
+
+@pytest.mark.parametrize("name,writer", [("in.xlsx", write_xlsx), ("in.csv", write_csv), ("in.jsonl", write_jsonl)])
+def test_readers_yield_indexed_rows(name, writer):
+    path = _write(name, writer)
+    sheet = "images" if name.endswith(".xlsx") else None
+    rows = list(iter_rows(path, sheet))
+    assert [index for index, _ in rows] == list(range(len(ROWS)))
+    assert [row for _, row in rows] == ROWS
+    assert count_rows(path, sheet) == len(ROWS)
+    assert [index for index, _ in iter_rows(path, sheet, start=2, stop=5)] == [2, 3, 4]
+
+def test_rows_are_read_lazily():
+    path = _write("in.csv", write_csv)
+    rows = iter_rows(path)
+    assert next(rows) == (0, ROWS[0])
+
+def test_shards_cover_every_row_once():
+    for total in (0, 1, 7, 10):
+        for shards in (1, 3, 4):
+            covered = []
+            for i in range(shards):
+                start, stop = shard_bounds(total, i, shards)
+                covered.extend(range(start, stop))
+            assert covered == list(range(total))
+    assert parse_shard("1/4") == (1, 4)
+    with pytest.raises(ValueError):
+        shard_bounds(10, 4, 4)
+
+def test_unsupported_format():
+    path = _write("in.txt", lambda p: open(p, "w").close())
+    with pytest.raises(ValueError):
+        list(iter_rows(path))
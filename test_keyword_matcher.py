@@ -0,0 +1,45 @@
+import random
+import pytest
+from tools.keyword_matcher import KeywordMatcher, ahocorasick
+from tools.response_parsing import CONFIDENCE_LEVELS, VIOLATION_KEYWORDS, extract_confidence_from_response, parse_violation_type
+from benchmark_keyword_matcher import legacy_extract_confidence, legacy_parse_violation_type, load_responses
+
+BACKENDS = ["regex", "scan"] + (["automaton"] if ahocorasick is not None else [])
+
+def substring_categories(table, text):
+    return {name for name, phrases in table if any(phrase in text for phrase in phrases)}
+
+def random_texts(table, count=300, seed=7):
+    """Texts stitched from phrase fragments so that overlaps and prefixes are common."""
+    rng = random.Random(seed)
+    pieces = [p for _, phrases in table for p in phrases] + [" ", "-", "K", "ING", "ES", "NOT "]
+    fragments = pieces + [p[:rng.randint(1, len(p))] for p in pieces] + [p[-rng.randint(1, len(p)):] for p in pieces]
+    return ["".join(rng.choice(fragments) for _ in range(rng.randint(1, 12))) for _ in range(count)]
+
+@pytest.mark.parametrize("backend", BACKENDS)
+@pytest.mark.parametrize("table", [CONFIDENCE_LEVELS, VIOLATION_KEYWORDS])
+def test_matcher_has_substring_semantics(backend, table):
+    matcher = KeywordMatcher(table, backend=backend)
+    for text in random_texts(table):
+        assert matcher.match(text) == substring_categories(table, text), text
+
+@pytest.mark.parametrize("backend", [b for b in BACKENDS if b != "scan"])
+def test_word_boundaries(backend):
+    matcher = KeywordMatcher([("no", ["NO"]), ("might", ["MIGHT"]), ("might_be", ["MIGHT BE"])], word_boundaries=True, backend=backend)
+    assert matcher.match("I KNOW NOTHING") == set()
+    assert matcher.match("NO, IT MIGHT BE") == {"no", "might", "might_be"}
+    assert matcher.match("MIGHTY BEES") == set()
+
+def test_parsers_match_legacy_on_recorded_and_fuzzed_responses():
+    texts = load_responses("data/recorded_responses/gemini_responses.json")
+    texts += random_texts(CONFIDENCE_LEVELS) + random_texts(VIOLATION_KEYWORDS, seed=11) + ["", "yes, clearly a gun"]
+    for text in texts:
+        assert extract_confidence_from_response(text) == legacy_extract_confidence(text), text
+        assert parse_violation_type(text) == legacy_parse_violation_type(text), text
+
+if __name__ == "__main__":
+    for backend in BACKENDS:
+        for table in (CONFIDENCE_LEVELS, VIOLATION_KEYWORDS):
+            test_matcher_has_substring_semantics(backend, table)
+    test_parsers_match_legacy_on_recorded_and_fuzzed_responses()
+    print("✅ Keyword matcher tests passed!")
@@ -0,0 +1,49 @@
+from tools.local_pii_detector import luhn_valid, scan_text_for_pii, summarize_matches, verhoeff_valid
+from tools.response_parsing import parse_violation_type
+
+def types(scan):
+    return [hit["type"] for hit in scan["matches"]]
+
+def test_checksums():
+    assert verhoeff_valid("234567890124")
+    assert not verhoeff_valid("234567890123")
+    assert luhn_valid("4111111111111111")
+    assert not luhn_valid("4111111111111112")
+
+def test_detects_indian_pii_with_spans():
+    text = ("Call +91 98765 43210, mail sales@example.in, Aadhaar 2345 6789 0124, "
+            "PAN ABCPE1234F, IFSC SBIN0001234, card 4111-1111-1111-1111")
+    scan = scan_text_for_pii(text)
+    assert types(scan) == ["phone", "email", "aadhaar", "pan", "ifsc", "card"]
+    assert scan["pii_found"] and not scan["needs_review"]
+    phone = scan["matches"][0]
+    assert text[phone["start"]:phone["end"]] == "+91 98765 43210"
+    assert phone["masked"].endswith("3210") and "98765" not in phone["masked"]
+
+def test_checksum_failures_are_ambiguous():
+    scan = scan_text_for_pii("Ref 2345 6789 0123")
+    assert not scan["pii_found"]
+    assert scan["needs_review"]
+    assert scan["ambiguous"][0]["type"] == "number"
+
+def test_context_words_without_pii_are_ambiguous():
+    scan = scan_text_for_pii("Aadhaar card required at the counter")
+    assert scan["needs_review"]
+    assert scan["ambiguous"][0]["masked"] == "Aadhaar"
+
+def test_clean_text():
+    scan = scan_text_for_pii("Fresh organic tomatoes, 1 kg pack, price 120")
+    assert scan == {"matches": [], "ambiguous": [], "pii_found": False, "needs_review": False}
+
+def test_summary_maps_to_personal_information_only():
+    scan = scan_text_for_pii("sales@example.in 9876543210 SBIN0001234")
+    assert parse_violation_type(summarize_matches(scan["matches"])) == ["personal information"]
+
+if __name__ == "__main__":
+    test_checksums()
+    test_detects_indian_pii_with_spans()
+    test_checksum_failures_are_ambiguous()
+    test_context_words_without_pii_are_ambiguous()
+    test_clean_text()
+    test_summary_maps_to_personal_information_only()
+    print("✅ Local PII detector tests passed!")
@@ -0,0 +1,69 @@
+import os
+import tempfile
+import numpy as np
+from PIL import Image, ImageDraw
+from tools import ocr_stage
+from tools.ocr_stage import OcrConfig, edge_density, extract_text, extract_texts, otsu_threshold, prepare_for_ocr
+
+def _save(img, name):
+    path = os.path.join(tempfile.mkdtemp(), name)
+    img.save(path)
+    return path
+
+def _text_image(label="Call 98765 43210"):
+    img = Image.new("RGB", (400, 120), (255, 255, 255))
+    draw = ImageDraw.Draw(img)
+    for row in range(4):
+        draw.text((10, 10 + row * 25), f"{label} line {row}", fill=(0, 0, 0))
+    return img
+
+def _count_tesseract(monkeypatch):
+    calls = []
+    def fake_image_to_string(image, lang=None, config=None):
+        calls.append((image.mode, image.size, config))
+        return "Call 98765 43210"
+    monkeypatch.setattr(ocr_stage.pytesseract, "image_to_string", fake_image_to_string)
+    return calls
+
+def test_edge_density_separates_text_from_flat_images():
+    flat = Image.new("L", (400, 120), 200)
+    assert edge_density(flat, 40) == 0.0
+    assert edge_density(_text_image().convert("L"), 40) > 0.01
+
+def test_text_free_image_skips_tesseract(monkeypatch):
+    calls = _count_tesseract(monkeypatch)
+    result = extract_text(_save(Image.new("RGB", (300, 300), (10, 120, 200)), "flat.png"), OcrConfig())
+    assert result["text"] == "" and not result["text_detected"]
+    assert calls == []
+
+def test_ocr_runs_on_binarized_rescaled_image_and_is_cached(monkeypatch):
+    calls = _count_tesseract(monkeypatch)
+    config = OcrConfig(psm=6, oem=1, min_side=800)
+    path = _save(_text_image(), "text.png")
+    copy = _save(_text_image(), "same_content.png")
+
+    assert extract_text(path, config)["text"] == "Call 98765 43210"
+    assert extract_text(copy, config)["text_detected"]
+    assert len(calls) == 1
+    mode, size, args = calls[0]
+    assert mode == "L" and max(size) == 800
+    assert args == "--psm 6 --oem 1"
+
+def test_prepare_for_ocr_binarizes():
+    gray = Image.fromarray(np.array([[20, 30, 220, 230]] * 4, dtype=np.uint8))
+    assert 30 <= otsu_threshold(np.asarray(gray)) < 220
+    out = np.asarray(prepare_for_ocr(gray, OcrConfig(max_side=None, min_side=None)))
+    assert set(np.unique(out)) == {0, 255}
+
+def test_otsu_threshold_on_flat_image():
+    assert otsu_threshold(np.full((4, 4), 200, dtype=np.uint8)) == 127
+    out = np.asarray(prepare_for_ocr(Image.new("L", (8, 8), 200), OcrConfig(max_side=None, min_side=None)))
+    assert set(np.unique(out)) == {255}
+
+def test_batch_dedupes_by_content(monkeypatch):
+    calls = _count_tesseract(monkeypatch)
+    config = OcrConfig(psm=11)
+    paths = [_save(_text_image("Batch"), f"b{i}.png") for i in range(3)]
+    results = extract_texts(paths, config, workers=1)
+    assert set(results) == set(paths)
+    assert len(calls) == 1
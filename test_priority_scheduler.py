@@ -0,0 +1,102 @@
+import shutil
+import threading
+import time
+
+import pytest
+
+from tools import gemini_vision
+from tools.central_moderation_pipeline import run_central_moderation_pipeline
+from tools.deadlines import DeadlineExceeded
+from tools.fake_gemini import FakeGeminiModel
+from tools.priority_scheduler import Lane, PriorityScheduler, lane_scope, load_lanes
+
+IMAGE = "data/test_images/sample.jpg"
+
+def _wait_for_queue(scheduler, lane, depth):
+    for _ in range(500):
+        if scheduler.metrics()["lanes"][lane]["queue_depth"] >= depth:
+            return
+        time.sleep(0.01)
+    raise AssertionError(f"{lane} never reached queue depth {depth}")
+
+def _dispatch_order(scheduler, waiters):
+    """Hold the only slot, queue `waiters` (lane names) in order, then record the order slots are granted in."""
+    held = scheduler.acquire("hold")
+    order = []
+
+    def call(lane):
+        name = scheduler.acquire(lane)
+        order.append(name)
+        scheduler.release(name)
+
+    threads = []
+    for i, lane in enumerate(waiters):
+        threads.append(threading.Thread(target=call, args=(lane,)))
+        threads[-1].start()
+        _wait_for_queue(scheduler, lane, waiters[:i + 1].count(lane))
+    scheduler.release(held)
+    for thread in threads:
+        thread.join()
+    return order
+
+def test_default_config_defines_the_three_lanes():
+    default_lane, lanes = load_lanes()
+    assert default_lane == "standard"
+    assert set(lanes) == {"interactive", "standard", "backfill"}
+    assert lanes["backfill"].idle_only and not lanes["interactive"].idle_only
+
+def test_weighted_fair_queueing_shares_contended_slots_by_weight():
+    scheduler = PriorityScheduler(capacity=1, lanes={
+        "hold": Lane("hold"),
+        "interactive": Lane("interactive", weight=3),
+        "standard": Lane("standard", weight=1),
+    })
+    order = _dispatch_order(scheduler, ["standard"] * 6 + ["interactive"] * 6)
+    assert order[:4].count("interactive") == 3
+    assert sorted(order) == sorted(["standard"] * 6 + ["interactive"] * 6)
+
+def test_backfill_only_gets_idle_capacity():
+    scheduler = PriorityScheduler(capacity=1, lanes={
+        "hold": Lane("hold"),
+        "standard": Lane("standard"),
+        "backfill": Lane("backfill", weight=100, idle_only=True),
+    })
+    assert _dispatch_order(scheduler, ["backfill", "backfill", "standard"]) == ["standard", "backfill", "backfill"]
+
+def test_backfill_leaves_reserved_slots_free():
+    scheduler = PriorityScheduler(capacity=4)  # interactive reserves 2, standard 1
+    backfill = scheduler.acquire("backfill")
+    with pytest.raises(DeadlineExceeded):
+        scheduler.acquire("backfill", timeout=0.05)
+    started = time.perf_counter()
+    slots = [scheduler.acquire("interactive"), scheduler.acquire("interactive"), scheduler.acquire("standard")]
+    assert time.perf_counter() - started < 0.1
+    for lane in slots + [backfill]:
+        scheduler.release(lane)
+    metrics = scheduler.metrics()
+    assert metrics["in_flight"] == 0
+    assert metrics["lanes"]["backfill"]["timed_out"] == 1
+    assert metrics["lanes"]["interactive"]["dispatched"] == 2
+
+def test_overdue_lane_jumps_ahead():
+    scheduler = PriorityScheduler(capacity=1, lanes={
+        "hold": Lane("hold"),
+        "heavy": Lane("heavy", weight=100),
+        "light": Lane("light", weight=1, sla_seconds=0.0),
+    })
+    order = _dispatch_order(scheduler, ["heavy", "heavy", "light"])
+    assert order[0] == "light"
+    assert scheduler.metrics()["lanes"]["light"]["sla_misses"] == 1
+
+def test_pipeline_calls_run_in_the_callers_lane(tmp_path, use_model):
+    image_path = str(tmp_path / "sample.jpg")
+    shutil.copyfile(IMAGE, image_path)
+    scheduler = PriorityScheduler()
+    use_model(FakeGeminiModel.from_file())
+    gemini_vision.use_scheduler(scheduler)
+    with lane_scope("interactive"):
+        report = run_central_moderation_pipeline(image_path)
+    assert report["status"] == "success"
+    lanes = scheduler.metrics()["lanes"]
+    assert lanes["interactive"]["dispatched"] > 0
+    assert lanes["standard"]["dispatched"] == 0 and lanes["backfill"]["dispatched"] == 0
@@ -0,0 +1,55 @@
+import json
+from tools import gemini_vision
+from tools.central_moderation_pipeline import export_json_report
+from tools.fake_gemini import FakeGeminiModel
+from tools.prompt_registry import CONTEXT_SUFFIX, prompt_registry, version_id
+from tools.report_format import compact_report, expand_report
+from tools.violence_detection_gemini import VIOLENCE_PROMPT
+
+def sample_report():
+    agent_results = {
+        "nudity": {"status": "success", "label": "safe"},
+        "violence": {"status": "success", "prompt_id": prompt_registry.id_for(VIOLENCE_PROMPT), "response_text": "NO"},
+    }
+    return {"status": "success", "final_decision": "Accept", "violations": [], "agent_results": agent_results,
+            "confidence_scores": {"violence": 0.1}}
+
+def test_prompt_ids_are_versioned():
+    prompt_id = prompt_registry.id_for(VIOLENCE_PROMPT)
+    assert prompt_id == version_id("violence", VIOLENCE_PROMPT)
+    assert prompt_id.startswith("violence@")
+    assert prompt_registry.id_for(VIOLENCE_PROMPT + " Be strict.") == prompt_id + CONTEXT_SUFFIX
+    assert prompt_registry.text_for(prompt_id) == VIOLENCE_PROMPT
+    adhoc = prompt_registry.id_for("Describe this image.")
+    assert adhoc.startswith("adhoc@") and prompt_registry.text_for(adhoc) == "Describe this image."
+
+def test_gemini_results_carry_prompt_id_not_text(use_model):
+    use_model(FakeGeminiModel({"violence": ["NO"]}))
+    result = gemini_vision.analyze_image_with_prompt("data/test_images/sample.jpg", VIOLENCE_PROMPT, agent="violence")
+    assert result["status"] == "success"
+    assert "prompt" not in result
+    assert result["prompt_id"] == prompt_registry.id_for(VIOLENCE_PROMPT)
+
+def test_expand_and_compact_round_trip():
+    report = sample_report()
+    verbose = expand_report(report)
+    assert verbose["agent_results"]["violence"]["prompt"] == VIOLENCE_PROMPT
+    assert verbose["detailed_report"] == verbose["agent_results"]
+    assert "confidence_table_reference" in verbose
+    assert compact_report(verbose) == report
+
+def test_legacy_reports_with_prompt_text_are_compacted():
+    legacy = sample_report()
+    legacy["agent_results"]["violence"] = {"status": "success", "prompt": VIOLENCE_PROMPT, "response_text": "NO"}
+    legacy["detailed_report"] = legacy["agent_results"]
+    compact = compact_report(legacy)
+    assert "detailed_report" not in compact
+    assert compact["agent_results"]["violence"]["prompt_id"].startswith("violence@")
+
+def test_export_is_compact_unless_verbose():
+    report = sample_report()
+    compact = json.loads(export_json_report(report))
+    verbose = json.loads(export_json_report(report, verbose=True))
+    assert "confidence_table_reference" not in compact and "detailed_report" not in compact
+    assert "confidence_table_reference" in verbose
+    assert len(json.dumps(verbose)) > 2 * len(json.dumps(compact))
@@ -0,0 +1,85 @@
+import contextlib
+import itertools
+import threading
+import time
+
+import pytest
+
+from tools.request_hedging import Hedger
+
+def _warm(hedger, latency=0.01, key="default"):
+    for _ in range(hedger.min_samples):
+        hedger.record(key, latency)
+
+def _scripted(*steps):
+    """fn whose n-th call sleeps steps[n][0] seconds, then returns or raises steps[n][1]."""
+    counter = itertools.count()
+    lock = threading.Lock()
+
+    def fn():
+        with lock:
+            delay, outcome = steps[next(counter)]
+        time.sleep(delay)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    return fn
+
+def test_no_hedging_until_latencies_are_known():
+    hedger = Hedger(percentile=90, budget=1.0)
+    assert hedger.hedge_delay("default") is None
+    assert hedger.call(_scripted((0.0, "only"))) == "only"
+    assert hedger.metrics()["hedged"] == 0
+
+def test_slow_call_is_hedged_and_fast_duplicate_wins():
+    hedger = Hedger(percentile=90, budget=1.0)
+    _warm(hedger)
+    start = time.perf_counter()
+    assert hedger.call(_scripted((1.0, "slow"), (0.0, "fast"))) == "fast"
+    assert time.perf_counter() - start < 0.5
+    metrics = hedger.metrics()
+    assert metrics["hedged"] == 1 and metrics["hedge_wins"] == 1 and metrics["hedge_rate"] == 1.0
+
+def test_budget_caps_hedges():
+    hedger = Hedger(percentile=90, budget=0.0)
+    _warm(hedger)
+    assert hedger.call(_scripted((0.1, "slow"), (0.0, "fast"))) == "slow"
+    assert hedger.metrics()["hedged"] == 0
+
+def test_first_success_is_used_and_errors_only_when_all_fail():
+    hedger = Hedger(percentile=90, budget=1.0)
+    _warm(hedger)
+    assert hedger.call(_scripted((0.05, ValueError("boom")), (0.1, "hedge"))) == "hedge"
+    with pytest.raises(ValueError):
+        hedger.call(_scripted((0.05, ValueError("boom")), (0.0, ValueError("again"))))
+
+def test_latencies_are_tracked_per_key():
+    hedger = Hedger(percentile=50, budget=1.0)
+    _warm(hedger, 0.5, key="violence")
+    assert hedger.hedge_delay("violence") == 0.5
+    assert hedger.hedge_delay("drugs") is None
+
+def test_queued_calls_are_not_hedged():
+    hedger = Hedger(percentile=90, budget=1.0)
+    _warm(hedger)
+    gate = threading.Semaphore(0)
+
+    @contextlib.contextmanager
+    def slot():
+        gate.acquire()
+        try:
+            yield
+        finally:
+            gate.release()
+
+    # The primary waits 0.3 s for its slot, far beyond the 10 ms hedge delay
+    threading.Timer(0.3, gate.release).start()
+    assert hedger.call(_scripted((0.0, "primary")), slot=slot) == "primary"
+    assert hedger.metrics()["hedged"] == 0
+    assert hedger.hedge_delay("default") < 0.1
+
+    # Once it holds its slot a slow call is hedged as usual (the hedge takes a second slot)
+    gate.release()
+    assert hedger.call(_scripted((1.0, "slow"), (0.0, "fast")), slot=slot) == "fast"
+    assert hedger.metrics()["hedged"] == 1
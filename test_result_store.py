@@ -0,0 +1,72 @@
+import os
+import tempfile
+import pytest
+from tools.result_store import ResultStore, query_results, read_results
+
+def make_report(i):
+    flagged = i % 3 == 0
+    return {
+        "status": "success",
+        "image_path": f"img_{i}.jpg",
+        "final_decision": "Flag" if flagged else "Accept",
+        "violations": ["qr_codes"] if flagged else [],
+        "agent_results": {
+            "nudity": {"status": "success", "label": "safe"},
+            "qr_code": {"status": "success", "response_text": "YES, a QR code" if flagged else "NO"},
+            "nudity_exceptions": {"status": "skipped", "reason": "run condition not met"},
+        },
+        "confidence_scores": {"nudity": 0.1, "qr_code": 0.8 if flagged else 0.1},
+        "timings": {"total_seconds": 1.5, "agents": {"nudity": 0.2, "qr_code": 1.2}},
+    }
+
+@pytest.mark.parametrize("extension", [".parquet", ".arrow"])
+def test_store_round_trip_and_query(extension):
+    path = os.path.join(tempfile.mkdtemp(), "results" + extension)
+    with ResultStore(path, row_group_size=4) as store:
+        for i in range(10):
+            store.add(make_report(i))
+    assert store.rows_written == 10
+
+    table = read_results(path)
+    assert table.num_rows == 10
+    assert table.schema.field("confidence.qr_code").type == "double"
+    assert table.schema.field("violation.qr_codes").type == "bool"
+    row = table.slice(0, 1).to_pylist()[0]
+    assert row["status.nudity_exceptions"] == "skipped"
+    assert row["confidence.nudity_exceptions"] is None
+    assert row["time.qr_code"] == 1.2
+
+    flagged = query_results(path, decision="Flag", columns=["image_path"])
+    assert flagged.column("image_path").to_pylist() == ["img_0.jpg", "img_3.jpg", "img_6.jpg", "img_9.jpg"]
+    assert query_results(path, agent="qr_code").num_rows == 4
+    assert query_results(path, violation="qr_codes", decision="Accept").num_rows == 0
+
+def test_parquet_row_groups():
+    import pyarrow.parquet as pq
+    path = os.path.join(tempfile.mkdtemp(), "results.parquet")
+    with ResultStore(path, row_group_size=4) as store:
+        for i in range(10):
+            store.add(make_report(i))
+    assert pq.ParquetFile(path).num_row_groups == 3
+
+def test_empty_store_is_readable():
+    path = os.path.join(tempfile.mkdtemp(), "empty.parquet")
+    ResultStore(path).close()
+    assert read_results(path).num_rows == 0
+
+def test_stored_reports_can_be_redecided():
+    from redecide_reports import load_reports
+    from tools.decision_policy import redecide_frame
+    path = os.path.join(tempfile.mkdtemp(), "results.parquet")
+    failed_ingestion = dict(make_report(6), final_decision="Reject", violations=["image_processing_error"],
+                            agent_results={"ingestion": {"status": "error", "message": "Unsupported format"}})
+    pipeline_error = dict(make_report(7), status="error", final_decision="Reject", violations=["pipeline_error"],
+                          error_message="boom")
+    with ResultStore(path) as store:
+        for i in range(6):
+            store.add(make_report(i))
+        store.add(failed_ingestion)
+        store.add(pipeline_error)
+    result = redecide_frame(load_reports([path]))
+    assert not result["decision_changed"].any()
+    assert list(result["final_decision"][-2:]) == ["Reject", "Reject"]
@@ -0,0 +1,74 @@
+import asyncio
+import shutil
+import time
+
+from tools.agent_dag import central_pipeline_dag
+from tools.central_moderation_pipeline import (
+    aiter_central_moderation_pipeline,
+    iter_central_moderation_pipeline,
+    run_central_moderation_pipeline,
+)
+from tools.fake_gemini import FakeGeminiModel
+
+IMAGE = "data/test_images/sample.jpg"
+
+class SlowExceptViolence(FakeGeminiModel):
+    """Violence answers at once with a weapon; every other agent takes `delay` seconds."""
+
+    def __init__(self, delay: float):
+        super().__init__({"violence": ["YES - Weapons: a gun is clearly visible"], "unknown": ["NO"]})
+        self.delay = delay
+
+    def generate_content(self, contents, **kwargs):
+        prompt = next(c for c in contents if isinstance(c, str))
+        if self.identify_agent(prompt) != "violence":
+            time.sleep(self.delay)
+        return super().generate_content(contents, **kwargs)
+
+def _staged(tmp_path, name="sample.jpg"):
+    # Ingestion rewrites its input in place, so every run gets a fresh copy
+    image_path = str(tmp_path / name)
+    shutil.copyfile(IMAGE, image_path)
+    return image_path
+
+def test_events_cover_every_agent_and_end_with_the_report(tmp_path, use_model):
+    image_path, other_path = _staged(tmp_path), _staged(tmp_path, "other.jpg")
+    use_model(FakeGeminiModel.from_file())
+    events = list(iter_central_moderation_pipeline(image_path))
+    use_model(FakeGeminiModel.from_file())
+    expected = run_central_moderation_pipeline(other_path)
+
+    agent_events, last = events[:-1], events[-1]
+    assert sorted(e["agent"] for e in agent_events) == sorted(node.name for node in central_pipeline_dag())
+    assert all(e["event"] == "agent" for e in agent_events)
+    assert last["event"] == "report"
+    assert last["report"]["final_decision"] == expected["final_decision"]
+    assert last["report"]["confidence_scores"] == expected["confidence_scores"]
+    assert agent_events[-1]["provisional_decision"] == expected["final_decision"]
+
+def test_caller_can_stop_on_a_decisive_result(tmp_path, use_model):
+    image_path = _staged(tmp_path)
+
+    def first_decisive():
+        for event in iter_central_moderation_pipeline(image_path):
+            if event.get("decisive"):
+                return event
+
+    use_model(SlowExceptViolence(delay=3.0))
+    start = time.perf_counter()
+    event = first_decisive()
+    assert time.perf_counter() - start < 2.0
+    assert event["agent"] == "violence"
+    assert event["provisional_decision"] == "Reject"
+    assert "weapons" in event["provisional_violations"]
+
+def test_async_iterator_yields_the_same_events(tmp_path, use_model):
+    image_path = _staged(tmp_path)
+
+    async def collect():
+        return [event async for event in aiter_central_moderation_pipeline(image_path)]
+
+    use_model(FakeGeminiModel.from_file())
+    events = asyncio.run(collect())
+    assert events[-1]["event"] == "report"
+    assert len(events) == len(central_pipeline_dag()) + 1
@@ -0,0 +1,48 @@
+import io
+import os
+import tempfile
+from PIL import Image
+from tools.upload_encoding import UploadProfile, encode_image, encode_for_upload, encoded_cache, profile_for
+
+def _save(img, name):
+    path = os.path.join(tempfile.mkdtemp(), name)
+    img.save(path)
+    return path
+
+def test_category_agents_get_downscaled_jpeg():
+    path = _save(Image.new("RGB", (1024, 512), (200, 10, 10)), "wide.png")
+    part = encode_image(path, profile_for("drugs"))
+    assert part["mime_type"] == "image/jpeg"
+    assert Image.open(io.BytesIO(part["data"])).size == (768, 384)
+
+def test_text_agents_keep_full_resolution():
+    path = _save(Image.new("RGB", (1024, 512), (255, 255, 255)), "card.png")
+    part = encode_image(path, profile_for("pii_text"))
+    assert Image.open(io.BytesIO(part["data"])).size == (1024, 512)
+
+def test_matching_file_is_passed_through_and_alpha_is_flattened():
+    jpeg_path = _save(Image.new("RGB", (300, 200)), "small.jpg")
+    part = encode_image(jpeg_path, UploadProfile(max_side=768, format="JPEG"))
+    with open(jpeg_path, "rb") as f:
+        assert part["data"] == f.read()
+
+    rgba_path = _save(Image.new("RGBA", (300, 200), (0, 0, 0, 0)), "transparent.png")
+    flattened = Image.open(io.BytesIO(encode_image(rgba_path, UploadProfile(format="JPEG"))["data"]))
+    assert flattened.mode == "RGB"
+    assert flattened.getpixel((10, 10))[0] > 240
+
+def test_each_image_is_encoded_once_per_profile():
+    path = _save(Image.new("RGB", (900, 900)), "shared.jpg")
+    before = encoded_cache.stats()
+    for agent in ["violence", "drugs", "hate", "alcohol_smoking", "nudity_exceptions", "qr_code"]:
+        encode_for_upload(path, profile_for(agent))
+    after = encoded_cache.stats()
+    assert after["misses"] - before["misses"] == 2  # default profile + qr_code profile
+    assert after["hits"] - before["hits"] == 4
+
+if __name__ == "__main__":
+    test_category_agents_get_downscaled_jpeg()
+    test_text_agents_keep_full_resolution()
+    test_matching_file_is_passed_through_and_alpha_is_flattened()
+    test_each_image_is_encoded_once_per_profile()
+    print("✅ Upload encoding tests passed!")
@@ -0,0 +1,108 @@
+import shutil
+import threading
+import time
+
+import pytest
+
+from tools.fake_gemini import FakeGeminiModel
+from tools.work_queue import (
+    LocalQueueBackend,
+    SQLiteQueueBackend,
+    TaskError,
+    moderate_task,
+    queue_from_url,
+    run_worker,
+)
+
+IMAGE = "data/test_images/sample.jpg"
+
+@pytest.fixture(params=["local", "sqlite"])
+def backend(request, tmp_path):
+    if request.param == "local":
+        return LocalQueueBackend(max_attempts=2)
+    return SQLiteQueueBackend(str(tmp_path / "queue.sqlite"), max_attempts=2)
+
+def test_enqueue_is_idempotent_and_tasks_complete_once(backend):
+    assert backend.enqueue("a.jpg") and backend.enqueue("b.jpg")
+    assert not backend.enqueue("a.jpg")
+    task = backend.receive()
+    assert task.payload == "a.jpg" and task.attempts == 1
+    assert backend.complete(task, {"final_decision": "Accept"})
+    assert not backend.complete(task, {"final_decision": "Reject"})
+    assert not backend.enqueue("a.jpg")
+    assert backend.stats() == {"queued": 1, "in_flight": 0, "done": 1, "dead": 0}
+    assert list(backend.results()) == [(task.task_id, "a.jpg", {"final_decision": "Accept"})]
+
+def test_expired_lease_is_redelivered_and_the_stale_worker_cannot_write(backend):
+    backend.enqueue("a.jpg")
+    stale = backend.receive(visibility_timeout=0.05)
+    assert backend.receive() is None
+    time.sleep(0.1)
+    current = backend.receive()
+    assert current.task_id == stale.task_id and current.attempts == 2
+    assert not backend.complete(stale, {"worker": "stale"})
+    assert not backend.extend(stale)
+    assert backend.complete(current, {"worker": "current"})
+    assert [result for _, _, result in backend.results()] == [{"worker": "current"}]
+
+def test_failed_tasks_retry_then_go_to_dead_letters(backend):
+    backend.enqueue("broken.jpg")
+    assert backend.fail(backend.receive(), "download failed", retry_delay=0.0)
+    task = backend.receive()
+    assert task.attempts == 2
+    assert backend.fail(task, "download failed again", retry_delay=0.0)
+    assert backend.receive() is None
+    assert list(backend.dead_letters()) == [(task.task_id, "broken.jpg", 2, "download failed again")]
+    assert backend.stats()["dead"] == 1
+
+def test_task_whose_last_worker_vanished_is_dead_lettered(backend):
+    backend.enqueue("a.jpg")
+    for _ in range(2):
+        backend.receive(visibility_timeout=0.0)
+    assert backend.receive() is None
+    assert [payload for _, payload, _, _ in backend.dead_letters()] == ["a.jpg"]
+
+def test_heartbeat_keeps_long_tasks_leased():
+    backend = LocalQueueBackend()
+    backend.enqueue("slow.jpg")
+    seen = []
+
+    def handler(payload):
+        seen.append(payload)
+        time.sleep(0.3)
+        return {"ok": True}
+
+    stats = {}
+    worker = threading.Thread(target=lambda: stats.update(run_worker(backend, handler, visibility_timeout=0.1, max_tasks=1)))
+    worker.start()
+    time.sleep(0.05)
+    assert backend.receive() is None  # still leased after the first timeout would have run out
+    worker.join()
+    assert stats == {"completed": 1, "failed": 0, "lost": 0} and seen == ["slow.jpg"]
+
+def test_workers_share_a_sqlite_queue(tmp_path, use_model):
+    paths = []
+    for n in range(4):
+        paths.append(str(tmp_path / f"image{n}.jpg"))
+        shutil.copyfile(IMAGE, paths[-1])
+    url = f"sqlite:///{tmp_path / 'queue.sqlite'}"
+    producer = queue_from_url(url)
+    for path in paths + [str(tmp_path / "missing.jpg")]:
+        producer.enqueue(path)
+
+    use_model(FakeGeminiModel.from_file())
+    workers = [threading.Thread(target=run_worker, args=(queue_from_url(url),),
+                                kwargs={"idle_timeout": 0.2, "poll_interval": 0.05, "retry_delay": 0.0})
+               for _ in range(3)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    assert producer.stats() == {"queued": 0, "in_flight": 0, "done": 4, "dead": 1}
+    assert sorted(payload for _, payload, _ in producer.results()) == sorted(paths)
+    assert all(report["status"] == "success" for _, _, report in producer.results())
+
+def test_moderate_task_rejects_unreachable_images():
+    with pytest.raises(TaskError):
+        moderate_task("data/test_images/does_not_exist.jpg")
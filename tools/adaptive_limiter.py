@@ -0,0 +1,159 @@
+import contextlib
+import os
+import threading
+import time
+from typing import Dict, Any
+
+from tools.deadlines import DeadlineExceeded
+
+# Adaptive concurrency limit for Gemini calls (AIMD).
+#
+# Callers wait for a slot before calling generate_content. Until the first
+# sign of congestion every healthy response adds a slot (slow start, so the
+# limit doubles per round trip); after that it adds one slot per limit's
+# worth of responses (additive increase). A 429/5xx or a latency spike well above
+# the running baseline cuts it by a factor (multiplicative decrease), at
+# most once per baseline latency so one burst of failures counts once.
+# In-flight requests therefore grow while the API keeps up and shrink
+# quickly when it starts throttling.
+#
+# Enable with GEMINI_ADAPTIVE_CONCURRENCY=on, or programmatically via
+# tools.gemini_vision.use_limiter().
+
+INITIAL_LIMIT = int(os.environ.get("GEMINI_INITIAL_CONCURRENCY", "4"))
+MAX_LIMIT = int(os.environ.get("GEMINI_MAX_CONCURRENCY", "64"))
+# A response this many times slower than the baseline counts as congestion
+LATENCY_SPIKE_FACTOR = 3.0
+# Weight of each new sample in the baseline latency average
+BASELINE_ALPHA = 0.1
+# Samples needed before latency spikes are acted on
+MIN_BASELINE_SAMPLES = 10
+
+def is_throttling_error(error: Exception) -> bool:
+    """True for rate-limit (429) and server (5xx) errors, which signal congestion."""
+    code = getattr(error, "code", None)
+    try:
+        code = int(code) if code is not None else None
+    except (TypeError, ValueError):
+        code = None
+    if code is None:
+        text = str(error)
+        return text.startswith("429") or "Resource has been exhausted" in text
+    return code == 429 or 500 <= code < 600
+
+class AdaptiveLimiter:
+    def __init__(
+        self,
+        initial_limit: float = INITIAL_LIMIT,
+        min_limit: int = 1,
+        max_limit: int = MAX_LIMIT,
+        decrease_factor: float = 0.5,
+        spike_factor: float = LATENCY_SPIKE_FACTOR,
+    ):
+        self.limit = float(initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.decrease_factor = decrease_factor
+        self.spike_factor = spike_factor
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.baseline_latency = None
+        self.samples = 0
+        self.calls = 0
+        self.throttled = 0
+        self.spikes = 0
+        self.decreases = 0
+        self.waited_seconds = 0.0
+        self.timed_out = 0
+        self._last_decrease = 0.0
+        self._slow_start = True
+        self._condition = threading.Condition()
+
+    def acquire(self, timeout: float | None = None) -> None:
+        """Wait for a slot; raises DeadlineExceeded if none frees up within `timeout` seconds."""
+        start = time.perf_counter()
+        end = None if timeout is None else time.monotonic() + timeout
+        with self._condition:
+            while self.in_flight >= int(self.limit):
+                remaining = None if end is None else end - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    self.timed_out += 1
+                    raise DeadlineExceeded("Image deadline passed while waiting for a Gemini slot")
+                self._condition.wait(remaining)
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+            self.waited_seconds += time.perf_counter() - start
+
+    def release(self, latency: float, error: Exception | None = None) -> None:
+        """Return a slot and adapt the limit to how the call went."""
+        with self._condition:
+            self.in_flight -= 1
+            self.calls += 1
+            if error is not None and is_throttling_error(error):
+                self.throttled += 1
+                self._decrease()
+            elif error is None:
+                spike = (
+                    self.samples >= MIN_BASELINE_SAMPLES
+                    and latency > self.spike_factor * self.baseline_latency
+                )
+                if spike:
+                    self.spikes += 1
+                    self._decrease()
+                else:
+                    step = 1.0 if self._slow_start else 1.0 / self.limit
+                    self.limit = min(self.max_limit, self.limit + step)
+                # Spikes still move the baseline, so a lasting slowdown becomes the new normal
+                self._record_latency(latency)
+            # Other errors (bad request, missing image) say nothing about capacity
+            self._condition.notify_all()
+
+    def _record_latency(self, latency: float) -> None:
+        self.samples += 1
+        if self.baseline_latency is None:
+            self.baseline_latency = latency
+        else:
+            self.baseline_latency += BASELINE_ALPHA * (latency - self.baseline_latency)
+
+    def _decrease(self) -> None:
+        now = time.monotonic()
+        if now - self._last_decrease < (self.baseline_latency or 0.0):
+            # Responses to requests sent before the last cut
+            return
+        self._last_decrease = now
+        self._slow_start = False
+        self.decreases += 1
+        self.limit = max(float(self.min_limit), self.limit * self.decrease_factor)
+
+    @contextlib.contextmanager
+    def slot(self, timeout: float | None = None):
+        """Hold a slot around one call: `with limiter.slot(): model.generate_content(...)`."""
+        self.acquire(timeout)
+        start = time.perf_counter()
+        try:
+            yield
+        except BaseException as e:
+            self.release(time.perf_counter() - start, e)
+            raise
+        self.release(time.perf_counter() - start)
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._condition:
+            return {
+                "limit": int(self.limit),
+                "in_flight": self.in_flight,
+                "peak_in_flight": self.peak_in_flight,
+                "calls": self.calls,
+                "throttled": self.throttled,
+                "latency_spikes": self.spikes,
+                "decreases": self.decreases,
+                "baseline_latency_seconds": round(self.baseline_latency or 0.0, 4),
+                "waited_seconds": round(self.waited_seconds, 3),
+                "timed_out": self.timed_out,
+            }
+
+def limiter_from_env() -> AdaptiveLimiter | None:
+    mode = os.environ.get("GEMINI_ADAPTIVE_CONCURRENCY", "off")
+    if mode not in ("on", "off"):
+        raise ValueError(f"Invalid GEMINI_ADAPTIVE_CONCURRENCY: {mode} (expected 'on' or 'off')")
+    return AdaptiveLimiter() if mode == "on" else None
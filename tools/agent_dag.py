@@ -0,0 +1,219 @@
+import importlib
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from functools import lru_cache
+from typing import Dict, List, Any, Callable, Iterator, Tuple
+
+import yaml
+
+from tools.deadlines import deadline_scope
+from tools.priority_scheduler import lane_scope
+
+# Dependency-aware agent DAG.
+#
+# The graph is declared under `dag:` in a pipeline agent YAML (see
+# agents/central_moderation_pipeline_agent.yaml). Each node names an agent
+# from agents/*.yaml, its dependencies, how its inputs are wired and an
+# optional run condition:
+#
+#   - node: nudity_exceptions
+#     agent: nudity_exceptions_gemini
+#     depends_on: [nudity]
+#     inputs: {image_path: ingestion.output_path}
+#     run_if: nudity.label == unsafe
+#
+# A node runs once all its dependencies have finished successfully and its
+# condition holds; otherwise it is recorded as skipped. Independent nodes run
+# in parallel on a thread pool.
+
+AGENTS_DIR = "agents"
+CENTRAL_PIPELINE_SPEC = os.path.join(AGENTS_DIR, "central_moderation_pipeline_agent.yaml")
+
+_CONDITION_RE = re.compile(r"^\s*([\w]+)\.([\w]+)\s*(==|!=)\s*(.+?)\s*$")
+
+def parse_condition(expression: str) -> Callable[[Dict[str, dict]], bool]:
+    """Compile "<node>.<field> == <value>" (or !=) into a predicate over node results."""
+    match = _CONDITION_RE.match(expression)
+    if not match:
+        raise ValueError(f"Invalid run condition: {expression!r} (expected '<node>.<field> == <value>')")
+    node, field, op, raw_value = match.groups()
+    value = yaml.safe_load(raw_value)
+
+    def condition(results: Dict[str, dict]) -> bool:
+        actual = results.get(node, {}).get(field)
+        return actual == value if op == "==" else actual != value
+
+    return condition
+
+def resolve_tool(dotted_path: str) -> Callable:
+    module_name, _, attr = dotted_path.rpartition(".")
+    return getattr(importlib.import_module(module_name), attr)
+
+@lru_cache(maxsize=1)
+def load_agent_specs(agents_dir: str = AGENTS_DIR) -> Dict[str, dict]:
+    """Agent name -> spec, from every YAML file in agents_dir."""
+    specs = {}
+    for filename in sorted(os.listdir(agents_dir)):
+        if filename.endswith((".yaml", ".yml")):
+            with open(os.path.join(agents_dir, filename), "r") as f:
+                spec = yaml.safe_load(f)
+            specs[spec["name"]] = spec
+    return specs
+
+class DagNode:
+    def __init__(self, name: str, tool: Callable, depends_on: List[str] | None = None,
+                 inputs: Dict[str, str] | None = None, run_if: str | None = None,
+                 label: str | None = None, confidence: str | None = None):
+        self.name = name
+        self.tool = tool
+        self.depends_on = list(depends_on or [])
+        self.inputs = dict(inputs or {"image_path": "$image_path"})
+        self.run_if = run_if
+        self.condition = parse_condition(run_if) if run_if else None
+        self.label = label or name
+        self.confidence = confidence
+
+    def skip_reason(self, results: Dict[str, dict]) -> str | None:
+        """Why this node should not run given its dependencies' results, or None."""
+        for dep in self.depends_on:
+            status = results.get(dep, {}).get("status")
+            if status != "success":
+                return f"dependency '{dep}' did not succeed ({status})"
+        if self.condition is not None and not self.condition(results):
+            return f"run condition not met: {self.run_if}"
+        return None
+
+    def build_kwargs(self, results: Dict[str, dict], context: Dict[str, Any]) -> Dict[str, Any]:
+        kwargs = {}
+        for param, ref in self.inputs.items():
+            if ref.startswith("$"):
+                kwargs[param] = context[ref[1:]]
+            else:
+                node, _, field = ref.partition(".")
+                kwargs[param] = results[node][field]
+        return kwargs
+
+    def run(self, results: Dict[str, dict], context: Dict[str, Any]) -> dict:
+        try:
+            return self.tool(**self.build_kwargs(results, context))
+        except Exception as e:
+            return {"status": "error", "message": str(e)}
+
+    def timed_run(self, results: Dict[str, dict], context: Dict[str, Any], deadline: float | None = None,
+                  lane: str | None = None) -> Tuple[dict, float]:
+        start = time.perf_counter()
+        with deadline_scope(deadline), lane_scope(lane):
+            result = self.run(results, context)
+        return result, time.perf_counter() - start
+
+def load_dag(spec_path: str, agents_dir: str = AGENTS_DIR) -> List[DagNode]:
+    """Build DAG nodes from the `dag:` section of a pipeline spec, validating references."""
+    with open(spec_path, "r") as f:
+        spec = yaml.safe_load(f)
+    agents = load_agent_specs(agents_dir)
+
+    nodes = []
+    for entry in spec.get("dag", []):
+        agent = agents.get(entry["agent"])
+        if agent is None:
+            raise ValueError(f"DAG node '{entry['node']}' references unknown agent '{entry['agent']}'")
+        nodes.append(DagNode(
+            entry["node"],
+            resolve_tool(agent["tool"]),
+            depends_on=entry.get("depends_on"),
+            inputs=entry.get("inputs"),
+            run_if=entry.get("run_if"),
+            label=entry.get("label"),
+            confidence=entry.get("confidence"),
+        ))
+
+    known = set()
+    for node in nodes:
+        missing = [dep for dep in node.depends_on if dep not in known]
+        if missing:
+            raise ValueError(f"DAG node '{node.name}' depends on undeclared or later nodes: {missing}")
+        known.add(node.name)
+    return nodes
+
+def dag_node_names(spec_path: str = CENTRAL_PIPELINE_SPEC) -> List[str]:
+    """Node names declared in a pipeline spec, without importing any agent tools."""
+    with open(spec_path, "r") as f:
+        return [entry["node"] for entry in (yaml.safe_load(f).get("dag") or [])]
+
+@lru_cache(maxsize=1)
+def central_pipeline_dag() -> Tuple[DagNode, ...]:
+    return tuple(load_dag(CENTRAL_PIPELINE_SPEC))
+
+def iter_dag(nodes, context: Dict[str, Any], max_workers: int | None = None,
+             timings: Dict[str, float] | None = None, deadline: float | None = None,
+             lane: str | None = None) -> Iterator[Tuple[DagNode, dict]]:
+    """
+    Run the DAG, yielding (node, result) as each node finishes or is skipped.
+    Ready nodes are started in declaration order; max_workers=1 runs the
+    nodes one at a time in that order. If a timings dict is given, each
+    executed node's run time in seconds is recorded in it.
+
+    With a deadline (absolute time.monotonic() value), nodes run inside a
+    deadline_scope, and once it passes every unfinished node is yielded
+    with status "timeout" without waiting for it. Closing the iterator early
+    does not wait for running nodes either. Nodes run in priority `lane`
+    (tools/priority_scheduler.py) when one is given.
+    """
+    nodes = list(nodes)
+    results: Dict[str, dict] = {}
+    pending = list(nodes)
+    running = {}
+    abandoned = False
+
+    executor = ThreadPoolExecutor(max_workers=max_workers or len(nodes) or 1)
+    try:
+        while pending or running:
+            # Resolve every node whose dependencies are done: skip it or start it
+            progressed = True
+            while progressed:
+                progressed = False
+                for node in list(pending):
+                    if not all(dep in results for dep in node.depends_on):
+                        continue
+                    pending.remove(node)
+                    progressed = True
+                    reason = node.skip_reason(results)
+                    if reason is not None:
+                        results[node.name] = {"status": "skipped", "reason": reason}
+                        yield node, results[node.name]
+                    else:
+                        running[executor.submit(node.timed_run, dict(results), context, deadline, lane)] = node
+
+            if not running:
+                break
+
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            done, _ = wait(running, timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                # Deadline passed: give up on everything that has not finished
+                abandoned = True
+                unfinished = set(running.values()) | set(pending)
+                for node in nodes:
+                    if node in unfinished:
+                        results[node.name] = {"status": "timeout", "message": "Agent did not finish before the image deadline"}
+                        yield node, results[node.name]
+                return
+            for future in done:
+                node = running.pop(future)
+                results[node.name], seconds = future.result()
+                if timings is not None:
+                    timings[node.name] = seconds
+                yield node, results[node.name]
+    except GeneratorExit:
+        # The caller stopped early (e.g. on a decisive result): do not wait for the rest
+        abandoned = True
+        raise
+    finally:
+        # Timed-out or abandoned agents are left to finish (or hit their own timeouts) in the background
+        executor.shutdown(wait=not abandoned, cancel_futures=abandoned)
+
+def run_dag(nodes, context: Dict[str, Any], max_workers: int | None = None) -> Dict[str, dict]:
+    """Run the DAG to completion; returns node name -> result."""
+    return {node.name: result for node, result in iter_dag(nodes, context, max_workers)}
@@ -1,298 +1,242 @@
+import asyncio
 import json
+import os
 import re
-from typing import Dict, List, Any
-from tools.image_preprocessor import image_preprocessor
-from tools.nudity_detector import detect_nudity
-from tools.nudity_exceptions_detector_gemini import detect_nudity_exceptions_with_gemini
-from tools.violence_detection_gemini import detect_violence_with_gemini
-from tools.drugs_detector_gemini import detect_drugs_with_gemini
-from tools.alcohol_smoke_detector_gemini import detect_alcohol_smoke_with_gemini
-from tools.hate_detector_gemini import detect_hate_symbols_with_gemini
-from tools.text_pii_vision_gemini import detect_text_pii_with_gemini_vision
-from tools.qr_detector_gemini import detect_qr_code_with_gemini
+import time
+from typing import AsyncIterator, Callable, Dict, Iterator, List, Any
+from tools.agent_dag import central_pipeline_dag, iter_dag
+from tools.response_parsing import (
+    extract_confidence_from_response,
+    calculate_nudity_confidence,
+    parse_violation_type
+)
+from tools.decision_policy import PIPELINE_ERROR, default_policy, timed_out_agents
+from tools.report_format import compact_report, expand_report
+from tools import gemini_vision
+from tools.gemini_batching import PendingRequest, RequestCollector
+from tools.gemini_packing import PACK_SIZE, resolve_packed
+from tools.priority_scheduler import current_lane
 
-def extract_confidence_from_response(response_text: str) -> float:
-    """Enhanced confidence extraction with more sophisticated keyword analysis."""
-    if not response_text:
-        return 0.0
-    
-    response_upper = response_text.upper()
-    
-    # More comprehensive confidence indicators
-    high_confidence = ["CLEARLY", "DEFINITELY", "CERTAINLY", "OBVIOUSLY", "UNDOUBTEDLY", "WITHOUT DOUBT", "CONFIRMED", "IDENTIFIED"]
-    medium_high = ["YES", "VIOLATION", "DETECTED", "FOUND", "PRESENT", "SHOWS", "CONTAINS", "DISPLAYS"]
-    medium = ["LIKELY", "PROBABLY", "APPEARS", "SEEMS", "INDICATES", "SUGGESTS", "MIGHT BE"]
-    medium_low = ["UNCERTAIN", "NOT CLEARLY", "MAYBE", "POSSIBLY", "MIGHT", "COULD BE", "UNSURE"]
-    low_confidence = ["NO", "NOT DETECTED", "CLEAN", "SAFE", "NONE FOUND", "ABSENT", "NOT PRESENT"]
-    
-    # Count confidence indicators
-    high_count = sum(1 for phrase in high_confidence if phrase in response_upper)
-    medium_high_count = sum(1 for phrase in medium_high if phrase in response_upper)
-    medium_count = sum(1 for phrase in medium if phrase in response_upper)
-    medium_low_count = sum(1 for phrase in medium_low if phrase in response_upper)
-    low_count = sum(1 for phrase in low_confidence if phrase in response_upper)
-    
-    # Weighted scoring with priority
-    if high_count > 0:
-        return 0.9
-    elif medium_high_count > 0:
-        return 0.8
-    elif medium_count > 0:
-        return 0.6
-    elif medium_low_count > 0:
-        return 0.4
-    elif low_count > 0:
-        return 0.1
-    
-    return 0.5  # Default confidence
+# How each DAG node's result is scored (the node's `confidence` in the agent YAML)
+CONFIDENCE_SCORERS = {
+    "nudenet": calculate_nudity_confidence,
+    "response_text": lambda result: extract_confidence_from_response(result.get("response_text", "")),
+}
 
-def calculate_nudity_confidence(nudity_result: dict) -> float:
-    """Use actual NudeNet confidence scores when available."""
-    if nudity_result.get("label") == "unsafe":
-        # Try to extract actual confidence from NudeNet violations
-        violations = nudity_result.get("violations", [])
-        if violations:
-            # Use the highest confidence score from detected violations
-            max_confidence = max(violation.get("score", 0.5) for violation in violations)
-            return max_confidence
-        return 0.9  # Fallback for unsafe without detailed scores
-    else:
-        return 0.1  # Safe content has low confidence for violations
+# Per-image time limit in seconds (None: no limit); see run_central_moderation_pipeline
+DEADLINE_SECONDS = float(os.environ["MODERATION_DEADLINE_SECONDS"]) if os.environ.get("MODERATION_DEADLINE_SECONDS") else None
 
-def parse_violation_type(response_text: str) -> List[str]:
-    """Parse violation types from Gemini response."""
-    violations = []
-    if not response_text:
-        return violations
-    
-    response_upper = response_text.upper()
-    
-    # Violence types
-    if any(word in response_upper for word in ["BLOOD", "WOUND", "GORE", "INJURY"]):
-        violations.append("blood/gore")
-    if any(word in response_upper for word in ["WEAPON", "GUN", "KNIFE", "EXPLOSIVE"]):
-        violations.append("weapons")
-    if any(word in response_upper for word in ["CORPSE", "DEAD", "HANGING", "AUTOPSY"]):
-        violations.append("death/corpses")
-    if any(word in response_upper for word in ["SELF-HARM", "CUTTING", "BURNING", "SUICIDAL"]):
-        violations.append("self-harm")
-    if any(word in response_upper for word in ["ABUSE", "TORTURE", "CRUELTY"]):
-        violations.append("abuse/torture")
-    
-    # Drugs types
-    if any(word in response_upper for word in ["DRUG", "PARAPHERNALIA", "SYRINGE", "PIPE"]):
-        violations.append("drugs/paraphernalia")
-    
-    # Alcohol/Smoking types
-    if any(word in response_upper for word in ["ALCOHOL", "BEER", "WINE", "LIQUOR"]):
-        violations.append("alcohol")
-    if any(word in response_upper for word in ["SMOKING", "CIGARETTE", "TOBACCO", "VAPE"]):
-        violations.append("smoking")
-    
-    # Hate types
-    if any(word in response_upper for word in ["HATE", "SYMBOL", "EXTREMIST", "RACIST"]):
-        violations.append("hate symbols")
+def run_central_moderation_pipeline(image_path: str, max_workers: int | None = None, verbose: bool = False,
+                                    deadline_seconds: float | None = DEADLINE_SECONDS,
+                                    lane: str | None = None) -> Dict[str, Any]:
+    """
+    Run comprehensive moderation pipeline on an image.
     
-    # PII types
-    if any(word in response_upper for word in ["PII", "PERSONAL", "IDENTIFIABLE", "PRIVATE"]):
-        violations.append("personal information")
-    if any(word in response_upper for word in ["THREAT", "ABUSIVE", "HARASSMENT"]):
-        violations.append("threatening/abusive text")
+    The agents run as the dependency graph declared in
+    agents/central_moderation_pipeline_agent.yaml; independent agents run in
+    parallel (max_workers=1 runs them one at a time in declaration order).
+    The report is compact unless verbose=True (see tools/report_format.py).
     
-    # QR types
-    if any(word in response_upper for word in ["QR", "CODE", "BARCODE"]):
-        violations.append("qr codes")
+    With deadline_seconds, the pipeline returns within that time: agents
+    still running get status "timeout" and are listed in missing_agents, and
+    the decision policy's missing_agents mode decides (configs/decision_policy.yaml).
     
-    return violations
-
-def run_central_moderation_pipeline(image_path: str) -> Dict[str, Any]:
-    """
-    Run comprehensive moderation pipeline on an image.
+    `lane` is the priority lane for the Gemini calls (interactive, standard or
+    backfill; see tools/priority_scheduler.py); it defaults to the caller's
+    lane_scope, and only matters while a scheduler is active.
     
     Returns:
         Dict containing:
         - status: success/error
         - final_decision: Accept/Reject/Flag
         - violations: List of detected violations
-        - agent_results: Raw results from each agent
+        - agent_results: Raw results from each agent (skipped agents have status "skipped")
         - confidence_scores: Confidence scores for each detection
-        - detailed_report: Comprehensive analysis
+        - timings: total_seconds and per-agent run time in seconds
+        - missing_agents: agents that timed out (only when some did)
+        - detailed_report: Comprehensive analysis (verbose only)
     """
+    for event in iter_central_moderation_pipeline(image_path, max_workers, verbose, deadline_seconds, lane):
+        if event["event"] == "report":
+            return event["report"]
+
+def iter_central_moderation_pipeline(image_path: str, max_workers: int | None = None, verbose: bool = False,
+                                     deadline_seconds: float | None = DEADLINE_SECONDS,
+                                     lane: str | None = None) -> Iterator[Dict[str, Any]]:
+    """
+    Streaming variant of run_central_moderation_pipeline (same arguments).
     
+    Yields an "agent" event as each agent finishes or is skipped:
+        {"event": "agent", "agent", "label", "result", "confidence",
+         "provisional_decision", "provisional_violations", "decisive"}
+    where the provisional decision is the policy applied to the agents so
+    far and `decisive` is True once it is a Reject, which later agents can
+    no longer change. The last event is {"event": "report", "report": ...}
+    with the same report run_central_moderation_pipeline returns. Callers may
+    stop early (e.g. on a decisive event); agents still running are then
+    left to finish in the background.
+    """
+    
+    dag = central_pipeline_dag()
+    policy = default_policy()
     pipeline_report = {
         "status": "success",
         "image_path": image_path,
-        "final_decision": "Accept",
+        "final_decision": policy.clean_decision,
         "violations": [],
         "agent_results": {},
         "confidence_scores": {},
-        "detailed_report": {
-            "ingestion": {},
-            "nudity": {},
-            "nudity_exceptions": {},
-            "violence": {},
-            "drugs": {},
-            "alcohol_smoking": {},
-            "hate": {},
-            "pii_text": {},
-            "qr_code": {}
-        }
+        "timings": {"total_seconds": 0.0, "agents": {}}
     }
+    start_time = time.perf_counter()
+    deadline = time.monotonic() + deadline_seconds if deadline_seconds is not None else None
+    lane = lane or current_lane()
+    
+    def agent_event(node, result, violations, decision):
+        return {
+            "event": "agent",
+            "agent": node.name,
+            "label": node.label,
+            "result": result,
+            "confidence": pipeline_report["confidence_scores"].get(node.name),
+            "provisional_decision": decision,
+            "provisional_violations": list(violations),
+            "decisive": decision == policy.reject_decision,
+        }
+    
+    def report_event():
+        pipeline_report["timings"]["total_seconds"] = time.perf_counter() - start_time
+        return {"event": "report", "report": expand_report(pipeline_report) if verbose else pipeline_report}
     
     try:
-        # 🧹 Step 1: Ingestion Agent
-        print("🔄 Running Ingestion Agent...")
-        ingestion_result = image_preprocessor(image_path)
-        pipeline_report["agent_results"]["ingestion"] = ingestion_result
-        pipeline_report["detailed_report"]["ingestion"] = ingestion_result
-        
-        if ingestion_result.get("status") != "success":
-            pipeline_report["final_decision"] = "Reject"
-            pipeline_report["violations"].append("image_processing_error")
-            return pipeline_report
-        
-        processed_path = ingestion_result["output_path"]
-        
-        # 🔞 Step 2: Nudity Detection (NudeNet)
-        print("🔞 Running Nudity Detection...")
-        nudity_result = detect_nudity(processed_path)
-        pipeline_report["agent_results"]["nudity"] = nudity_result
-        pipeline_report["detailed_report"]["nudity"] = nudity_result
-        
-        nudity_confidence = calculate_nudity_confidence(nudity_result)
-        pipeline_report["confidence_scores"]["nudity"] = nudity_confidence
-        
-        if nudity_result.get("label") == "unsafe":
-            pipeline_report["violations"].append("nudity")
-        
-        # 👙 Step 3: Nudity Exception Handler (Gemini)
-        print("👙 Running Nudity Exceptions Detection...")
-        nudity_exception_result = detect_nudity_exceptions_with_gemini(processed_path)
-        pipeline_report["agent_results"]["nudity_exceptions"] = nudity_exception_result
-        pipeline_report["detailed_report"]["nudity_exceptions"] = nudity_exception_result
-        
-        nudity_exception_confidence = extract_confidence_from_response(
-            nudity_exception_result.get("response_text", "")
-        )
-        pipeline_report["confidence_scores"]["nudity_exceptions"] = nudity_exception_confidence
-        
-        # 🔫 Step 4: Violence/Gore Detection (Gemini)
-        print("🔫 Running Violence Detection...")
-        violence_result = detect_violence_with_gemini(processed_path)
-        pipeline_report["agent_results"]["violence"] = violence_result
-        pipeline_report["detailed_report"]["violence"] = violence_result
-        
-        violence_confidence = extract_confidence_from_response(
-            violence_result.get("response_text", "")
-        )
-        pipeline_report["confidence_scores"]["violence"] = violence_confidence
-        
-        if "YES" in (violence_result.get("response_text") or "").upper():
-            violence_types = parse_violation_type(violence_result.get("response_text", ""))
-            pipeline_report["violations"].extend(violence_types)
-        
-        # 🧪 Step 5: Drugs Detection (Gemini)
-        print("🧪 Running Drugs Detection...")
-        drugs_result = detect_drugs_with_gemini(processed_path)
-        pipeline_report["agent_results"]["drugs"] = drugs_result
-        pipeline_report["detailed_report"]["drugs"] = drugs_result
-        
-        drugs_confidence = extract_confidence_from_response(
-            drugs_result.get("response_text", "")
-        )
-        pipeline_report["confidence_scores"]["drugs"] = drugs_confidence
-        
-        if "YES" in (drugs_result.get("response_text") or "").upper():
-            pipeline_report["violations"].append("drugs")
-        
-        # 🍾 Step 6: Alcohol/Smoking Detection (Gemini)
-        print("🍾 Running Alcohol/Smoking Detection...")
-        alcohol_result = detect_alcohol_smoke_with_gemini(processed_path)
-        pipeline_report["agent_results"]["alcohol_smoking"] = alcohol_result
-        pipeline_report["detailed_report"]["alcohol_smoking"] = alcohol_result
-        
-        alcohol_confidence = extract_confidence_from_response(
-            alcohol_result.get("response_text", "")
-        )
-        pipeline_report["confidence_scores"]["alcohol_smoking"] = alcohol_confidence
-        
-        if "YES" in (alcohol_result.get("response_text") or "").upper():
-            alcohol_types = parse_violation_type(alcohol_result.get("response_text", ""))
-            pipeline_report["violations"].extend(alcohol_types)
-        
-        # ☠️ Step 7: Hate Symbols Detection (Gemini)
-        print(" ☠️ Running Hate Symbols Detection...")
-        hate_result = detect_hate_symbols_with_gemini(processed_path)
-        pipeline_report["agent_results"]["hate"] = hate_result
-        pipeline_report["detailed_report"]["hate"] = hate_result
-        
-        hate_confidence = extract_confidence_from_response(
-            hate_result.get("response_text", "")
-        )
-        pipeline_report["confidence_scores"]["hate"] = hate_confidence
-        
-        if "YES" in (hate_result.get("response_text") or "").upper():
-            pipeline_report["violations"].append("hate_symbols")
-        
-        # 🔐 Step 8: PII/Text Detection (Gemini Vision)
-        print("🔐 Running PII/Text Detection...")
-        pii_result = detect_text_pii_with_gemini_vision(processed_path)
-        pipeline_report["agent_results"]["pii_text"] = pii_result
-        pipeline_report["detailed_report"]["pii_text"] = pii_result
-        
-        pii_confidence = extract_confidence_from_response(
-            pii_result.get("response_text", "")
-        )
-        pipeline_report["confidence_scores"]["pii_text"] = pii_confidence
-        
-        if "YES" in (pii_result.get("response_text") or "").upper():
-            pii_types = parse_violation_type(pii_result.get("response_text", ""))
-            pipeline_report["violations"].extend(pii_types)
-        
-        # 📷 Step 9: QR Code Detection (Gemini)
-        print("📷 Running QR Code Detection...")
-        qr_result = detect_qr_code_with_gemini(processed_path)
-        pipeline_report["agent_results"]["qr_code"] = qr_result
-        pipeline_report["detailed_report"]["qr_code"] = qr_result
-        
-        qr_confidence = extract_confidence_from_response(
-            qr_result.get("response_text", "")
-        )
-        pipeline_report["confidence_scores"]["qr_code"] = qr_confidence
-        
-        if "YES" in (qr_result.get("response_text") or "").upper():
-            pipeline_report["violations"].append("qr_codes")
-        
-        # 🎯 Final Decision Logic
-        pipeline_report["violations"] = list(set(pipeline_report["violations"]))  # Remove duplicates
-        
-        if pipeline_report["violations"]:
-            # Check for high-priority violations
-            high_priority = ["nudity", "blood/gore", "weapons", "death/corpses", "self-harm", "abuse/torture"]
-            medium_priority = ["drugs", "hate_symbols", "threatening/abusive text"]
-            low_priority = ["alcohol", "smoking", "qr_codes", "personal information"]
+        print("🔄 Running agent graph...")
+        for node, result in iter_dag(dag, {"image_path": image_path}, max_workers, pipeline_report["timings"]["agents"], deadline, lane):
+            print(f"{node.label}: {result.get('status')}")
+            pipeline_report["agent_results"][node.name] = result
             
-            has_high_priority = any(violation in high_priority for violation in pipeline_report["violations"])
-            has_medium_priority = any(violation in medium_priority for violation in pipeline_report["violations"])
+            # Every other agent depends on ingestion: stop here if it failed
+            # (a timeout is handled like any other missing agent)
+            if node.name == "ingestion" and result.get("status") not in ("success", "timeout"):
+                pipeline_report["final_decision"] = policy.reject_decision
+                pipeline_report["violations"].append("image_processing_error")
+                yield agent_event(node, result, pipeline_report["violations"], pipeline_report["final_decision"])
+                yield report_event()
+                return
             
-            if has_high_priority:
-                pipeline_report["final_decision"] = "Reject"
-            elif has_medium_priority:
-                pipeline_report["final_decision"] = "Flag"
-            else:
-                pipeline_report["final_decision"] = "Flag"
+            scorer = CONFIDENCE_SCORERS.get(node.confidence)
+            if scorer is not None and result.get("status") != "skipped":
+                pipeline_report["confidence_scores"][node.name] = scorer(result)
+            
+            yield agent_event(node, result, *policy.evaluate(pipeline_report["agent_results"]))
+        
+        # 🎯 Final Decision Logic (configs/decision_policy.yaml)
+        violations, final_decision = policy.evaluate(pipeline_report["agent_results"])
+        pipeline_report["violations"] = violations
+        pipeline_report["final_decision"] = final_decision
         
-        print("✅ Pipeline completed successfully!")
+        missing = timed_out_agents(pipeline_report["agent_results"])
+        if missing:
+            pipeline_report["missing_agents"] = missing
+            print(f"⏰ Deadline reached before: {', '.join(missing)}")
+        else:
+            print("✅ Pipeline completed successfully!")
         
     except Exception as e:
         pipeline_report["status"] = "error"
-        pipeline_report["final_decision"] = "Reject"
-        pipeline_report["violations"].append("pipeline_error")
+        pipeline_report["final_decision"] = policy.reject_decision
+        pipeline_report["violations"] = policy.violations_for(pipeline_report["agent_results"])
+        pipeline_report["violations"].append(PIPELINE_ERROR)
         pipeline_report["error_message"] = str(e)
         print(f"❌ Pipeline error: {e}")
     
+    yield report_event()
+
+async def aiter_central_moderation_pipeline(image_path: str, max_workers: int | None = None, verbose: bool = False,
+                                            deadline_seconds: float | None = DEADLINE_SECONDS,
+                                            lane: str | None = None) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Async iterator over the same events as iter_central_moderation_pipeline;
+    the pipeline runs in the event loop's default executor.
+    """
+    loop = asyncio.get_running_loop()
+    # The generator starts on an executor thread, so resolve the caller's lane here
+    events = iter_central_moderation_pipeline(image_path, max_workers, verbose, deadline_seconds, lane or current_lane())
+    done = object()
+    try:
+        while True:
+            event = await loop.run_in_executor(None, next, events, done)
+            if event is done:
+                return
+            yield event
+    finally:
+        # Stop the pipeline if the consumer stops early; running agents finish in the background
+        await loop.run_in_executor(None, events.close)
+
+def settle_report(pipeline_report: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Recompute confidence scores and the final decision from the report's
+    agent results, once deferred Gemini results have been filled in.
+    Reports that stopped at ingestion or failed are left as they are.
+    """
+    agent_results = pipeline_report["agent_results"]
+    ingestion = agent_results.get("ingestion", {})
+    if pipeline_report.get("status") != "success" or ingestion.get("status") != "success":
+        return pipeline_report
+    
+    for node in central_pipeline_dag():
+        result = agent_results.get(node.name)
+        scorer = CONFIDENCE_SCORERS.get(node.confidence)
+        if result is not None and scorer is not None and result.get("status") != "skipped":
+            pipeline_report["confidence_scores"][node.name] = scorer(result)
+    
+    violations, final_decision = default_policy().evaluate(agent_results)
+    pipeline_report["violations"] = violations
+    pipeline_report["final_decision"] = final_decision
     return pipeline_report
 
+def run_central_moderation_batch(
+    image_paths: List[str],
+    pack_size: int = PACK_SIZE,
+    max_workers: int | None = None,
+    verbose: bool = False,
+    resolve: Callable[[List[PendingRequest]], Dict[str, Any]] | None = None,
+) -> List[Dict[str, Any]]:
+    """
+    Offline batch mode: moderate several images, sending up to `pack_size`
+    images per Gemini request (tools/gemini_packing.py), or resolving the
+    requests with `resolve` instead, e.g. a batch-prediction job
+    (tools/gemini_batch_jobs.py).
+    
+    Every image runs through the agent graph with its Gemini requests queued;
+    the queued requests are then resolved and the reports settled. Gemini
+    agents' results are only known after that, so no DAG node may depend on
+    one. Per-agent timings cover the local work only.
+    
+    Returns one report per image, in order.
+    """
+    collector = RequestCollector()
+    previous = gemini_vision.use_request_collector(collector)
+    try:
+        reports = [run_central_moderation_pipeline(image_path, max_workers) for image_path in image_paths]
+    finally:
+        gemini_vision.use_request_collector(previous)
+    
+    start_time = time.perf_counter()
+    if resolve is not None:
+        stats = resolve(collector.requests)
+        print(f"📦 Resolved {len(collector)} queued Gemini requests: {stats}")
+    else:
+        stats = resolve_packed(collector.requests, pack_size)
+        print(f"📦 Packed {stats['packed_images']} Gemini requests into {stats['packed_calls']} calls "
+              f"({stats['fallbacks']} fallbacks, {stats['single_calls']} single-image calls)")
+    # The Gemini calls are shared by the whole batch
+    resolve_seconds = (time.perf_counter() - start_time) / max(len(reports), 1)
+    
+    for report in reports:
+        settle_report(report)
+        report["timings"]["total_seconds"] += resolve_seconds
+    return [expand_report(report) for report in reports] if verbose else reports
+
 def get_confidence_table_reference() -> str:
     """Get the confidence table reference for output."""
     return """
@@ -402,37 +346,17 @@ def print_moderation_report(report: Dict[str, Any]) -> None:
     
     print("\n" + "="*80)
 
-def export_json_report(report: Dict[str, Any], output_path: str | None = None) -> str:
-    """Export the moderation report as JSON."""
-    # Add confidence table reference to the report
-    report_with_reference = report.copy()
-    report_with_reference["confidence_table_reference"] = {
-        "description": "Confidence Score Reference Table",
-        "table": {
-            "0.9": {"level": "Very High", "meaning": "Agent is extremely confident in detection", "keywords": ["CLEARLY", "DEFINITELY", "CERTAINLY", "OBVIOUSLY", "UNDOUBTEDLY", "WITHOUT DOUBT", "CONFIRMED", "IDENTIFIED"]},
-            "0.8": {"level": "High", "meaning": "Agent detected violation with high certainty", "keywords": ["YES", "VIOLATION", "DETECTED", "FOUND", "PRESENT", "SHOWS", "CONTAINS", "DISPLAYS"]},
-            "0.6": {"level": "Medium-High", "meaning": "Agent thinks violation is likely", "keywords": ["LIKELY", "PROBABLY", "APPEARS", "SEEMS", "INDICATES", "SUGGESTS", "MIGHT BE"]},
-            "0.5": {"level": "Medium", "meaning": "Agent is uncertain or neutral", "keywords": ["No specific confidence indicators found"]},
-            "0.4": {"level": "Medium-Low", "meaning": "Agent is uncertain about detection", "keywords": ["UNCERTAIN", "NOT CLEARLY", "MAYBE", "POSSIBLY", "MIGHT", "COULD BE", "UNSURE"]},
-            "0.1": {"level": "Low", "meaning": "Agent found no violations", "keywords": ["NO", "NOT DETECTED", "CLEAN", "SAFE", "NONE FOUND", "ABSENT", "NOT PRESENT"]},
-            "0.0": {"level": "Error", "meaning": "Agent failed to process", "keywords": ["Agent error or no response"]}
-        },
-        "explanation": {
-            "0.9": "Very High - Strong evidence for decision-making",
-            "0.8": "High - Reliable detection, can be used for automated decisions",
-            "0.6": "Medium-High - Good evidence, may need review",
-            "0.5": "Medium - Neutral evidence, requires human review",
-            "0.4": "Medium-Low - Weak evidence, likely false positive",
-            "0.1": "Low - Strong evidence of safety",
-            "0.0": "Error - No evidence available, manual review required"
-        }
-    }
-    
-    json_report = json.dumps(report_with_reference, indent=2, default=str)
+def export_json_report(report: Dict[str, Any], output_path: str | None = None, verbose: bool = False) -> str:
+    """
+    Export the moderation report as JSON. Compact by default; verbose=True adds
+    prompt texts, detailed_report and the confidence table reference.
+    """
+    view = expand_report(report) if verbose else compact_report(report)
+    json_report = json.dumps(view, indent=2, default=str)
     
     if output_path:
         with open(output_path, 'w') as f:
             f.write(json_report)
         print(f"📄 Report exported to: {output_path}")
     
-    return json_report 
\ No newline at end of file
+    return json_report 
@@ -0,0 +1,35 @@
+import contextlib
+import threading
+import time
+
+# Per-image deadlines.
+#
+# The pipeline runs each agent inside deadline_scope(deadline), where
+# `deadline` is an absolute time.monotonic() value; code further down (the
+# Gemini call path) reads remaining_seconds() to bound its own waits.
+# Scopes are per thread: code that hands work to another thread must read
+# the remaining time first.
+
+_local = threading.local()
+
+class DeadlineExceeded(TimeoutError):
+    """The image's deadline passed before the work could start or finish."""
+
+@contextlib.contextmanager
+def deadline_scope(deadline: float | None):
+    previous = getattr(_local, "deadline", None)
+    _local.deadline = deadline
+    try:
+        yield
+    finally:
+        _local.deadline = previous
+
+def current_deadline() -> float | None:
+    return getattr(_local, "deadline", None)
+
+def remaining_seconds() -> float | None:
+    """Seconds left before this thread's deadline, or None without one."""
+    deadline = current_deadline()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
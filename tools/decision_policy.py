@@ -0,0 +1,270 @@
+import json
+from functools import lru_cache
+from typing import Dict, List, Any, Tuple
+
+import yaml
+
+from tools.response_parsing import VIOLATION_MATCHER, parse_violation_type
+
+# Declarative Accept/Reject/Flag policy.
+#
+# The policy is loaded from configs/decision_policy.yaml and can be applied
+# either to a single report's agent_results (used by the live pipeline) or in
+# bulk to a DataFrame/Arrow table of stored reports, without re-running any
+# detector.
+
+DEFAULT_POLICY_PATH = "configs/decision_policy.yaml"
+# What to decide when agents ran out of time under a pipeline deadline
+MISSING_AGENT_MODES = ("flag", "decide", "retry")
+TIMEOUT_STATUS = "timeout"
+# Violations the pipeline adds to the reports it rejects without a decision from the agents
+INGESTION_ERROR = "image_processing_error"
+PIPELINE_ERROR = "pipeline_error"
+
+class AgentRule:
+    """How one agent's result is turned into violations."""
+
+    def __init__(self, agent: str, field: str, equals: Any = None, contains: str | None = None, violations: Any = "parsed"):
+        if (equals is None) == (contains is None):
+            raise ValueError(f"Agent rule '{agent}' needs exactly one of trigger.equals / trigger.contains")
+        self.agent = agent
+        self.field = field
+        self.equals = equals
+        self.contains = contains.upper() if contains is not None else None
+        self.parsed = violations == "parsed"
+        self.violations = [] if self.parsed else list(violations)
+
+    def is_triggered(self, result: dict) -> bool:
+        value = result.get(self.field)
+        if self.equals is not None:
+            return value == self.equals
+        return self.contains in (value or "").upper()
+
+    def violations_for(self, result: dict) -> List[str]:
+        if not self.is_triggered(result):
+            return []
+        if self.parsed:
+            return parse_violation_type(result.get("response_text", ""))
+        return list(self.violations)
+
+class DecisionPolicy:
+    def __init__(self, agents: List[AgentRule], tiers: List[dict], unmatched_violation_decision: str = "Flag", clean_decision: str = "Accept",
+                 missing_agents: str = "flag", flag_decision: str = "Flag", retry_decision: str = "Retry", reject_decision: str = "Reject"):
+        if missing_agents not in MISSING_AGENT_MODES:
+            raise ValueError(f"Invalid missing_agents: {missing_agents} (expected one of {MISSING_AGENT_MODES})")
+        self.agents = agents
+        self.tiers = [
+            {"name": tier.get("name", tier["decision"]), "decision": tier["decision"], "violations": set(tier["violations"])}
+            for tier in tiers
+        ]
+        self.unmatched_violation_decision = unmatched_violation_decision
+        self.clean_decision = clean_decision
+        self.missing_agents = missing_agents
+        self.flag_decision = flag_decision
+        self.retry_decision = retry_decision
+        self.reject_decision = reject_decision
+
+    @classmethod
+    def from_dict(cls, config: dict) -> "DecisionPolicy":
+        agents = []
+        for agent, rule in config.get("agents", {}).items():
+            trigger = rule.get("trigger", {})
+            agents.append(AgentRule(
+                agent,
+                field=trigger.get("field", "response_text"),
+                equals=trigger.get("equals"),
+                contains=trigger.get("contains"),
+                violations=rule.get("violations", "parsed"),
+            ))
+        return cls(
+            agents,
+            config.get("tiers", []),
+            config.get("unmatched_violation_decision", "Flag"),
+            config.get("clean_decision", "Accept"),
+            config.get("missing_agents", "flag"),
+        )
+
+    def violations_for(self, agent_results: Dict[str, dict]) -> List[str]:
+        """Violations implied by a report's agent_results, de-duplicated in agent order."""
+        violations = []
+        for rule in self.agents:
+            result = agent_results.get(rule.agent)
+            if isinstance(result, dict):
+                violations.extend(rule.violations_for(result))
+        return list(dict.fromkeys(violations))
+
+    def known_violations(self) -> List[str]:
+        """Every violation type this policy can produce, in agent then tier order."""
+        known = []
+        for rule in self.agents:
+            known.extend(VIOLATION_MATCHER.categories if rule.parsed else rule.violations)
+        for tier in self.tiers:
+            known.extend(sorted(tier["violations"]))
+        return list(dict.fromkeys(known))
+
+    def decide(self, violations: List[str]) -> str:
+        if not violations:
+            return self.clean_decision
+        for tier in self.tiers:
+            if tier["violations"].intersection(violations):
+                return tier["decision"]
+        return self.unmatched_violation_decision
+
+    def evaluate(self, agent_results: Dict[str, dict]) -> Tuple[List[str], str]:
+        """
+        Returns (violations, final_decision) for one report. If agents timed
+        out, the missing_agents mode applies unless the agents that finished
+        already lead to a Reject.
+        """
+        violations = self.violations_for(agent_results)
+        decision = self.decide(violations)
+        if decision == self.reject_decision or self.missing_agents == "decide" or not timed_out_agents(agent_results):
+            return violations, decision
+        if self.missing_agents == "retry":
+            return violations, self.retry_decision
+        return violations, self.flag_decision
+
+    def most_severe(self, decisions: List[str]) -> str:
+        """
+        The most severe of several reports' decisions (e.g. the frames of one
+        video): Reject, then tier order, Retry, Flag, and Accept last.
+        Unknown decisions rank first.
+        """
+        order = [self.reject_decision] + [tier["decision"] for tier in self.tiers] + [
+            self.retry_decision, self.flag_decision, self.unmatched_violation_decision, self.clean_decision]
+        rank = {decision: i for i, decision in reversed(list(enumerate(order)))}
+        return min(decisions, key=lambda decision: rank.get(decision, -1), default=self.clean_decision)
+
+def timed_out_agents(agent_results: Dict[str, dict]) -> List[str]:
+    """Agents that did not finish before the pipeline deadline."""
+    return [
+        agent for agent, result in agent_results.items()
+        if isinstance(result, dict) and result.get("status") == TIMEOUT_STATUS
+    ]
+
+def load_policy(path: str = DEFAULT_POLICY_PATH) -> DecisionPolicy:
+    with open(path, "r") as f:
+        return DecisionPolicy.from_dict(yaml.safe_load(f))
+
+@lru_cache(maxsize=1)
+def default_policy() -> DecisionPolicy:
+    return load_policy(DEFAULT_POLICY_PATH)
+
+# ---------------------------------------------------------------------------
+# Bulk re-decision over stored reports
+# ---------------------------------------------------------------------------
+
+def _flatten_reports(reports):
+    """
+    Normalise input into a DataFrame with "agent_results.<agent>.<field>" columns.
+    Accepts a list of report dicts, a DataFrame (already flattened, or with an
+    "agent_results" column of dicts/JSON strings) or a pyarrow Table.
+    """
+    import pandas as pd
+
+    if isinstance(reports, list):
+        reports = pd.DataFrame(reports)
+    elif not isinstance(reports, pd.DataFrame) and hasattr(reports, "to_pandas"):
+        reports = reports.to_pandas()
+
+    if "agent_results" not in reports.columns:
+        return reports
+
+    agent_results = [
+        json.loads(value) if isinstance(value, str) else (value or {})
+        for value in reports["agent_results"]
+    ]
+    flat = pd.json_normalize(agent_results).add_prefix("agent_results.")
+    flat.index = reports.index
+    return pd.concat([reports.drop(columns=["agent_results"]), flat], axis=1)
+
+def redecide_frame(reports, policy: DecisionPolicy | None = None, with_violation_lists: bool = False):
+    """
+    Vectorized re-evaluation of stored reports under a (possibly changed) policy.
+
+    Returns a DataFrame aligned with the input rows containing one boolean
+    "violation.<type>" column per violation, "final_decision" and, when the
+    input carried one, "previous_decision" and "decision_changed".
+    """
+    import pandas as pd
+
+    policy = policy or default_policy()
+    frame = _flatten_reports(reports)
+    index = frame.index
+    no_hit = pd.Series(False, index=index)
+
+    def text_column(agent: str, field: str):
+        column = f"agent_results.{agent}.{field}"
+        if column not in frame.columns:
+            return pd.Series("", index=index)
+        return frame[column].fillna("").astype(str).str.upper()
+
+    violation_masks: Dict[str, Any] = {}
+    for rule in policy.agents:
+        if rule.equals is not None:
+            column = f"agent_results.{rule.agent}.{rule.field}"
+            triggered = frame[column].eq(rule.equals).fillna(False) if column in frame.columns else no_hit
+        else:
+            triggered = text_column(rule.agent, rule.field).str.contains(rule.contains, regex=False)
+
+        if rule.parsed:
+            # One matcher pass per row yields every violation type at once
+            hit_sets = text_column(rule.agent, "response_text").map(VIOLATION_MATCHER.match)
+            hits = {
+                violation: triggered & pd.Series([violation in s for s in hit_sets], index=index)
+                for violation in VIOLATION_MATCHER.categories
+            }
+        else:
+            hits = {violation: triggered for violation in rule.violations}
+
+        for violation, mask in hits.items():
+            violation_masks[violation] = violation_masks.get(violation, no_hit) | mask
+
+    # Reports the pipeline rejected outright: failed ingestion (no agent ran on
+    # the image) or an exception in the pipeline itself
+    failures: Dict[str, Any] = {}
+    if "agent_results.ingestion.status" in frame.columns:
+        status = frame["agent_results.ingestion.status"]
+        failures[INGESTION_ERROR] = status.notna() & ~status.isin(["success", TIMEOUT_STATUS])
+    if "status" in frame.columns:
+        failures[PIPELINE_ERROR] = frame["status"].notna() & frame["status"].ne("success")
+    for violation, mask in failures.items():
+        violation_masks[violation] = violation_masks.get(violation, no_hit) | mask.astype(bool)
+
+    result = pd.DataFrame(
+        {f"violation.{violation}": mask.astype(bool) for violation, mask in violation_masks.items()},
+        index=index,
+    )
+
+    any_violation = result.any(axis=1) if len(result.columns) else no_hit
+    decision = pd.Series(policy.clean_decision, index=index, dtype=object)
+    decision[any_violation] = policy.unmatched_violation_decision
+    # Apply tiers lowest-first so the first matching tier wins
+    for tier in reversed(policy.tiers):
+        columns = [f"violation.{v}" for v in tier["violations"] if f"violation.{v}" in result.columns]
+        if columns:
+            decision[result[columns].any(axis=1)] = tier["decision"]
+    # Agents that timed out under a pipeline deadline: the missing_agents mode, as in evaluate()
+    if policy.missing_agents != "decide":
+        status_columns = [
+            column for column in frame.columns
+            if column.startswith("agent_results.") and column.endswith(".status") and column.count(".") == 2
+        ]
+        if status_columns:
+            timed_out = frame[status_columns].eq(TIMEOUT_STATUS).any(axis=1)
+            override = policy.retry_decision if policy.missing_agents == "retry" else policy.flag_decision
+            decision[timed_out & (decision != policy.reject_decision)] = override
+    for mask in failures.values():
+        decision[mask.astype(bool)] = policy.reject_decision
+    result["final_decision"] = decision
+
+    if with_violation_lists:
+        names = list(violation_masks)
+        flags = result[[f"violation.{v}" for v in names]].to_numpy()
+        result["violations"] = [[v for v, hit in zip(names, row) if hit] for row in flags]
+
+    if "final_decision" in frame.columns:
+        result["previous_decision"] = frame["final_decision"]
+        result["decision_changed"] = result["previous_decision"] != result["final_decision"]
+
+    return result
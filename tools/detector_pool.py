@@ -0,0 +1,289 @@
+import importlib
+import multiprocessing
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Tuple
+
+from tools.shared_images import SharedImage, decode_image, run_on_shared
+
+# Local detectors (NudeNet, ResNet) in worker processes.
+#
+# Each image is decoded once in the parent into shared memory
+# (tools/shared_images.py); every detector task gets only a reference to
+# it and reads the pixels in place, so neither the decoded image nor a copy
+# of it is pickled per task. The block is reference-counted, one reference
+# per task, and freed when the last detector reading it finishes.
+#
+# transport="pickle" sends the decoded array with every task instead; it
+# exists to measure the difference (see README, Local Detector Processes).
+#
+# Enable for the pipeline with LOCAL_DETECTOR_WORKERS=N, or programmatically
+# via use_detector_pool(); without a pool the detectors run in-process.
+# Pipeline nodes each ask for one detector, so the first node to ask about
+# an image submits every detector the pipeline DAG runs (pipeline_detectors)
+# on that one shared block, and the other nodes pick up their futures.
+# batch_scope() runs NudeNet over many images (e.g. a video's keyframes)
+# up front, and the pipelines for those images reuse the results.
+
+# Detector name -> function taking a BGR uint8 array
+LOCAL_DETECTORS = {
+    "nudity": "tools.nudity_detector.detect_nudity_in_pixels",
+    "violence_resnet": "tools.violence_detector.detect_violence_in_pixels",
+}
+DETECTOR_WORKERS = int(os.environ.get("LOCAL_DETECTOR_WORKERS", "0"))
+TRANSPORTS = ("shared", "pickle")
+# Pipeline node tools below -> the pool detector they run
+NODE_DETECTORS = {"detect_nudity": "nudity", "detect_violence": "violence_resnet"}
+# Images whose not-yet-claimed detector results are kept (a node that never runs leaves one behind)
+UNCLAIMED_IMAGES = 64
+
+# Worker-side cache of resolved detector functions (their models load on first use)
+_detectors: Dict[str, Callable] = {}
+
+def _detector(dotted_path: str) -> Callable:
+    fn = _detectors.get(dotted_path)
+    if fn is None:
+        module_name, _, attr = dotted_path.rpartition(".")
+        fn = _detectors[dotted_path] = getattr(importlib.import_module(module_name), attr)
+    return fn
+
+def _run_shared(dotted_path: str, ref) -> Any:
+    return run_on_shared(ref, _detector(dotted_path))
+
+def _run_pickled(dotted_path: str, pixels) -> Any:
+    return _detector(dotted_path)(pixels)
+
+def _default_start_method() -> str:
+    # Workers load their own models; forking a parent with running threads and ONNX/torch state is unsafe
+    return "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+
+class DetectorPool:
+    def __init__(self, workers: int | None = None, detectors: Dict[str, str] | None = None,
+                 transport: str = "shared", start_method: str | None = None):
+        if transport not in TRANSPORTS:
+            raise ValueError(f"Unknown transport: {transport} (expected one of {TRANSPORTS})")
+        self.workers = workers
+        self.detectors = dict(detectors or LOCAL_DETECTORS)
+        self.transport = transport
+        self.start_method = start_method or _default_start_method()
+        self.images = 0
+        self.bytes_decoded = 0
+        self._executor = None
+        self._lock = threading.Lock()
+        # (absolute image path, mtime, size) -> futures submitted together but not yet claimed, oldest first
+        self._unclaimed: "OrderedDict[Tuple[str, int, int], Dict[str, Future]]" = OrderedDict()
+        self._unclaimed_lock = threading.Lock()
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context(self.start_method)
+                )
+            return self._executor
+
+    def submit(self, image_path: str, names: List[str] | None = None) -> Dict[str, Future]:
+        """Start the named detectors (default: all) on one image; returns name -> Future."""
+        names = list(names or self.detectors)
+        unknown = [name for name in names if name not in self.detectors]
+        if unknown:
+            raise ValueError(f"Unknown local detectors: {unknown} (expected some of {sorted(self.detectors)})")
+        executor = self._get_executor()
+
+        if self.transport == "pickle":
+            pixels = decode_image(image_path)
+            self._count(pixels.nbytes)
+            return {name: executor.submit(_run_pickled, self.detectors[name], pixels) for name in names}
+
+        image = SharedImage.from_file(image_path)
+        self._count(image.nbytes)
+        image.retain(len(names))
+        futures = {}
+        try:
+            for name in names:
+                futures[name] = executor.submit(_run_shared, self.detectors[name], image.ref)
+                futures[name].add_done_callback(lambda _: image.release())
+        finally:
+            # References for tasks that never started
+            for _ in range(len(names) - len(futures)):
+                image.release()
+        return futures
+
+    def claim(self, image_path: str, name: str, together: List[str]) -> Future:
+        """
+        Future of detector `name` on one image. The first claim for an image
+        submits `name` and the other detectors in `together` on one decoded
+        block; their later claims get those futures instead of decoding again.
+        Unclaimed futures are kept for the last UNCLAIMED_IMAGES images.
+        """
+        # A file rewritten at the same path is a different image
+        stat = os.stat(image_path)
+        key = (os.path.abspath(image_path), stat.st_mtime_ns, stat.st_size)
+        with self._unclaimed_lock:
+            unclaimed = self._unclaimed.get(key)
+            owner = unclaimed is None or name not in unclaimed
+            if owner:
+                names = list(dict.fromkeys([name] + [n for n in together if n in self.detectors]))
+                unclaimed = {n: Future() for n in names}
+                if len(names) > 1:
+                    self._unclaimed[key] = unclaimed
+                    while len(self._unclaimed) > UNCLAIMED_IMAGES:
+                        self._unclaimed.popitem(last=False)
+            placeholders = dict(unclaimed)
+            future = unclaimed.pop(name)
+            if not unclaimed and self._unclaimed.get(key) is unclaimed:
+                del self._unclaimed[key]
+        if not owner:
+            return future
+
+        try:
+            submitted = self.submit(image_path, list(placeholders))
+        except Exception as e:
+            submitted = {}
+            for placeholder in placeholders.values():
+                placeholder.set_exception(e)
+        for n, task in submitted.items():
+            task.add_done_callback(lambda task, placeholder=placeholders[n]: _copy_outcome(task, placeholder))
+        return future
+
+    def _count(self, nbytes: int) -> None:
+        with self._lock:
+            self.images += 1
+            self.bytes_decoded += nbytes
+
+    def detect(self, image_path: str, names: List[str] | None = None) -> Dict[str, dict]:
+        """Run the named detectors (default: all) on one image; returns name -> result."""
+        return self.detect_many([image_path], names)[0]
+
+    def detect_many(self, image_paths: List[str], names: List[str] | None = None) -> List[Dict[str, dict]]:
+        """detect() for several images at once, keeping every worker busy; results in order."""
+        names = list(names or self.detectors)
+        submitted = []
+        for image_path in image_paths:
+            if not os.path.exists(image_path):
+                submitted.append({name: {"status": "error", "message": f"Image not found at: {image_path}"} for name in names})
+                continue
+            try:
+                submitted.append(self.submit(image_path, names))
+            except ValueError as e:
+                submitted.append({name: {"status": "error", "message": str(e)} for name in names})
+
+        results = []
+        for futures in submitted:
+            image_results = {}
+            for name, future in futures.items():
+                if not isinstance(future, Future):
+                    image_results[name] = future
+                    continue
+                try:
+                    image_results[name] = future.result()
+                except Exception as e:
+                    image_results[name] = {"status": "error", "message": str(e)}
+            results.append(image_results)
+        return results
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"transport": self.transport, "images": self.images, "bytes_decoded": self.bytes_decoded}
+
+    def close(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def _copy_outcome(source: Future, target: Future) -> None:
+    if source.exception() is not None:
+        target.set_exception(source.exception())
+    else:
+        target.set_result(source.result())
+
+def detector_pool_from_env() -> DetectorPool | None:
+    return DetectorPool(DETECTOR_WORKERS) if DETECTOR_WORKERS > 0 else None
+
+# Pool used by the pipeline's local detector nodes (None: run in-process)
+pool = detector_pool_from_env()
+
+def use_detector_pool(new_pool: DetectorPool | None):
+    """Run local detectors in worker processes (None runs them in-process). Returns the previous pool."""
+    global pool
+    previous = pool
+    pool = new_pool
+    return previous
+
+# Results computed ahead of the pipeline for a batch of images (see batch_scope),
+# keyed by (absolute image path, detector name)
+_batched: Dict[Tuple[str, str], dict] = {}
+_batched_lock = threading.Lock()
+
+@contextmanager
+def batch_scope(image_paths: List[str]):
+    """
+    Run NudeNet on all image_paths at once (across the pool's workers, or in
+    NudeNet batches in-process), before the pipelines for those images start.
+    Inside the scope, detect_nudity returns the batch's result for these
+    paths instead of running the detector again.
+    """
+    active_pool = pool
+    if active_pool is not None:
+        results = [image_results["nudity"] for image_results in active_pool.detect_many(image_paths, ["nudity"])]
+    else:
+        from tools.nudity_detector import detect_nudity_batch
+        results = detect_nudity_batch(image_paths)
+    keys = [(os.path.abspath(image_path), "nudity") for image_path in image_paths]
+    with _batched_lock:
+        _batched.update(zip(keys, results))
+    try:
+        yield results
+    finally:
+        with _batched_lock:
+            for key in keys:
+                _batched.pop(key, None)
+
+@lru_cache(maxsize=1)
+def pipeline_detectors() -> Tuple[str, ...]:
+    """Pool detectors the central pipeline DAG runs, in node order."""
+    from tools.agent_dag import central_pipeline_dag
+
+    names = [
+        NODE_DETECTORS[node.tool.__name__] for node in central_pipeline_dag()
+        if getattr(node.tool, "__module__", None) == __name__ and node.tool.__name__ in NODE_DETECTORS
+    ]
+    return tuple(dict.fromkeys(names))
+
+def _detect_in_pool(active_pool: DetectorPool, image_path: str, name: str) -> dict:
+    if not os.path.exists(image_path):
+        return {"status": "error", "message": f"Image not found at: {image_path}"}
+    try:
+        return active_pool.claim(image_path, name, list(pipeline_detectors())).result()
+    except Exception as e:
+        return {"status": "error", "message": str(e)}
+
+def detect_nudity(image_path: str) -> dict:
+    """tools.nudity_detector.detect_nudity, in the detector pool when one is active."""
+    batched = _batched.get((os.path.abspath(image_path), "nudity"))
+    if batched is not None:
+        return batched
+    active_pool = pool
+    if active_pool is None:
+        from tools.nudity_detector import detect_nudity as detect_in_process
+        return detect_in_process(image_path)
+    return _detect_in_pool(active_pool, image_path, "nudity")
+
+def detect_violence(image_path: str) -> dict:
+    """tools.violence_detector.detect_violence, in the detector pool when one is active."""
+    active_pool = pool
+    if active_pool is None:
+        from tools.violence_detector import detect_violence as detect_in_process
+        return detect_in_process(image_path)
+    return _detect_in_pool(active_pool, image_path, "violence_resnet")
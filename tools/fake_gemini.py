@@ -0,0 +1,184 @@
+import hashlib
+import json
+import math
+import random
+import re
+import threading
+import time
+from typing import Dict, List, Any, Callable
+
+from tools.prompt_registry import load_agent_prompts
+
+# Offline stand-in for the Gemini GenerativeModel.
+# Replays recorded responses per agent with a configurable latency
+# distribution and error rate, so the pipeline can be exercised without
+# network access or API quota:
+#
+#     from tools.gemini_vision import set_model
+#     set_model(FakeGeminiModel.from_file(DEFAULT_RESPONSES_PATH, latency="lognormal:1200:0.4"))
+
+DEFAULT_RESPONSES_PATH = "data/recorded_responses/gemini_responses.json"
+
+class FakeGeminiError(Exception):
+    """Mimics the google.api_core errors raised by generate_content (carries an HTTP code)."""
+
+    def __init__(self, code: int, message: str):
+        super().__init__(f"{code} {message}")
+        self.code = code
+
+class FakeResponse:
+    def __init__(self, text: str):
+        self.text = text
+
+def make_latency_sampler(spec: str) -> Callable[[random.Random], float]:
+    """
+    Build a latency sampler (seconds) from a spec string, milliseconds throughout:
+        "fixed:800"              -> always 800 ms
+        "uniform:400:1600"       -> uniform between 400 and 1600 ms
+        "lognormal:1200:0.4"     -> lognormal with median 1200 ms and sigma 0.4
+        "none"                   -> no latency
+    """
+    parts = spec.split(":")
+    kind = parts[0].lower()
+    args = [float(p) for p in parts[1:]]
+
+    if kind == "none":
+        return lambda rng: 0.0
+    if kind == "fixed" and len(args) == 1:
+        return lambda rng: args[0] / 1000.0
+    if kind == "uniform" and len(args) == 2:
+        return lambda rng: rng.uniform(args[0], args[1]) / 1000.0
+    if kind == "lognormal" and len(args) == 2:
+        mu = math.log(args[0])
+        return lambda rng: rng.lognormvariate(mu, args[1]) / 1000.0
+    raise ValueError(f"Invalid latency spec: {spec}")
+
+# Image labels of a multi-image request (see tools/gemini_packing.py)
+_IMAGE_LABEL_RE = re.compile(r"IMAGE \d+:")
+
+def _content_digest(content: Any) -> str:
+    """Stable digest of an image part, whatever form the caller sent it in."""
+    if isinstance(content, (bytes, bytearray)):
+        data = bytes(content)
+    elif isinstance(content, dict) and "data" in content:
+        data = content["data"]
+    elif hasattr(content, "uri") and hasattr(content, "data"):
+        # Local uploaded-file handle: same digest as sending the bytes inline
+        data = content.data
+    elif hasattr(content, "tobytes"):
+        data = content.tobytes()
+    else:
+        data = str(content).encode("utf-8")
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+def _content_size(content: Any) -> int:
+    """Upload payload size of an image part, in bytes (file references send no image bytes)."""
+    if isinstance(content, (bytes, bytearray)):
+        return len(content)
+    if isinstance(content, dict) and "data" in content:
+        return len(content["data"])
+    if hasattr(content, "uri"):
+        return 0
+    if hasattr(content, "tobytes"):
+        return len(content.tobytes())
+    return 0
+
+class FakeGeminiModel:
+    """
+    Deterministic replacement for GenerativeModel.generate_content.
+
+    The same (agent, image) pair always gets the same recorded response, and
+    injected errors/latencies are reproducible for a given seed, independent
+    of thread scheduling.
+    """
+
+    def __init__(
+        self,
+        responses: Dict[str, List[str]],
+        latency: str = "none",
+        error_rate: float = 0.0,
+        error_codes: tuple = (429, 503),
+        seed: int = 0,
+        max_concurrency: int | None = None,
+    ):
+        self.responses = responses
+        self.latency_sampler = make_latency_sampler(latency)
+        self.error_rate = error_rate
+        self.error_codes = error_codes
+        self.seed = seed
+        # Requests beyond this many in flight are rejected with 429, like an exhausted quota
+        self.max_concurrency = max_concurrency
+        self.in_flight = 0
+        self.agent_prompts = load_agent_prompts()
+        self.calls = 0
+        self.errors = 0
+        self.bytes_received = 0
+        self.prompt_chars = 0
+        self._attempts: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_file(cls, path: str = DEFAULT_RESPONSES_PATH, **kwargs) -> "FakeGeminiModel":
+        with open(path, "r") as f:
+            return cls(json.load(f), **kwargs)
+
+    def identify_agent(self, prompt: str) -> str:
+        for agent, text in self.agent_prompts.items():
+            if prompt.startswith(text):
+                return agent
+        return "unknown"
+
+    def generate_content(self, contents, cached_content: str | None = None, **kwargs) -> FakeResponse:
+        """
+        `cached_content` is the prompt prefix held by a context cache (see
+        tools/gemini_context_cache.py). Requests with labelled images get a
+        JSON array holding each image's single-image answer. A
+        request_options timeout shorter than the sampled latency fails with 504.
+        """
+        texts = [c for c in contents if isinstance(c, str)]
+        images = [c for c in contents if not isinstance(c, str)]
+        prompt = (cached_content or "") + (texts[0] if texts else "")
+        agent = self.identify_agent(prompt)
+        fingerprint = agent + ":" + ":".join(_content_digest(img) for img in images)
+
+        with self._lock:
+            attempt = self._attempts.get(fingerprint, 0)
+            self._attempts[fingerprint] = attempt + 1
+            self.calls += 1
+            self.bytes_received += sum(_content_size(img) for img in images)
+            self.prompt_chars += sum(len(text) for text in texts)
+            if self.max_concurrency is not None and self.in_flight >= self.max_concurrency:
+                self.errors += 1
+                raise FakeGeminiError(429, "Resource has been exhausted (fake quota)")
+            self.in_flight += 1
+
+        rng = random.Random(f"{self.seed}:{fingerprint}:{attempt}")
+        latency = self.latency_sampler(rng)
+        timeout = (kwargs.get("request_options") or {}).get("timeout")
+        try:
+            if timeout is not None and latency > timeout:
+                time.sleep(timeout)
+                raise FakeGeminiError(504, "Deadline Exceeded")
+            time.sleep(latency)
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+        if self.error_rate and rng.random() < self.error_rate:
+            with self._lock:
+                self.errors += 1
+            raise FakeGeminiError(rng.choice(self.error_codes), "Fake Gemini injected error")
+
+        labels = [text for text in texts[1:] if _IMAGE_LABEL_RE.fullmatch(text)]
+        if len(images) > 1 and len(labels) == len(images):
+            answers = [
+                {"image": i, "answer": self._answer(agent, agent + ":" + _content_digest(img))}
+                for i, img in enumerate(images, 1)
+            ]
+            return FakeResponse(json.dumps(answers))
+        return FakeResponse(self._answer(agent, fingerprint))
+
+    def _answer(self, agent: str, fingerprint: str) -> str:
+        candidates = self.responses.get(agent) or self.responses.get("unknown") or ["NO"]
+        index = int(hashlib.blake2b(fingerprint.encode("utf-8"), digest_size=4).hexdigest(), 16)
+        return candidates[index % len(candidates)]
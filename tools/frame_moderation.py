@@ -0,0 +1,246 @@
+import heapq
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterator, List, Tuple
+
+import cv2
+import numpy as np
+from PIL import Image, ImageSequence
+
+from tools import detector_pool
+from tools.central_moderation_pipeline import DEADLINE_SECONDS, run_central_moderation_pipeline
+from tools.decision_policy import default_policy
+from tools.image_preprocessor import MAX_SIZE, SNIFF_BYTES, sniff_format
+from tools.priority_scheduler import current_lane
+from tools.report_format import expand_report
+
+# Moderation of animated GIF/WebP and video files.
+#
+# Frames are decoded locally (Pillow for GIF/WebP, OpenCV's FFmpeg backend
+# for MP4/MOV/WebM/AVI) and sampled at SAMPLE_FPS. Each sampled frame gets a
+# 16x16 difference hash; a frame becomes a keyframe only if its hash differs
+# from the previous keyframe's in more than KEYFRAME_THRESHOLD of the bits,
+# so runs of near-identical frames (static shots, slow pans, looping GIFs)
+# collapse to one. At most MAX_KEYFRAMES are kept, shrunk to the ingestion
+# size, while the file is decoded: the first frame and the most different ones.
+#
+# Only keyframes go through the central pipeline. NudeNet runs on all of
+# them at once (detector_pool.batch_scope), then the keyframes' pipelines
+# run side by side and their reports are folded into one: the most severe
+# frame decision and the union of the frames' violations.
+
+SAMPLE_FPS = float(os.environ.get("FRAME_SAMPLE_FPS", "2"))
+KEYFRAME_THRESHOLD = float(os.environ.get("FRAME_DIFF_THRESHOLD", "0.2"))
+MAX_KEYFRAMES = int(os.environ.get("MAX_KEYFRAMES", "16"))
+FRAME_WORKERS = int(os.environ.get("FRAME_WORKERS", "4"))
+
+HASH_SIZE = 16
+# GIF/WebP frames without a duration are shown for 100 ms by browsers
+DEFAULT_FRAME_MS = 100
+
+def sniff_video(header: bytes) -> bool:
+    """Whether the first SNIFF_BYTES of a file look like a video container (MP4/MOV, WebM/MKV, AVI)."""
+    return (header[4:8] == b"ftyp"
+            or header.startswith(b"\x1a\x45\xdf\xa3")
+            or (header[:4] == b"RIFF" and header[8:12] == b"AVI "))
+
+def media_type(path: str) -> str:
+    """"video", "animation" (multi-frame GIF/WebP) or "image"."""
+    with open(path, "rb") as f:
+        header = f.read(SNIFF_BYTES)
+    if sniff_video(header):
+        return "video"
+    if sniff_format(header) in ("GIF", "WEBP"):
+        with Image.open(path) as img:
+            if getattr(img, "is_animated", False):
+                return "animation"
+    return "image"
+
+def iter_frames(path: str, sample_fps: float = SAMPLE_FPS) -> Iterator[Tuple[int, float, Image.Image]]:
+    """Yield (frame index, timestamp in seconds, RGB frame) for frames sampled at sample_fps."""
+    interval = 1.0 / sample_fps
+    if media_type(path) == "video":
+        capture = cv2.VideoCapture(path)
+        if not capture.isOpened():
+            raise ValueError(f"Could not open video: {path}")
+        try:
+            fps = capture.get(cv2.CAP_PROP_FPS) or 25.0
+            next_sample = 0.0
+            index = 0
+            # grab() advances without converting the frame to BGR; only sampled frames are retrieved
+            while capture.grab():
+                timestamp = index / fps
+                if timestamp >= next_sample:
+                    ok, bgr = capture.retrieve()
+                    if not ok:
+                        break
+                    yield index, timestamp, Image.fromarray(cv2.cvtColor(bgr, cv2.COLOR_BGR2RGB))
+                    next_sample = (int(timestamp / interval) + 1) * interval
+                index += 1
+        finally:
+            capture.release()
+        return
+
+    with Image.open(path) as img:
+        timestamp = next_sample = 0.0
+        for index, frame in enumerate(ImageSequence.Iterator(img)):
+            if timestamp >= next_sample:
+                yield index, timestamp, frame.convert("RGB")
+                next_sample = (int(timestamp / interval) + 1) * interval
+            timestamp += (frame.info.get("duration") or DEFAULT_FRAME_MS) / 1000.0
+
+def frame_hash(frame: Image.Image) -> np.ndarray:
+    """Difference hash: signs of horizontal gradients over a (HASH_SIZE+1) x HASH_SIZE grayscale thumbnail."""
+    pixels = np.asarray(frame.convert("L").resize((HASH_SIZE + 1, HASH_SIZE), Image.BILINEAR), dtype=np.int16)
+    return (pixels[:, 1:] > pixels[:, :-1]).ravel()
+
+def frame_difference(a: np.ndarray, b: np.ndarray) -> float:
+    """Fraction of differing hash bits (0: same picture, ~0.5: unrelated)."""
+    return float(np.count_nonzero(a != b)) / a.size
+
+def select_keyframes(frames, threshold: float = KEYFRAME_THRESHOLD,
+                     max_keyframes: int = MAX_KEYFRAMES) -> Tuple[List[Dict[str, Any]], int]:
+    """
+    Collapse similar consecutive frames. Returns (keyframes, sampled frame count);
+    each keyframe is {"frame_index", "timestamp", "difference", "image"}, in time
+    order, with the image shrunk to fit MAX_SIZE.
+    """
+    # Min-heap of (difference, -frame_index, keyframe): while streaming, only the
+    # max_keyframes biggest changes are held (the first frame, at 1.0, among them),
+    # and on ties the earlier frame is kept
+    kept: List[Tuple[float, int, Dict[str, Any]]] = []
+    last_hash = None
+    sampled = 0
+    for index, timestamp, frame in frames:
+        sampled += 1
+        current = frame_hash(frame)
+        difference = 1.0 if last_hash is None else frame_difference(current, last_hash)
+        if difference <= threshold:
+            continue
+        last_hash = current
+        entry = (round(difference, 3), -index)
+        if len(kept) >= max_keyframes and entry <= kept[0][:2]:
+            continue
+        frame.thumbnail(MAX_SIZE)
+        keyframe = {"frame_index": index, "timestamp": round(timestamp, 3), "difference": entry[0], "image": frame}
+        if len(kept) < max_keyframes:
+            heapq.heappush(kept, entry + (keyframe,))
+        else:
+            heapq.heapreplace(kept, entry + (keyframe,))
+    keyframes = sorted((keyframe for _, _, keyframe in kept), key=lambda keyframe: keyframe["frame_index"])
+    return keyframes, sampled
+
+def aggregate_frame_reports(media_path: str, keyframes: List[Dict[str, Any]], reports: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    One report for the whole file: the most severe frame decision, the union
+    of the frames' violations, and the agent results of the frame that
+    decided (the first frame with the final decision), with its agent
+    timings. `frames` summarizes each keyframe.
+    """
+    policy = default_policy()
+    final_decision = policy.most_severe([frame_report["final_decision"] for frame_report in reports])
+    deciding = next(frame_report for frame_report in reports if frame_report["final_decision"] == final_decision)
+
+    # Highest confidence any frame reached, per agent
+    confidence_scores = {}
+    for frame_report in reports:
+        for agent, score in frame_report.get("confidence_scores", {}).items():
+            if score is not None:
+                confidence_scores[agent] = max(score, confidence_scores.get(agent, score))
+
+    report = {
+        "status": "success" if all(frame_report["status"] == "success" for frame_report in reports) else "error",
+        "image_path": media_path,
+        "final_decision": final_decision,
+        "violations": list(dict.fromkeys(v for frame_report in reports for v in frame_report["violations"])),
+        "agent_results": deciding["agent_results"],
+        "confidence_scores": confidence_scores,
+        "timings": {"agents": deciding["timings"]["agents"]},
+        "frames": [
+            {
+                "frame_index": keyframe["frame_index"],
+                "timestamp": keyframe["timestamp"],
+                "final_decision": frame_report["final_decision"],
+                "violations": frame_report["violations"],
+            }
+            for keyframe, frame_report in zip(keyframes, reports)
+        ],
+    }
+    errors = [frame_report["error_message"] for frame_report in reports if frame_report.get("error_message")]
+    if errors:
+        report["error_message"] = errors[0]
+    missing = list(dict.fromkeys(agent for frame_report in reports for agent in frame_report.get("missing_agents", [])))
+    if missing:
+        report["missing_agents"] = missing
+    return report
+
+def run_frame_moderation(media_path: str, max_workers: int | None = None, verbose: bool = False,
+                         deadline_seconds: float | None = DEADLINE_SECONDS, lane: str | None = None,
+                         sample_fps: float = SAMPLE_FPS, threshold: float = KEYFRAME_THRESHOLD,
+                         max_keyframes: int = MAX_KEYFRAMES, frame_workers: int = FRAME_WORKERS) -> Dict[str, Any]:
+    """
+    Moderate an animated GIF/WebP or a video as one report (still images go
+    straight to run_central_moderation_pipeline).
+
+    The first five arguments are those of run_central_moderation_pipeline;
+    the deadline covers the whole file. The report has the usual fields plus:
+        - frames: per keyframe {frame_index, timestamp, final_decision, violations}
+        - media: {type, frames_sampled, keyframes}
+        - timings: total_seconds, decode_seconds and the deciding frame's agent timings
+    """
+    start_time = time.perf_counter()
+    deadline = time.monotonic() + deadline_seconds if deadline_seconds is not None else None
+    lane = lane or current_lane()
+
+    def error_report(message: str) -> Dict[str, Any]:
+        print(f"❌ Frame extraction failed: {message}")
+        return {
+            "status": "error",
+            "image_path": media_path,
+            "final_decision": default_policy().reject_decision,
+            "violations": ["image_processing_error"],
+            "agent_results": {},
+            "confidence_scores": {},
+            "error_message": message,
+            "timings": {"total_seconds": time.perf_counter() - start_time, "agents": {}},
+        }
+
+    try:
+        kind = media_type(media_path)
+    except OSError as e:
+        return error_report(str(e))
+    if kind == "image":
+        return run_central_moderation_pipeline(media_path, max_workers, verbose, deadline_seconds, lane)
+
+    try:
+        keyframes, sampled = select_keyframes(iter_frames(media_path, sample_fps), threshold, max_keyframes)
+    except Exception as e:
+        return error_report(str(e))
+    if not keyframes:
+        return error_report(f"No frames decoded from: {media_path}")
+    decode_seconds = time.perf_counter() - start_time
+    print(f"🎞️ {len(keyframes)} keyframes from {sampled} sampled frames of {media_path}")
+
+    def moderate(frame_path: str) -> Dict[str, Any]:
+        remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+        return run_central_moderation_pipeline(frame_path, max_workers, False, remaining, lane)
+
+    with tempfile.TemporaryDirectory(prefix="moderation_frames_") as frame_dir:
+        frame_paths = []
+        for keyframe in keyframes:
+            frame = keyframe.pop("image")
+            # Already within the ingestion limit (select_keyframes), so ingestion passes the file through unchanged
+            frame_paths.append(os.path.join(frame_dir, f"frame{keyframe['frame_index']:06d}.jpg"))
+            frame.save(frame_paths[-1], format="JPEG", quality=95)
+
+        with detector_pool.batch_scope(frame_paths):
+            with ThreadPoolExecutor(max_workers=max(1, min(frame_workers, len(frame_paths)))) as executor:
+                reports = list(executor.map(moderate, frame_paths))
+
+    report = aggregate_frame_reports(media_path, keyframes, reports)
+    report["media"] = {"type": kind, "frames_sampled": sampled, "keyframes": len(keyframes)}
+    report["timings"]["total_seconds"] = time.perf_counter() - start_time
+    report["timings"]["decode_seconds"] = decode_seconds
+    return expand_report(report) if verbose else report
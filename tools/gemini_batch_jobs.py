@@ -0,0 +1,238 @@
+import base64
+import json
+import os
+import threading
+import time
+import uuid
+from typing import Dict, Iterator, List, Any
+
+from tools import gemini_vision
+from tools.gemini_batching import PendingRequest
+
+# Batch-prediction jobs for offline backfills.
+#
+# Queued Gemini requests (tools/gemini_batching.py) are written to a JSONL
+# job file, one {"key", "request"} line each, submitted through a batch
+# backend and polled until the job finishes. Output lines are joined back
+# to the requests by key. Batch jobs are billed at a discount and do not
+# use the online request quota, at the cost of minutes-to-hours latency.
+#
+# Backends implement submit(job_path) -> job_id, poll(job_id) -> state,
+# download(job_id, output_path) and cancel(job_id); jobs still unfinished
+# at the timeout are cancelled so they stop being billed. GeminiBatchBackend uses the Gemini batch
+# API (google-genai, installed with google-adk); LocalBatchBackend runs the
+# job in-process against any model, e.g. FakeGeminiModel.
+
+BATCH_STATES = ("pending", "running", "succeeded", "failed", "cancelled")
+FINISHED_STATES = ("succeeded", "failed", "cancelled")
+POLL_INTERVAL_SECONDS = 30.0
+JOB_TIMEOUT_SECONDS = 24 * 3600
+
+class BatchJobError(Exception):
+    """A batch job failed, was cancelled or did not finish in time."""
+
+def _part_for_job(part) -> Dict[str, Any]:
+    if hasattr(part, "uri"):
+        # Uploaded-file handle (tools/gemini_files.py)
+        return {"file_data": {"file_uri": part.uri, "mime_type": part.mime_type}}
+    return {"inline_data": {"mime_type": part["mime_type"], "data": base64.b64encode(part["data"]).decode("ascii")}}
+
+def write_job_file(requests: List[PendingRequest], job_path: str) -> Dict[str, PendingRequest]:
+    """Write one job line per request; returns the requests by line key."""
+    by_key: Dict[str, PendingRequest] = {}
+    with open(job_path, "w", encoding="utf-8") as f:
+        for n, request in enumerate(requests):
+            key = f"request-{n}"
+            parts = [{"text": request.prompt}, _part_for_job(gemini_vision.image_part_for(request.image_path, request.agent))]
+            line = {"key": key, "request": {"contents": [{"role": "user", "parts": parts}]}}
+            f.write(json.dumps(line) + "\n")
+            by_key[key] = request
+    return by_key
+
+def response_text_from_output(output: Dict[str, Any]) -> str | None:
+    """Text of one output line's response (a GenerateContentResponse as JSON), or None."""
+    try:
+        parts = output["response"]["candidates"][0]["content"]["parts"]
+    except (KeyError, IndexError, TypeError):
+        return None
+    text = "\n".join(part["text"] for part in parts if "text" in part).strip()
+    return text or None
+
+def iter_jsonl_file(output_path: str) -> Iterator[Dict[str, Any]]:
+    with open(output_path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+class GeminiBatchBackend:
+    """Batch jobs through the Gemini batch API."""
+
+    # Gemini job states -> BATCH_STATES
+    STATES = {
+        "JOB_STATE_PENDING": "pending",
+        "JOB_STATE_QUEUED": "pending",
+        "JOB_STATE_RUNNING": "running",
+        "JOB_STATE_SUCCEEDED": "succeeded",
+        "JOB_STATE_FAILED": "failed",
+        "JOB_STATE_CANCELLED": "cancelled",
+        "JOB_STATE_EXPIRED": "failed",
+    }
+
+    def __init__(self, model_name: str = gemini_vision.MODEL_NAME, api_key: str = gemini_vision.GEMINI_API_KEY):
+        from google import genai as genai_client
+
+        self.model_name = model_name
+        self.client = genai_client.Client(api_key=api_key)
+
+    def submit(self, job_path: str) -> str:
+        uploaded = self.client.files.upload(
+            file=job_path,
+            config={"display_name": os.path.basename(job_path), "mime_type": "jsonl"},
+        )
+        job = self.client.batches.create(model=self.model_name, src=uploaded.name)
+        return job.name
+
+    def poll(self, job_id: str) -> str:
+        state = self.client.batches.get(name=job_id).state
+        return self.STATES.get(getattr(state, "name", str(state)), "running")
+
+    def download(self, job_id: str, output_path: str) -> None:
+        job = self.client.batches.get(name=job_id)
+        data = self.client.files.download(file=job.dest.file_name)
+        with open(output_path, "wb") as f:
+            f.write(data)
+
+    def cancel(self, job_id: str) -> None:
+        self.client.batches.cancel(name=job_id)
+
+class LocalBatchBackend:
+    """
+    In-process stand-in for the batch API. A job reports "pending" and
+    "running" for `polls_until_done` polls, then runs every line against
+    `model` and succeeds.
+    """
+
+    def __init__(self, model=None, polls_until_done: int = 2):
+        self.model = model
+        self.polls_until_done = polls_until_done
+        self.submitted = 0
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, job_path: str) -> str:
+        with self._lock:
+            self.submitted += 1
+            job_id = f"batches/local-{self.submitted}"
+            self._jobs[job_id] = {"path": job_path, "polls": 0, "state": "pending", "output": []}
+        return job_id
+
+    def poll(self, job_id: str) -> str:
+        job = self._jobs[job_id]
+        if job["state"] in FINISHED_STATES:
+            return job["state"]
+        job["polls"] += 1
+        if job["polls"] < self.polls_until_done:
+            job["state"] = "pending" if job["polls"] == 1 else "running"
+            return job["state"]
+        job["output"] = [self._run_line(line) for line in iter_jsonl_file(job["path"])]
+        job["state"] = "succeeded"
+        return job["state"]
+
+    def _run_line(self, line: Dict[str, Any]) -> Dict[str, Any]:
+        contents = []
+        for part in line["request"]["contents"][0]["parts"]:
+            if "text" in part:
+                contents.append(part["text"])
+            elif "inline_data" in part:
+                inline = part["inline_data"]
+                contents.append({"mime_type": inline["mime_type"], "data": base64.b64decode(inline["data"])})
+            else:
+                contents.append(part["file_data"])
+        model = self.model or gemini_vision.model
+        try:
+            response = model.generate_content(contents)
+        except Exception as e:
+            return {"key": line["key"], "error": {"code": getattr(e, "code", 500), "message": str(e)}}
+        text = gemini_vision._extract_response_text(response) or ""
+        return {"key": line["key"], "response": {"candidates": [{"content": {"parts": [{"text": text}], "role": "model"}}]}}
+
+    def download(self, job_id: str, output_path: str) -> None:
+        with open(output_path, "w", encoding="utf-8") as f:
+            for output in self._jobs[job_id]["output"]:
+                f.write(json.dumps(output) + "\n")
+
+    def cancel(self, job_id: str) -> None:
+        job = self._jobs[job_id]
+        if job["state"] not in FINISHED_STATES:
+            job["state"] = "cancelled"
+
+def wait_for_job(backend, job_id: str, poll_interval: float = POLL_INTERVAL_SECONDS, timeout: float = JOB_TIMEOUT_SECONDS) -> str:
+    """
+    Poll until the job finishes; raises BatchJobError unless it succeeded.
+    A job still running after `timeout` seconds is cancelled.
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        state = backend.poll(job_id)
+        if state == "succeeded":
+            return state
+        if state in FINISHED_STATES:
+            raise BatchJobError(f"Batch job {job_id} {state}")
+        if time.monotonic() + poll_interval > deadline:
+            message = f"Batch job {job_id} did not finish within {timeout:.0f} seconds"
+            try:
+                backend.cancel(job_id)
+            except Exception as e:
+                raise BatchJobError(f"{message} and could not be cancelled: {e}") from e
+            raise BatchJobError(f"{message}; cancelled")
+        time.sleep(poll_interval)
+
+def run_batch_job(requests: List[PendingRequest], backend, job_dir: str, poll_interval: float = POLL_INTERVAL_SECONDS, timeout: float = JOB_TIMEOUT_SECONDS) -> Dict[str, Any]:
+    """
+    Resolve queued requests with one batch job: write the job file under
+    `job_dir`, submit, poll, download and join the output back. Requests
+    without a usable output line get an error result. Returns job stats.
+    """
+    pending = [request for request in requests if not request.resolved]
+    stats = {"job_id": None, "requests": len(pending), "succeeded": 0, "failed": 0}
+    if not pending:
+        return stats
+
+    os.makedirs(job_dir, exist_ok=True)
+    stamp = time.strftime("%Y%m%d-%H%M%S") + "-" + uuid.uuid4().hex[:8]
+    job_path = os.path.join(job_dir, f"gemini_batch_{stamp}.jsonl")
+    by_key = write_job_file(pending, job_path)
+
+    try:
+        try:
+            job_id = backend.submit(job_path)
+        except Exception as e:
+            raise BatchJobError(f"Batch job could not be submitted: {e}") from e
+        stats["job_id"] = job_id
+        wait_for_job(backend, job_id, poll_interval, timeout)
+        output_path = os.path.join(job_dir, f"gemini_batch_{stamp}.output.jsonl")
+        backend.download(job_id, output_path)
+        outputs = iter_jsonl_file(output_path)
+    except BatchJobError as e:
+        outputs, failure = iter([]), str(e)
+    else:
+        failure = "No response for this request in the batch job output"
+
+    for output in outputs:
+        request = by_key.pop(output.get("key"), None)
+        if request is None:
+            continue
+        text = response_text_from_output(output)
+        if text is None:
+            error = output.get("error") or {}
+            request.resolve({"status": "error", "message": error.get("message") or "Batch job response is empty or not structured as expected."})
+            stats["failed"] += 1
+            continue
+        gemini_vision.record_response(request.image_path, request.prompt, text)
+        request.resolve({"status": "success", "prompt_id": request.result.get("prompt_id"), "response_text": text})
+        stats["succeeded"] += 1
+
+    for request in by_key.values():
+        request.resolve({"status": "error", "message": failure})
+        stats["failed"] += 1
+    return stats
@@ -0,0 +1,53 @@
+import threading
+from typing import Dict, List, Any
+
+from tools.prompt_registry import prompt_registry
+
+# Deferred Gemini requests for offline batches.
+#
+# While a RequestCollector is active (tools.gemini_vision.use_request_collector),
+# analyze_image_with_prompt queues each request and returns a placeholder
+# result with status "pending". The pipeline runs to completion on those
+# placeholders; a resolver then sends the queued requests in bulk (e.g.
+# several images per call, see tools/gemini_packing.py) and fills every
+# placeholder in place, so reports that hold them see the final results.
+
+PENDING_STATUS = "pending"
+
+class PendingRequest:
+    """One queued (image, prompt) request and the placeholder result handed to its caller."""
+
+    def __init__(self, image_path: str, prompt: str, agent: str | None, result: Dict[str, Any]):
+        self.image_path = image_path
+        self.prompt = prompt
+        self.agent = agent
+        self.result = result
+
+    @property
+    def resolved(self) -> bool:
+        return self.result.get("status") != PENDING_STATUS
+
+    def resolve(self, result: Dict[str, Any]) -> None:
+        """Replace the placeholder's contents, keeping fields callers added to it."""
+        self.result.update(result)
+
+class RequestCollector:
+    """Thread-safe queue of pending requests, in the order they were made."""
+
+    def __init__(self):
+        self.requests: List[PendingRequest] = []
+        self._lock = threading.Lock()
+
+    def add(self, image_path: str, prompt: str, agent: str | None = None) -> Dict[str, Any]:
+        result = {"status": PENDING_STATUS, "prompt_id": prompt_registry.id_for(prompt)}
+        with self._lock:
+            self.requests.append(PendingRequest(image_path, prompt, agent, result))
+        return result
+
+    def pending(self) -> List[PendingRequest]:
+        with self._lock:
+            return [request for request in self.requests if not request.resolved]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self.requests)
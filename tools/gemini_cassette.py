@@ -0,0 +1,98 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+# Record/replay store for Gemini calls.
+#
+# Each call is fingerprinted by (image bytes hash, prompt hash, model name)
+# and the response text is kept in a single SQLite file. Prompt text and
+# images are never stored, only their hashes.
+#
+# Modes:
+#   record  - always call Gemini and store/overwrite the response
+#   replay  - only serve stored responses; a miss is an error, Gemini is never called
+#   auto    - serve stored responses, call Gemini and record on a miss
+#
+# Enable with the GEMINI_CASSETTE / GEMINI_CASSETTE_MODE environment
+# variables, or programmatically via tools.gemini_vision.use_cassette().
+
+CASSETTE_MODES = ("record", "replay", "auto")
+
+def hash_file(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def hash_text(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+class GeminiCassette:
+    def __init__(self, path: str, mode: str = "replay"):
+        if mode not in CASSETTE_MODES:
+            raise ValueError(f"Unknown cassette mode: {mode} (expected one of {CASSETTE_MODES})")
+        self.path = path
+        self.mode = mode
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS responses (
+                fingerprint TEXT PRIMARY KEY,
+                image_hash TEXT NOT NULL,
+                prompt_hash TEXT NOT NULL,
+                model TEXT NOT NULL,
+                response_text TEXT NOT NULL,
+                recorded_at REAL NOT NULL
+            )"""
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def fingerprint(image_hash: str, prompt_hash: str, model: str) -> str:
+        return hashlib.sha256(f"{image_hash}:{prompt_hash}:{model}".encode("utf-8")).hexdigest()
+
+    def fingerprint_request(self, image_path: str, prompt: str, model: str) -> tuple:
+        """Returns (fingerprint, image_hash, prompt_hash) for a request."""
+        image_hash = hash_file(image_path)
+        prompt_hash = hash_text(prompt)
+        return self.fingerprint(image_hash, prompt_hash, model), image_hash, prompt_hash
+
+    def lookup(self, fingerprint: str) -> str | None:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response_text FROM responses WHERE fingerprint = ?", (fingerprint,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return row[0]
+
+    def store(self, fingerprint: str, image_hash: str, prompt_hash: str, model: str, response_text: str) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+                (fingerprint, image_hash, prompt_hash, model, response_text, time.time()),
+            )
+            self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+def cassette_from_env() -> GeminiCassette | None:
+    path = os.environ.get("GEMINI_CASSETTE")
+    if not path:
+        return None
+    return GeminiCassette(path, os.environ.get("GEMINI_CASSETTE_MODE", "replay"))
@@ -0,0 +1,235 @@
+import datetime
+import os
+import threading
+import time
+from typing import Dict, Any, List, Tuple
+
+import google.generativeai as genai
+from google.generativeai import caching
+
+from tools.adaptive_limiter import is_throttling_error
+from tools.prompt_registry import prompt_registry, CONTEXT_SUFFIX
+
+# Context caching for the static agent prompts.
+#
+# Each agent's instructions (configs/prompts/*.txt, the inline violence
+# prompt) are stored once as cached content; requests then send only the
+# image plus any per-image context such as OCR text. Entries are refreshed
+# before their TTL runs out. Prompts that cannot be cached (unknown prompts,
+# or ones the API rejects, e.g. below the minimum cacheable size) are sent
+# inline as before. A transient failure (429, 5xx, timeout) only sends the
+# prompt inline until CREATE_RETRY_SECONDS have passed, then creation is
+# tried again. Create/refresh calls run under a per-prompt guard, never the
+# shared lock, so one slow call does not hold up other agents' requests;
+# while an entry is being created, concurrent requests for it go inline.
+#
+# Enable with GEMINI_PROMPT_CACHE=on (or "local" for the in-process
+# stand-in), or programmatically via tools.gemini_vision.use_prompt_cache().
+
+PROMPT_CACHE_MODES = ("off", "on", "local")
+PROMPT_CACHE_TTL_SECONDS = int(os.environ.get("GEMINI_PROMPT_CACHE_TTL", "3600"))
+# Extend an entry's TTL once it is this close to expiring
+REFRESH_MARGIN_SECONDS = 300
+# After a transient create failure, send the prompt inline this long before trying again
+CREATE_RETRY_SECONDS = 60
+
+class GeminiContextCacheBackend:
+    """Cached content through the Gemini caching API."""
+
+    def __init__(self, model_name: str):
+        self.model_name = model_name
+
+    def create(self, name: str, text: str, ttl_seconds: float):
+        cache = caching.CachedContent.create(
+            model=self.model_name,
+            display_name=name,
+            system_instruction=text,
+            ttl=datetime.timedelta(seconds=ttl_seconds),
+        )
+        return cache, time.time() + ttl_seconds
+
+    def refresh(self, cache, ttl_seconds: float) -> float:
+        cache.update(ttl=datetime.timedelta(seconds=ttl_seconds))
+        return time.time() + ttl_seconds
+
+    def delete(self, cache) -> None:
+        cache.delete()
+
+    def model_for(self, cache, base_model):
+        return genai.GenerativeModel.from_cached_content(cached_content=cache)
+
+class LocalCachedContent:
+    def __init__(self, name: str, text: str):
+        self.name = name
+        self.text = text
+
+class LocalCachedModel:
+    """Sends requests to the base model with the cached prefix passed alongside, as the API would hold it."""
+
+    def __init__(self, base_model, cache: LocalCachedContent):
+        self.base_model = base_model
+        self.cache = cache
+
+    def generate_content(self, contents, **kwargs):
+        return self.base_model.generate_content(contents, cached_content=self.cache.text, **kwargs)
+
+class LocalContextCacheBackend:
+    """In-process stand-in for the caching API; works with FakeGeminiModel."""
+
+    def __init__(self):
+        self.created = 0
+        self.refreshed = 0
+        self.deleted = 0
+
+    def create(self, name: str, text: str, ttl_seconds: float):
+        self.created += 1
+        return LocalCachedContent(name, text), time.time() + ttl_seconds
+
+    def refresh(self, cache, ttl_seconds: float) -> float:
+        self.refreshed += 1
+        return time.time() + ttl_seconds
+
+    def delete(self, cache) -> None:
+        self.deleted += 1
+
+    def model_for(self, cache, base_model):
+        return LocalCachedModel(base_model, cache)
+
+class PromptCache:
+    """Cached-content entries per static prompt version, created lazily and refreshed before expiry."""
+
+    def __init__(
+        self,
+        backend,
+        ttl_seconds: float = PROMPT_CACHE_TTL_SECONDS,
+        refresh_margin: float = REFRESH_MARGIN_SECONDS,
+        retry_seconds: float = CREATE_RETRY_SECONDS,
+    ):
+        self.backend = backend
+        self.ttl_seconds = ttl_seconds
+        self.refresh_margin = refresh_margin
+        self.retry_seconds = retry_seconds
+        self.hits = 0
+        self.misses = 0
+        self._entries: Dict[str, list] = {}  # prompt_id -> [cache, expires_at], or None if uncacheable
+        self._retry_at: Dict[str, float] = {}  # prompt_id -> when to try creating again after a transient failure
+        self._busy: Dict[str, threading.Lock] = {}  # prompt_id -> held while creating or refreshing it
+        self._lock = threading.Lock()  # guards the dicts and counters; never held across a backend call
+
+    def _fresh_entry(self, prompt_id: str, now: float):
+        # Called with _lock held
+        entry = self._entries.get(prompt_id)
+        if entry is not None and entry[1] - self.refresh_margin > now:
+            self.hits += 1
+            return entry
+        return None
+
+    def _entry_for(self, prompt_id: str, text: str):
+        now = time.time()
+        with self._lock:
+            fresh = self._fresh_entry(prompt_id, now)
+            if fresh is not None:
+                return fresh
+            entry = self._entries.get(prompt_id)
+            if entry is None and (prompt_id in self._entries or self._retry_at.get(prompt_id, 0) > now):
+                return None
+            busy = self._busy.setdefault(prompt_id, threading.Lock())
+
+        if not busy.acquire(blocking=False):
+            # Another request is creating or refreshing this entry: use what is there rather than wait
+            with self._lock:
+                if entry is not None and entry[1] > now:
+                    self.hits += 1
+                    return entry
+            return None
+        try:
+            with self._lock:
+                # It may have been created or refreshed between the check above and taking busy
+                fresh = self._fresh_entry(prompt_id, time.time())
+                if fresh is not None:
+                    return fresh
+                entry = self._entries.get(prompt_id)
+            if entry is not None:
+                try:
+                    expires_at = self.backend.refresh(entry[0], self.ttl_seconds)
+                except Exception:
+                    pass  # Expired or deleted server-side: create a fresh entry below
+                else:
+                    with self._lock:
+                        entry[1] = expires_at
+                        self.hits += 1
+                    return entry
+            return self._create(prompt_id, text)
+        finally:
+            busy.release()
+
+    def _create(self, prompt_id: str, text: str):
+        # Called with the prompt's busy lock held, so each prompt is created once at a time
+        with self._lock:
+            self.misses += 1
+        try:
+            cache, expires_at = self.backend.create(prompt_id, text, self.ttl_seconds)
+        except Exception as e:
+            with self._lock:
+                if is_throttling_error(e) or isinstance(e, (TimeoutError, ConnectionError)):
+                    # Transient: send inline for now and try again later
+                    self._entries.pop(prompt_id, None)
+                    self._retry_at[prompt_id] = time.time() + self.retry_seconds
+                else:
+                    self._entries[prompt_id] = None
+            return None
+        entry = [cache, expires_at]
+        with self._lock:
+            self._entries[prompt_id] = entry
+            self._retry_at.pop(prompt_id, None)
+        return entry
+
+    def prepare(self, prompt: str, image_part, base_model) -> Tuple[Any, List[Any]]:
+        """
+        (model, contents) for a request: a cached-content model with only the
+        per-image remainder and the image, or the base model with the full prompt.
+        """
+        prompt_id = prompt_registry.id_for(prompt).removesuffix(CONTEXT_SUFFIX)
+        static_text = prompt_registry.text_for(prompt_id)
+        if prompt_id.startswith("adhoc@") or not static_text or not prompt.startswith(static_text):
+            return base_model, [prompt, image_part]
+
+        entry = self._entry_for(prompt_id, static_text)
+        if entry is None:
+            return base_model, [prompt, image_part]
+
+        remainder = prompt[len(static_text):].strip()
+        contents = [remainder, image_part] if remainder else [image_part]
+        return self.backend.model_for(entry[0], base_model), contents
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": sum(1 for entry in self._entries.values() if entry is not None),
+                "uncacheable": sum(1 for entry in self._entries.values() if entry is None),
+                "retrying": sum(1 for retry_at in self._retry_at.values() if retry_at > time.time()),
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+    def close(self) -> None:
+        """Delete every cached-content entry."""
+        with self._lock:
+            entries = [entry for entry in self._entries.values() if entry is not None]
+            self._entries.clear()
+            self._retry_at.clear()
+        for cache, _ in entries:
+            try:
+                self.backend.delete(cache)
+            except Exception:
+                pass
+
+def prompt_cache_from_env(model_name: str) -> PromptCache | None:
+    mode = os.environ.get("GEMINI_PROMPT_CACHE", "off")
+    if mode not in PROMPT_CACHE_MODES:
+        raise ValueError(f"Invalid GEMINI_PROMPT_CACHE: {mode} (expected one of {PROMPT_CACHE_MODES})")
+    if mode == "on":
+        return PromptCache(GeminiContextCacheBackend(model_name))
+    if mode == "local":
+        return PromptCache(LocalContextCacheBackend())
+    return None
@@ -0,0 +1,170 @@
+import hashlib
+import io
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any
+
+import google.generativeai as genai
+
+from tools.upload_encoding import UploadProfile, encode_for_upload
+
+# Upload-once image handles for Gemini.
+#
+# Instead of sending the encoded image inline with every agent's request,
+# the image is uploaded once per (content, upload profile) through the
+# Gemini Files API and every agent references the returned handle. Live
+# handles are kept in an LRU; evicted or nearly expired files are deleted.
+#
+# Enable with GEMINI_UPLOAD_MODE=files (or "local" for the in-process
+# stand-in), or programmatically via tools.gemini_vision.use_file_store().
+
+UPLOAD_MODES = ("inline", "files", "local")
+FILE_STORE_SIZE = int(os.environ.get("GEMINI_FILE_STORE_SIZE", "256"))
+# Files API uploads are kept for 48 hours
+FILE_TTL_SECONDS = 48 * 3600
+# Re-upload a file this long before it expires rather than risk a dangling reference
+REFRESH_MARGIN_SECONDS = 600
+
+class GeminiFilesBackend:
+    """Uploads through the Gemini Files API."""
+
+    def upload(self, data: bytes, mime_type: str, display_name: str):
+        uploaded = genai.upload_file(io.BytesIO(data), mime_type=mime_type, display_name=display_name)
+        expiration = getattr(uploaded, "expiration_time", None)
+        expires_at = expiration.timestamp() if expiration is not None else time.time() + FILE_TTL_SECONDS
+        return uploaded, expires_at
+
+    def delete(self, handle) -> None:
+        genai.delete_file(handle.name)
+
+class LocalFileHandle:
+    """What the local stand-in returns; FakeGeminiModel resolves it like an uploaded file."""
+
+    def __init__(self, name: str, mime_type: str, data: bytes):
+        self.name = name
+        self.uri = f"local://{name}"
+        self.mime_type = mime_type
+        self.data = data
+
+    def __repr__(self) -> str:
+        return f"LocalFileHandle(name={self.name!r}, mime_type={self.mime_type!r}, bytes={len(self.data)})"
+
+class LocalFilesBackend:
+    """In-process stand-in for the Files API, for tests and offline benchmarks."""
+
+    def __init__(self, ttl_seconds: float = FILE_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self.files: Dict[str, LocalFileHandle] = {}
+        self.deleted = 0
+        self._counter = 0
+        self._lock = threading.Lock()
+
+    def upload(self, data: bytes, mime_type: str, display_name: str):
+        with self._lock:
+            self._counter += 1
+            handle = LocalFileHandle(f"files/local-{self._counter}", mime_type, data)
+            self.files[handle.name] = handle
+        return handle, time.time() + self.ttl_seconds
+
+    def delete(self, handle) -> None:
+        with self._lock:
+            if self.files.pop(handle.name, None) is not None:
+                self.deleted += 1
+
+class UploadedFileStore:
+    """
+    LRU of live uploaded-file handles keyed by encoded content hash.
+    Concurrent agents asking for the same image wait for a single upload.
+    """
+
+    def __init__(self, backend, max_entries: int = FILE_STORE_SIZE, refresh_margin: float = REFRESH_MARGIN_SECONDS):
+        self.backend = backend
+        self.max_entries = max_entries
+        self.refresh_margin = refresh_margin
+        self.uploads = 0
+        self.hits = 0
+        self.bytes_uploaded = 0
+        self._entries: OrderedDict = OrderedDict()  # key -> (handle, expires_at)
+        self._key_locks: Dict[tuple, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def _live_entry(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[1] - self.refresh_margin <= time.time():
+            del self._entries[key]
+            self._delete(entry[0])
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def _delete(self, handle) -> None:
+        try:
+            self.backend.delete(handle)
+        except Exception:
+            # The file expires server-side anyway
+            pass
+
+    def handle_for(self, image_path: str, profile: UploadProfile):
+        """Uploaded handle for an image encoded with `profile`, uploading it if needed."""
+        part = encode_for_upload(image_path, profile)
+        key = (hashlib.blake2b(part["data"], digest_size=16).hexdigest(), part["mime_type"])
+
+        with self._lock:
+            entry = self._live_entry(key)
+            if entry is not None:
+                self.hits += 1
+                return entry[0]
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        with key_lock:
+            # Another thread may have uploaded it while we waited
+            with self._lock:
+                entry = self._live_entry(key)
+                if entry is not None:
+                    self.hits += 1
+                    return entry[0]
+
+            handle, expires_at = self.backend.upload(part["data"], part["mime_type"], os.path.basename(image_path))
+
+            evicted = []
+            with self._lock:
+                self.uploads += 1
+                self.bytes_uploaded += len(part["data"])
+                self._entries[key] = (handle, expires_at)
+                while len(self._entries) > self.max_entries:
+                    evicted.append(self._entries.popitem(last=False)[1][0])
+                self._key_locks.pop(key, None)
+            for old in evicted:
+                self._delete(old)
+            return handle
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "live_files": len(self._entries),
+                "uploads": self.uploads,
+                "hits": self.hits,
+                "bytes_uploaded": self.bytes_uploaded,
+            }
+
+    def close(self) -> None:
+        """Delete every live uploaded file."""
+        with self._lock:
+            handles = [handle for handle, _ in self._entries.values()]
+            self._entries.clear()
+        for handle in handles:
+            self._delete(handle)
+
+def file_store_from_env() -> UploadedFileStore | None:
+    mode = os.environ.get("GEMINI_UPLOAD_MODE", "inline")
+    if mode not in UPLOAD_MODES:
+        raise ValueError(f"Invalid GEMINI_UPLOAD_MODE: {mode} (expected one of {UPLOAD_MODES})")
+    if mode == "files":
+        return UploadedFileStore(GeminiFilesBackend())
+    if mode == "local":
+        return UploadedFileStore(LocalFilesBackend())
+    return None
@@ -0,0 +1,157 @@
+import json
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Any
+
+from tools import gemini_vision
+from tools.gemini_batching import PendingRequest
+from tools.priority_scheduler import current_lane, lane_scope
+from tools.prompt_registry import prompt_registry
+
+# Multi-image packing for offline batches.
+#
+# Several images that share a prompt are sent in one generate_content call,
+# each preceded by an indexed label. Gemini is asked for a JSON array with
+# one answer per image, which is split back into ordinary per-image results
+# (same shape as analyze_image_with_prompt). If the reply cannot be parsed,
+# the images of that pack are retried with single-image calls.
+#
+# Packed calls send the full prompt inline (context caches hold one prompt
+# per single-image request) and are not replayed from a cassette; their
+# per-image answers are recorded to it, though.
+
+PACK_SIZE = int(os.environ.get("GEMINI_PACK_SIZE", "4"))
+IMAGE_LABEL = "IMAGE {index}:"
+
+PACK_INSTRUCTIONS = """
+
+You will receive {count} images, each preceded by its label ("IMAGE 1:" to "IMAGE {count}:").
+Apply the instructions above to each image independently, as if it were the only image.
+Respond with only a JSON array of {count} objects in label order, with no other text:
+[{{"image": 1, "answer": "<your complete answer for IMAGE 1>"}}, ...]"""
+
+_JSON_ARRAY_RE = re.compile(r"\[.*\]", re.DOTALL)
+
+def packed_prompt(prompt: str, count: int) -> str:
+    return prompt + PACK_INSTRUCTIONS.format(count=count)
+
+def parse_packed_response(text: str, count: int) -> List[str] | None:
+    """Per-image answers in label order, or None unless there is exactly one answer per image."""
+    match = _JSON_ARRAY_RE.search(text or "")
+    if match is None:
+        return None
+    try:
+        items = json.loads(match.group())
+    except ValueError:
+        return None
+    if not isinstance(items, list):
+        return None
+
+    answers: Dict[int, str] = {}
+    for item in items:
+        if not isinstance(item, dict):
+            return None
+        index, answer = item.get("image"), item.get("answer")
+        if not isinstance(index, int) or not isinstance(answer, str) or index in answers:
+            return None
+        answers[index] = answer.strip()
+    if sorted(answers) != list(range(1, count + 1)):
+        return None
+    return [answers[i] for i in range(1, count + 1)]
+
+class PackStats:
+    def __init__(self):
+        self.packed_calls = 0
+        self.packed_images = 0
+        self.fallbacks = 0
+        self.single_calls = 0
+        self._lock = threading.Lock()
+
+    def add(self, **counts) -> None:
+        with self._lock:
+            for name, value in counts.items():
+                setattr(self, name, getattr(self, name) + value)
+
+    def as_dict(self) -> Dict[str, int]:
+        return {
+            "packed_calls": self.packed_calls,
+            "packed_images": self.packed_images,
+            "fallbacks": self.fallbacks,
+            "single_calls": self.single_calls,
+        }
+
+def _single(image_path: str, prompt: str, agent: str | None, stats: PackStats) -> Dict[str, Any]:
+    stats.add(single_calls=1)
+    return gemini_vision.analyze_image_with_prompt(image_path, prompt, agent=agent)
+
+def analyze_images_with_prompt(image_paths: List[str], prompt: str, agent: str | None = None, stats: PackStats | None = None) -> List[Dict[str, Any]]:
+    """
+    Ask Gemini the same question about several images in one call.
+    Returns one result per image, in order, shaped like analyze_image_with_prompt's.
+    """
+    stats = stats or PackStats()
+    if len(image_paths) == 1:
+        return [_single(image_paths[0], prompt, agent, stats)]
+
+    prompt_id = prompt_registry.id_for(prompt)
+    try:
+        contents: List[Any] = [packed_prompt(prompt, len(image_paths))]
+        for index, image_path in enumerate(image_paths, 1):
+            if not os.path.exists(image_path):
+                raise FileNotFoundError(f"Image not found at {image_path}")
+            contents += [IMAGE_LABEL.format(index=index), gemini_vision.image_part_for(image_path, agent)]
+        response = gemini_vision.generate(gemini_vision.model, contents, f"{agent}:packed")
+    except Exception as e:
+        # A missing image only fails its own result; anything else failed the whole call
+        if isinstance(e, FileNotFoundError):
+            stats.add(fallbacks=1)
+            return [_single(image_path, prompt, agent, stats) for image_path in image_paths]
+        return [{"status": "error", "message": str(e)} for _ in image_paths]
+    stats.add(packed_calls=1, packed_images=len(image_paths))
+
+    answers = parse_packed_response(gemini_vision._extract_response_text(response), len(image_paths))
+    if answers is None:
+        stats.add(fallbacks=1)
+        return [_single(image_path, prompt, agent, stats) for image_path in image_paths]
+
+    results = []
+    for image_path, answer in zip(image_paths, answers):
+        gemini_vision.record_response(image_path, prompt, answer)
+        results.append({"status": "success", "prompt_id": prompt_id, "response_text": answer})
+    return results
+
+def resolve_packed(requests: List[PendingRequest], pack_size: int = PACK_SIZE, max_workers: int = 4) -> Dict[str, int]:
+    """
+    Resolve queued requests, packing up to `pack_size` images with the same
+    prompt into each call. Returns packing stats.
+    """
+    if pack_size < 1:
+        raise ValueError(f"Invalid pack size: {pack_size}")
+    if gemini_vision.request_collector is not None:
+        # Fallback single-image calls would be queued again instead of sent
+        raise RuntimeError("Deactivate the request collector before resolving its requests")
+
+    groups: Dict[tuple, List[PendingRequest]] = {}
+    for request in requests:
+        if not request.resolved:
+            groups.setdefault((request.prompt, request.agent), []).append(request)
+
+    packs = []
+    for group in groups.values():
+        for i in range(0, len(group), pack_size):
+            packs.append(group[i:i + pack_size])
+
+    stats = PackStats()
+    lane = current_lane()
+
+    def run(pack: List[PendingRequest]) -> None:
+        with lane_scope(lane):
+            results = analyze_images_with_prompt([r.image_path for r in pack], pack[0].prompt, pack[0].agent, stats)
+        for request, result in zip(pack, results):
+            request.resolve(result)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        list(executor.map(run, packs))
+    return stats.as_dict()
@@ -1,7 +1,18 @@
+import contextlib
 import os
-from PIL import Image
+import time
 import google.generativeai as genai
 from google.generativeai import GenerativeModel, configure
+from tools.gemini_cassette import GeminiCassette, cassette_from_env
+from tools.gemini_files import UploadedFileStore, file_store_from_env
+from tools.gemini_context_cache import PromptCache, prompt_cache_from_env
+from tools.gemini_batching import RequestCollector
+from tools.adaptive_limiter import AdaptiveLimiter, limiter_from_env
+from tools.request_hedging import Hedger, hedger_from_env
+from tools.priority_scheduler import PriorityScheduler, current_lane, scheduler_from_env
+from tools.deadlines import DeadlineExceeded, current_deadline, remaining_seconds
+from tools.prompt_registry import prompt_registry
+from tools.upload_encoding import encode_for_upload, profile_for
 
 # Load API Key
 # GEMINI_API_KEY = os.environ.get("GEMINI_API_KEY", "your-api-key-here")
@@ -9,48 +20,239 @@ GEMINI_API_KEY = os.environ.get("GEMINI_API_KEY", "AIzaSyAmVJIpM-eQbVjyx3W0MNhzC
 configure(api_key=GEMINI_API_KEY)
 
 # Load Gemini Vision model
-model = GenerativeModel("gemini-2.5-pro")
+MODEL_NAME = "gemini-2.5-pro"
+model = GenerativeModel(MODEL_NAME)
 
-def analyze_image_with_prompt(image_path: str, prompt: str) -> dict:
+# Optional record/replay store (see tools/gemini_cassette.py)
+cassette = cassette_from_env()
+
+# Optional upload-once file handles instead of inline images (see tools/gemini_files.py)
+file_store = file_store_from_env()
+
+# Optional cached-content entries for the static agent prompts (see tools/gemini_context_cache.py)
+prompt_cache = prompt_cache_from_env(MODEL_NAME)
+
+# Optional adaptive limit on in-flight Gemini calls (see tools/adaptive_limiter.py)
+limiter = limiter_from_env()
+
+# Optional priority lanes in front of the limiter (see tools/priority_scheduler.py)
+scheduler = scheduler_from_env(limiter)
+
+# Optional hedging of slow calls with a duplicate request (see tools/request_hedging.py)
+hedger = hedger_from_env()
+
+# When set, requests are queued instead of sent and resolved later in bulk (see tools/gemini_batching.py)
+request_collector = None
+
+def set_model(new_model):
+    """
+    Swap the model used by analyze_image_with_prompt.
+    Any object with a generate_content(contents) method works, e.g. the
+    offline stand-in in tools/fake_gemini.py. Returns the previous model.
+    """
+    global model
+    previous = model
+    model = new_model
+    return previous
+
+def use_cassette(new_cassette: GeminiCassette | None):
+    """Enable (or disable with None) call recording/replay. Returns the previous cassette."""
+    global cassette
+    previous = cassette
+    cassette = new_cassette
+    return previous
+
+def use_file_store(new_store: UploadedFileStore | None):
+    """Reference uploaded files instead of sending images inline (None disables). Returns the previous store."""
+    global file_store
+    previous = file_store
+    file_store = new_store
+    return previous
+
+def use_prompt_cache(new_cache: PromptCache | None):
+    """Serve static prompt prefixes from context caches (None disables). Returns the previous cache."""
+    global prompt_cache
+    previous = prompt_cache
+    prompt_cache = new_cache
+    return previous
+
+def use_request_collector(new_collector: RequestCollector | None):
+    """Queue requests instead of sending them (None sends them again). Returns the previous collector."""
+    global request_collector
+    previous = request_collector
+    request_collector = new_collector
+    return previous
+
+def use_limiter(new_limiter: AdaptiveLimiter | None):
+    """Govern Gemini calls with an adaptive concurrency limit (None removes it). Returns the previous limiter."""
+    global limiter
+    previous = limiter
+    limiter = new_limiter
+    return previous
+
+def use_scheduler(new_scheduler: PriorityScheduler | None):
+    """
+    Queue Gemini calls in priority lanes (None removes them). The scheduler
+    governs its own limiter in place of the module-level one. Returns the
+    previous scheduler.
+    """
+    global scheduler
+    previous = scheduler
+    scheduler = new_scheduler
+    return previous
+
+def use_hedger(new_hedger: Hedger | None):
+    """Hedge slow Gemini calls with a duplicate request (None disables). Returns the previous hedger."""
+    global hedger
+    previous = hedger
+    hedger = new_hedger
+    return previous
+
+def generate(target_model, contents, key: str | None = None):
+    """
+    target_model.generate_content(contents), within a limiter slot when one
+    is active (a slot in the thread's priority lane with a scheduler), and
+    hedged when a hedger is (each attempt takes its own slot).
+    `key` groups calls with similar latency for hedging, normally the agent.
+    Inside a deadline scope (tools/deadlines.py) the deadline bounds the wait
+    for a slot, and the request times out at it.
+    """
+    # Read here: hedged attempts run on other threads
+    deadline = current_deadline()
+    lane = current_lane()
+    if deadline is not None and deadline <= time.monotonic():
+        raise DeadlineExceeded("Image deadline passed before the Gemini call")
+    active_limiter = limiter
+    active_scheduler = scheduler
+
+    def remaining():
+        return None if deadline is None else deadline - time.monotonic()
+
+    def slot():
+        if active_scheduler is not None:
+            return active_scheduler.slot(lane, remaining())
+        if active_limiter is not None:
+            return active_limiter.slot(remaining())
+        return contextlib.nullcontext()
+
+    def send():
+        # Measured once the slot is held, so queueing time comes out of the request's budget
+        left = remaining()
+        if left is None:
+            return target_model.generate_content(contents)
+        if left <= 0:
+            raise DeadlineExceeded("Image deadline passed while waiting for a Gemini slot")
+        return target_model.generate_content(contents, request_options={"timeout": left})
+
+    active_hedger = hedger
+    if active_hedger is None:
+        with slot():
+            return send()
+    # The hedger takes the slots, so only time spent holding one counts towards hedging
+    return active_hedger.call(send, key or "default", slot)
+
+def image_part_for(image_path: str, agent: str | None = None):
+    """The image as sent to Gemini: an uploaded-file handle with a file store, else inline encoded bytes."""
+    active_file_store = file_store
+    if active_file_store is not None:
+        return active_file_store.handle_for(image_path, profile_for(agent))
+    return encode_for_upload(image_path, profile_for(agent))
+
+def record_response(image_path: str, prompt: str, response_text: str) -> None:
+    """Store a response obtained outside analyze_image_with_prompt in the active cassette, if any."""
+    active_cassette = cassette
+    if active_cassette is not None and active_cassette.mode != "replay":
+        fingerprint, image_hash, prompt_hash = active_cassette.fingerprint_request(image_path, prompt, MODEL_NAME)
+        active_cassette.store(fingerprint, image_hash, prompt_hash, MODEL_NAME, response_text)
+
+def _extract_response_text(response) -> str | None:
+    """Text of a generate_content response, or None if it is not structured as expected."""
+    if hasattr(response, 'text') and response.text:
+        return response.text.strip()
+
+    # If response.text not available, extract from content.parts
+    if hasattr(response, 'candidates'):
+        content = response.candidates[0].content
+        parts = content.parts if hasattr(content, 'parts') else []
+        text_parts = [p.text for p in parts if hasattr(p, 'text')]
+        joined_text = "\n".join(text_parts).strip()
+        return joined_text or "No clear response from Gemini."
+
+    return None
+
+def analyze_image_with_prompt(image_path: str, prompt: str, agent: str | None = None) -> dict:
+    """
+    Ask Gemini about an image. `agent` selects the upload encoding profile
+    (configs/upload_profiles.yaml); unlisted or missing agents use the default.
+    Results carry the prompt's version ID (tools/prompt_registry.py), not its text.
+    With a request collector active, cassette misses return a "pending" result
+    that is filled in when the collector's requests are resolved. Inside a
+    deadline scope, calls that run out of time return status "timeout".
+    """
     try:
         # Validate image
         if not os.path.exists(image_path):
             return {"status": "error", "message": f"Image not found at {image_path}"}
 
-        # Open image
-        img = Image.open(image_path).convert("RGB")
-
-        # Call Gemini Vision
-        response = model.generate_content([prompt, img])
-
-        # Extract result safely
-        if hasattr(response, 'text') and response.text:
-            return {
-                "status": "success",
-                "prompt": prompt,
-                "response_text": response.text.strip()
-            }
+        active_cassette = cassette
+        if active_cassette is not None:
+            fingerprint, image_hash, prompt_hash = active_cassette.fingerprint_request(image_path, prompt, MODEL_NAME)
+            if active_cassette.mode != "record":
+                recorded_text = active_cassette.lookup(fingerprint)
+                if recorded_text is not None:
+                    return {
+                        "status": "success",
+                        "prompt_id": prompt_registry.id_for(prompt),
+                        "response_text": recorded_text
+                    }
+                if active_cassette.mode == "replay":
+                    return {
+                        "status": "error",
+                        "message": f"No recorded Gemini response for {image_path} (cassette replay mode)"
+                    }
 
-        # If response.text not available, extract from content.parts
-        elif hasattr(response, 'candidates'):
-            content = response.candidates[0].content
-            parts = content.parts if hasattr(content, 'parts') else []
-            text_parts = [p.text for p in parts if hasattr(p, 'text')]
-            joined_text = "\n".join(text_parts).strip()
+        active_collector = request_collector
+        if active_collector is not None:
+            return active_collector.add(image_path, prompt, agent)
 
-            return {
-                "status": "success",
-                "prompt": prompt,
-                "response_text": joined_text or "No clear response from Gemini."
-            }
+        # Encode image once per upload profile (cached across agents); with a
+        # file store, upload it once and send only the file reference
+        image_part = image_part_for(image_path, agent)
 
+        # Call Gemini Vision; with a prompt cache only the image (and any
+        # per-image context) is sent alongside the cached instructions
+        active_prompt_cache = prompt_cache
+        if active_prompt_cache is not None:
+            target_model, contents = active_prompt_cache.prepare(prompt, image_part, model)
         else:
+            target_model, contents = model, [prompt, image_part]
+        response = generate(target_model, contents, agent)
+
+        # Extract result safely
+        response_text = _extract_response_text(response)
+        if response_text is None:
             return {
                 "status": "error",
                 "message": "Gemini response is empty or not structured as expected."
             }
 
+        if active_cassette is not None:
+            active_cassette.store(fingerprint, image_hash, prompt_hash, MODEL_NAME, response_text)
+
+        return {
+            "status": "success",
+            "prompt_id": prompt_registry.id_for(prompt),
+            "response_text": response_text
+        }
+
     except Exception as e:
+        # Failures at or past the image deadline are timeouts, whatever the client raised
+        remaining = remaining_seconds()
+        if isinstance(e, DeadlineExceeded) or (remaining is not None and remaining <= 0):
+            return {
+                "status": "timeout",
+                "message": str(e)
+            }
         return {
             "status": "error",
             "message": str(e)
@@ -0,0 +1,329 @@
+import glob
+import hashlib
+import itertools
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from urllib.parse import parse_qsl, quote, urlencode, urlsplit, urlunsplit
+
+import requests
+
+from tools.image_preprocessor import FORMAT_EXTENSIONS, MAX_INPUT_BYTES, SNIFF_BYTES, sniff_format
+
+# Turn an image_url cell (http(s) URL or local path) into a local file path.
+#
+# URLs are normalized (normalize_url) into the cache key, so spelling
+# variants of one URL share a cache entry and callers can dedupe rows by it.
+# The request itself goes to the URL as written: signed or tokenized CDN
+# URLs break if their query is reordered or re-encoded.
+#
+# With a fetch cache (FETCH_CACHE=path/to/fetch_cache.sqlite, or
+# use_fetcher(ImageFetcher(path))), the cache is persistent:
+#   - responses carrying an ETag or Last-Modified header are kept next to
+#     the database and revalidated with If-None-Match/If-Modified-Since; a
+#     304 reuses the stored file instead of downloading it again
+#   - failed URLs are remembered: 404s and other client errors for
+#     NEGATIVE_TTL_SECONDS, timeouts, 429s and 5xx for TRANSIENT_TTL_SECONDS,
+#     and are not requested again until then
+# Cached files are evicted least recently used beyond CACHE_MAX_BYTES.
+#
+# Other downloads land in the temp directory; callers delete them when done
+# with remove_download, which leaves local inputs and cached files alone.
+
+DOWNLOAD_PREFIX = "moderation_download_"
+FETCH_TIMEOUT_SECONDS = float(os.environ.get("FETCH_TIMEOUT_SECONDS", "30"))
+NEGATIVE_TTL_SECONDS = float(os.environ.get("FETCH_NEGATIVE_TTL", "86400"))
+TRANSIENT_TTL_SECONDS = float(os.environ.get("FETCH_TRANSIENT_TTL", "900"))
+CACHE_MAX_BYTES = int(os.environ.get("FETCH_CACHE_MAX_BYTES", str(1024 ** 3)))
+# Default database for callers that turn the cache on (demo_xlsx_batch_pipeline.py --fetch-cache)
+DEFAULT_CACHE_PATH = "data/fetch_cache/fetch_cache.sqlite"
+
+DEFAULT_PORTS = {"http": 80, "https": 443}
+# Query parameters that never change the image
+TRACKING_PARAMS = ("utm_source", "utm_medium", "utm_campaign", "utm_term", "utm_content", "fbclid", "gclid")
+
+def is_url(image_url: str) -> bool:
+    return image_url.startswith("http://") or image_url.startswith("https://")
+
+def normalize_url(image_url) -> str:
+    """
+    Canonical form of an image_url cell: surrounding whitespace, the
+    fragment, default ports and tracking parameters are dropped, the scheme
+    and host are lowercased and the query parameters sorted. Local paths
+    are normalized with os.path.normpath.
+    """
+    image_url = str(image_url or "").strip()
+    parts = urlsplit(image_url)
+    scheme = parts.scheme.lower()
+    if scheme not in DEFAULT_PORTS:
+        return os.path.normpath(image_url) if image_url else image_url
+
+    host = (parts.hostname or "").lower()
+    if ":" in host:
+        host = f"[{host}]"
+    if parts.port is not None and parts.port != DEFAULT_PORTS[scheme]:
+        host = f"{host}:{parts.port}"
+    if parts.username is not None:
+        credentials = parts.username if parts.password is None else f"{parts.username}:{parts.password}"
+        host = f"{credentials}@{host}"
+    params = sorted((name, value) for name, value in parse_qsl(parts.query, keep_blank_values=True)
+                    if name.lower() not in TRACKING_PARAMS)
+    return urlunsplit((scheme, host, parts.path or "/", urlencode(params, quote_via=quote), ""))
+
+class FetchResult:
+    """
+    Outcome of fetching one image_url. `path` is the local file (None on
+    failure); `status` is one of:
+        local          - a local path that exists
+        downloaded     - fetched into the temp directory (the caller deletes it)
+        cached         - fetched into the fetch cache
+        not_modified   - the cached copy was still current (HTTP 304)
+        missing        - a local path that does not exist
+        failed         - the request failed now (`error` says how)
+        known_failure  - the URL failed recently and was not requested again
+    """
+
+    def __init__(self, url: str, path: str | None, status: str, error: str | None = None):
+        self.url = url
+        self.path = path
+        self.status = status
+        self.error = error
+
+    @property
+    def ok(self) -> bool:
+        return self.path is not None
+
+    def __repr__(self) -> str:
+        return f"FetchResult({self.url}, {self.status}, path={self.path}, error={self.error})"
+
+def _is_transient(status_code: int | None) -> bool:
+    """Whether a failure with status_code (None: no response) may go away by itself."""
+    return status_code is None or status_code in (408, 429) or status_code >= 500
+
+def _write_body(response, make_file) -> tuple:
+    """Stream a response into make_file(suffix); returns (path, size). The suffix comes from the sniffed content."""
+    chunks = response.iter_content(64 * 1024)
+    first = next(chunks, b"")
+    # Name the file after its content: CDN URLs often have no (or a wrong) extension
+    f = make_file(FORMAT_EXTENSIONS.get(sniff_format(first[:SNIFF_BYTES]), ""))
+    size = 0
+    try:
+        for chunk in itertools.chain([first], chunks):
+            f.write(chunk)
+            size += len(chunk)
+    except BaseException:
+        f.close()
+        os.remove(f.name)
+        raise
+    f.close()
+    return f.name, size
+
+class ImageFetcher:
+    def __init__(self, cache_path: str | None = None, timeout: float = FETCH_TIMEOUT_SECONDS,
+                 negative_ttl: float = NEGATIVE_TTL_SECONDS, transient_ttl: float = TRANSIENT_TTL_SECONDS,
+                 max_bytes: int = CACHE_MAX_BYTES):
+        self.cache_path = cache_path
+        self.timeout = timeout
+        self.negative_ttl = negative_ttl
+        self.transient_ttl = transient_ttl
+        self.max_bytes = max_bytes
+        self.counts = {"downloaded": 0, "cached": 0, "not_modified": 0, "failed": 0, "known_failure": 0}
+        self._session = requests.Session()
+        self._lock = threading.Lock()
+        self._conn = None
+        if cache_path:
+            self.body_dir = os.path.join(os.path.dirname(cache_path) or ".", "bodies")
+            os.makedirs(self.body_dir, exist_ok=True)
+            self._conn = sqlite3.connect(cache_path, check_same_thread=False)
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS urls (
+                    url TEXT PRIMARY KEY,
+                    body_path TEXT,
+                    etag TEXT,
+                    last_modified TEXT,
+                    size INTEGER NOT NULL DEFAULT 0,
+                    error TEXT,
+                    retry_after REAL,
+                    used_at REAL NOT NULL
+                )"""
+            )
+            self._conn.commit()
+
+    def fetch(self, image_url: str) -> FetchResult:
+        """Fetch image_url as written; the result's `url` is its normalized form, the cache key."""
+        image_url = str(image_url or "").strip()
+        url = normalize_url(image_url)
+        if not is_url(url):
+            if url and os.path.exists(url):
+                return FetchResult(url, url, "local")
+            return FetchResult(url, None, "missing", f"File not found: {url}")
+
+        entry = self._lookup(url)
+        if entry is not None and entry["retry_after"] is not None and entry["retry_after"] > time.time():
+            return self._count(FetchResult(url, None, "known_failure", entry["error"]))
+
+        headers = {}
+        if entry is not None and entry["body_path"] and os.path.exists(entry["body_path"]):
+            if entry["etag"]:
+                headers["If-None-Match"] = entry["etag"]
+            if entry["last_modified"]:
+                headers["If-Modified-Since"] = entry["last_modified"]
+
+        try:
+            with self._session.get(image_url, headers=headers, stream=True, timeout=self.timeout) as response:
+                if response.status_code == 304 and headers:
+                    self._touch(url)
+                    return self._count(FetchResult(url, entry["body_path"], "not_modified"))
+                if response.status_code != 200:
+                    return self._fail(url, f"HTTP {response.status_code}", _is_transient(response.status_code))
+                if int(response.headers.get("Content-Length") or 0) > MAX_INPUT_BYTES:
+                    # Ingestion would reject it anyway
+                    return self._fail(url, f"Image too large: {response.headers['Content-Length']} bytes", False)
+                etag = response.headers.get("ETag")
+                last_modified = response.headers.get("Last-Modified")
+                if self._conn is None or not (etag or last_modified):
+                    path, _ = _write_body(response, lambda suffix: tempfile.NamedTemporaryFile(
+                        delete=False, prefix=DOWNLOAD_PREFIX, suffix=suffix))
+                    self._forget_failure(url)
+                    return self._count(FetchResult(url, path, "downloaded"))
+                return self._count(FetchResult(url, self._store(url, response, etag, last_modified), "cached"))
+        except requests.Timeout:
+            return self._fail(url, f"Timed out after {self.timeout:g} seconds", True)
+        except requests.RequestException as e:
+            return self._fail(url, f"{type(e).__name__}: {e}", True)
+
+    def _count(self, result: FetchResult) -> FetchResult:
+        with self._lock:
+            self.counts[result.status] += 1
+        return result
+
+    def _lookup(self, url: str) -> dict | None:
+        if self._conn is None:
+            return None
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT body_path, etag, last_modified, error, retry_after FROM urls WHERE url = ?", (url,)
+            ).fetchone()
+        if row is None:
+            return None
+        return dict(zip(("body_path", "etag", "last_modified", "error", "retry_after"), row))
+
+    def _touch(self, url: str) -> None:
+        with self._lock:
+            self._conn.execute("UPDATE urls SET used_at = ? WHERE url = ?", (time.time(), url))
+            self._conn.commit()
+
+    def _fail(self, url: str, error: str, transient: bool) -> FetchResult:
+        if self._conn is not None:
+            retry_after = time.time() + (self.transient_ttl if transient else self.negative_ttl)
+            with self._lock:
+                row = self._conn.execute("SELECT body_path FROM urls WHERE url = ?", (url,)).fetchone()
+                if not transient and row and row[0]:
+                    # The image is gone for good: so is our copy
+                    self._remove_body(row[0])
+                    self._conn.execute("DELETE FROM urls WHERE url = ?", (url,))
+                self._conn.execute(
+                    """INSERT INTO urls (url, error, retry_after, used_at) VALUES (?, ?, ?, ?)
+                       ON CONFLICT(url) DO UPDATE SET error = excluded.error, retry_after = excluded.retry_after""",
+                    (url, error, retry_after, time.time()),
+                )
+                self._conn.commit()
+        return self._count(FetchResult(url, None, "failed", error))
+
+    def _forget_failure(self, url: str) -> None:
+        if self._conn is not None:
+            with self._lock:
+                self._conn.execute("DELETE FROM urls WHERE url = ? AND body_path IS NULL", (url,))
+                self._conn.commit()
+
+    def _store(self, url: str, response, etag: str | None, last_modified: str | None) -> str:
+        name = hashlib.sha256(url.encode("utf-8")).hexdigest()[:32]
+        # Written under a temporary name and renamed, so readers never see a partial file
+        tmp_path, size = _write_body(response, lambda suffix: tempfile.NamedTemporaryFile(
+            delete=False, dir=self.body_dir, prefix=f".{name}", suffix=suffix))
+        body_path = os.path.join(self.body_dir, name + os.path.splitext(tmp_path)[1])
+        os.replace(tmp_path, body_path)
+        with self._lock:
+            row = self._conn.execute("SELECT body_path FROM urls WHERE url = ?", (url,)).fetchone()
+            if row and row[0] and row[0] != body_path:
+                self._remove_body(row[0])
+            self._conn.execute(
+                "INSERT OR REPLACE INTO urls (url, body_path, etag, last_modified, size, used_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (url, body_path, etag, last_modified, size, time.time()),
+            )
+            self._evict(keep=url)
+            self._conn.commit()
+        return body_path
+
+    def _evict(self, keep: str) -> None:
+        """Drop least recently used files until the cache fits in max_bytes (call with the lock held)."""
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM urls").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        rows = self._conn.execute(
+            "SELECT url, body_path, size FROM urls WHERE body_path IS NOT NULL AND url != ? ORDER BY used_at", (keep,)
+        ).fetchall()
+        for url, body_path, size in rows:
+            if total <= self.max_bytes:
+                break
+            self._remove_body(body_path)
+            self._conn.execute("DELETE FROM urls WHERE url = ?", (url,))
+            total -= size
+
+    @staticmethod
+    def _remove_body(body_path: str) -> None:
+        _remove_with_derived(body_path)
+
+    def metrics(self) -> dict:
+        with self._lock:
+            metrics = dict(self.counts)
+            if self._conn is not None:
+                metrics["cached_files"], metrics["cached_bytes"], metrics["known_failures"] = self._conn.execute(
+                    "SELECT COUNT(body_path), COALESCE(SUM(size), 0), COUNT(retry_after) FROM urls"
+                ).fetchone()
+        return metrics
+
+    def close(self) -> None:
+        self._session.close()
+        if self._conn is not None:
+            with self._lock:
+                self._conn.close()
+
+def _remove_with_derived(body_path: str) -> None:
+    # Also whatever ingestion derived from it (<name>.ingested.<ext>)
+    for path in [body_path] + glob.glob(glob.escape(os.path.splitext(body_path)[0]) + ".ingested.*"):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+def fetcher_from_env() -> ImageFetcher:
+    return ImageFetcher(os.environ.get("FETCH_CACHE") or None)
+
+# Fetcher used by get_local_image_path and fetch_image
+fetcher = fetcher_from_env()
+
+def use_fetcher(new_fetcher: ImageFetcher) -> ImageFetcher:
+    """Replace the module's fetcher (e.g. one with a fetch cache). Returns the previous fetcher."""
+    global fetcher
+    previous = fetcher
+    fetcher = new_fetcher
+    return previous
+
+def fetch_image(image_url: str) -> FetchResult:
+    return fetcher.fetch(image_url)
+
+def get_local_image_path(image_url):
+    """Local path for an image_url cell, or None if it cannot be fetched (fetch_image says why)."""
+    return fetch_image(image_url).path
+
+def is_downloaded(local_path: str) -> bool:
+    return (os.path.dirname(os.path.abspath(local_path)) == os.path.abspath(tempfile.gettempdir())
+            and os.path.basename(local_path).startswith(DOWNLOAD_PREFIX))
+
+def remove_download(local_path: str) -> None:
+    """Delete a temporary download and the files ingestion derived from it; other paths are left alone."""
+    if is_downloaded(local_path):
+        _remove_with_derived(local_path)
@@ -1,49 +1,138 @@
 from PIL import Image
 import os
 
+# Ingestion checks an input from its first and last bytes and its header
+# before anything is decoded:
+#
+#   - the format is sniffed from the magic bytes, so extension-less CDN
+#     files are accepted and renamed non-images are not
+#   - inputs larger than MAX_INPUT_BYTES are rejected from os.stat
+#   - JPEG/PNG/GIF/WebP files whose end marker is missing are rejected as
+#     truncated
+#   - PIL's lazy open reads only the header, so decompression bombs (more
+#     than MAX_IMAGE_PIXELS) are rejected before any pixel is allocated
+#
+# JPEG/PNG inputs within MAX_SIZE are passed through untouched (never
+# decoded or re-encoded). Larger ones are downscaled, and the first frame
+# of GIF/WebP inputs is saved as PNG.
+
+MAX_SIZE = (1024, 1024)
+MAX_INPUT_BYTES = int(os.environ.get("INGEST_MAX_BYTES", str(50 * 1024 * 1024)))
+MAX_IMAGE_PIXELS = int(os.environ.get("INGEST_MAX_PIXELS", "50000000"))
+
+# Sniffed format -> file extension
+FORMAT_EXTENSIONS = {"JPEG": ".jpg", "PNG": ".png", "GIF": ".gif", "WEBP": ".webp"}
+# Formats the agents read as they are; the others are converted to PNG
+PASSTHROUGH_FORMATS = ("JPEG", "PNG")
+
+SNIFF_BYTES = 12
+TAIL_BYTES = 1024
+
+def sniff_format(header: bytes) -> str | None:
+    """Image format from the first SNIFF_BYTES of a file (a key of FORMAT_EXTENSIONS), or None."""
+    if header.startswith(b"\xff\xd8\xff"):
+        return "JPEG"
+    if header.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "PNG"
+    if header[:6] in (b"GIF87a", b"GIF89a"):
+        return "GIF"
+    if header[:4] == b"RIFF" and header[8:12] == b"WEBP":
+        return "WEBP"
+    return None
+
+def _is_truncated(img_format: str, header: bytes, tail: bytes, file_size: int) -> bool:
+    """Whether the file stops before its format's end marker."""
+    if img_format == "JPEG":
+        # EOI marker; encoders may append padding or trailers after it
+        return b"\xff\xd9" not in tail
+    if img_format == "PNG":
+        return not tail.endswith(b"IEND\xaeB`\x82")
+    if img_format == "GIF":
+        return not tail.rstrip(b"\x00").endswith(b";")
+    # WEBP: the RIFF header carries the payload size
+    return file_size < int.from_bytes(header[4:8], "little") + 8
+
+def _output_path(image_path: str, img_format: str) -> str:
+    """Where a converted image goes; never the input itself."""
+    extension = FORMAT_EXTENSIONS[img_format]
+    mapped = image_path.replace("/data/", "/output/")
+    if mapped != image_path:
+        return os.path.splitext(mapped)[0] + extension
+    # Temporary downloads too: tools.image_fetch.remove_download deletes this alongside the download
+    return f"{os.path.splitext(image_path)[0]}.ingested{extension}"
+
 def image_preprocessor(image_path: str) -> dict:
     """
     Processes an input image for moderation.
-    - Validates extension.
-    - Resizes to max 1024x1024 if too large.
-    - Returns image metadata and new path.
+    - Sniffs the format (JPEG, PNG, GIF, WebP) from the file's first bytes.
+    - Rejects oversized, truncated and decompression-bomb inputs from the header alone.
+    - Resizes to max 1024x1024 if too large; GIF/WebP are reduced to their first frame.
+    - Returns image metadata and new path (the input itself if nothing had to change).
 
     Returns:
         {
             "status": "success",
             "original_size": (W, H),
             "new_size": (W, H),
-            "format": "JPEG/PNG",
+            "format": "JPEG/PNG/GIF/WEBP",
+            "animated": False,
             "output_path": "path/to/output/image"
         }
     """
 
-    allowed_exts = ['.jpg', '.jpeg', '.png']
-    ext = os.path.splitext(image_path)[1].lower()
-    if ext not in allowed_exts:
-        return {"status": "error", "message": f"Unsupported file type: {ext}"}
-
     try:
-        img = Image.open(image_path)
-        original_size = img.size
-        img_format = img.format
+        file_size = os.path.getsize(image_path)
+        if file_size > MAX_INPUT_BYTES:
+            return {"status": "error", "message": f"Image too large: {file_size} bytes (limit {MAX_INPUT_BYTES})"}
 
-        # Resize if image is too large
-        MAX_SIZE = (1024, 1024)
-        img.thumbnail(MAX_SIZE)
+        with open(image_path, "rb") as f:
+            header = f.read(SNIFF_BYTES)
+            img_format = sniff_format(header)
+            if img_format is None:
+                return {"status": "error", "message": f"Unsupported file type: {os.path.splitext(image_path)[1].lower() or 'unknown'}"}
+            f.seek(max(0, file_size - TAIL_BYTES))
+            tail = f.read()
+        if _is_truncated(img_format, header, tail, file_size):
+            return {"status": "error", "message": f"Truncated {img_format} image"}
 
-        # Save normalized image
-        output_path = image_path.replace("/data/", "/output/")
-        os.makedirs(os.path.dirname(output_path), exist_ok=True)
-        img.save(output_path)
+        # Lazy open: only the header is parsed, and only by the sniffed format's plugin
+        with Image.open(image_path, formats=[img_format]) as img:
+            original_size = img.size
+            width, height = original_size
+            if width * height > MAX_IMAGE_PIXELS:
+                return {"status": "error", "message": f"Image dimensions {width}x{height} exceed {MAX_IMAGE_PIXELS} pixels"}
+            animated = getattr(img, "is_animated", False)
 
-        return {
-            "status": "success",
-            "original_size": original_size,
-            "new_size": img.size,
-            "format": img_format,
-            "output_path": output_path
-        }
+            if img_format in PASSTHROUGH_FORMATS and width <= MAX_SIZE[0] and height <= MAX_SIZE[1]:
+                return {
+                    "status": "success",
+                    "original_size": original_size,
+                    "new_size": original_size,
+                    "format": img_format,
+                    "animated": animated,
+                    "output_path": image_path
+                }
+
+            # Resize if image is too large (JPEGs are decoded at a reduced scale where possible)
+            img.seek(0)
+            img.thumbnail(MAX_SIZE)
+            output_format = img_format if img_format in PASSTHROUGH_FORMATS else "PNG"
+            if output_format == "PNG" and img.mode not in ("1", "L", "LA", "I", "P", "RGB", "RGBA"):
+                img = img.convert("RGBA")
+
+            # Save normalized image
+            output_path = _output_path(image_path, output_format)
+            os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+            img.save(output_path, format=output_format)
+
+            return {
+                "status": "success",
+                "original_size": original_size,
+                "new_size": img.size,
+                "format": img_format,
+                "animated": animated,
+                "output_path": output_path
+            }
 
     except Exception as e:
         return {"status": "error", "message": str(e)}
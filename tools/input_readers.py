@@ -0,0 +1,87 @@
+import csv
+import itertools
+import json
+import os
+from typing import Dict, Iterator, Tuple, Any
+
+# Streaming readers for batch input sheets.
+#
+# Rows are yielded lazily as (index, {column: value}) with a 0-based index
+# over data rows (the header is not counted), so memory stays constant
+# whatever the sheet size. start/stop select an index range, which is how
+# a sheet is sharded across workers (see shard_bounds).
+
+EXCEL_EXTENSIONS = (".xlsx", ".xlsm")
+CSV_EXTENSIONS = (".csv", ".tsv")
+JSONL_EXTENSIONS = (".jsonl", ".ndjson")
+
+def _iter_excel(path: str, sheet_name: str | None) -> Iterator[Dict[str, Any]]:
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        sheet = workbook[sheet_name] if sheet_name else workbook.worksheets[0]
+        rows = sheet.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        columns = [str(name) if name is not None else f"column_{i}" for i, name in enumerate(header)]
+        for values in rows:
+            if values is None or all(value is None for value in values):
+                continue
+            yield dict(zip(columns, values))
+    finally:
+        # Read-only workbooks keep the file open until closed
+        workbook.close()
+
+def _iter_csv(path: str) -> Iterator[Dict[str, Any]]:
+    delimiter = "\t" if path.lower().endswith(".tsv") else ","
+    with open(path, "r", newline="", encoding="utf-8") as f:
+        yield from csv.DictReader(f, delimiter=delimiter)
+
+def _iter_jsonl(path: str) -> Iterator[Dict[str, Any]]:
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+def _iter_records(path: str, sheet_name: str | None) -> Iterator[Dict[str, Any]]:
+    lower = path.lower()
+    if lower.endswith(EXCEL_EXTENSIONS):
+        return _iter_excel(path, sheet_name)
+    if lower.endswith(CSV_EXTENSIONS):
+        return _iter_csv(path)
+    if lower.endswith(JSONL_EXTENSIONS):
+        return _iter_jsonl(path)
+    raise ValueError(f"Unsupported input file: {path} (expected {EXCEL_EXTENSIONS + CSV_EXTENSIONS + JSONL_EXTENSIONS})")
+
+def iter_rows(path: str, sheet_name: str | None = None, start: int = 0, stop: int | None = None) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """Yield (index, row) for data rows start <= index < stop, reading lazily."""
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Input file not found: {path}")
+    records = enumerate(_iter_records(path, sheet_name))
+    yield from itertools.islice(records, start, stop)
+
+def count_rows(path: str, sheet_name: str | None = None) -> int:
+    """Number of data rows, counted in one streaming pass."""
+    return sum(1 for _ in _iter_records(path, sheet_name))
+
+def shard_bounds(total_rows: int, shard_index: int, num_shards: int) -> Tuple[int, int]:
+    """
+    Contiguous [start, stop) index range of one shard; shard sizes differ by
+    at most one row and together cover every row exactly once.
+    """
+    if num_shards < 1 or not 0 <= shard_index < num_shards:
+        raise ValueError(f"Invalid shard {shard_index}/{num_shards}")
+    base, extra = divmod(total_rows, num_shards)
+    start = shard_index * base + min(shard_index, extra)
+    stop = start + base + (1 if shard_index < extra else 0)
+    return start, stop
+
+def parse_shard(spec: str) -> Tuple[int, int]:
+    """Parse "i/n" (0-based shard i of n)."""
+    index, _, count = spec.partition("/")
+    try:
+        return int(index), int(count)
+    except ValueError:
+        raise ValueError(f"Invalid shard spec: {spec!r} (expected 'i/n', e.g. '0/4')")
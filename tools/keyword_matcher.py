@@ -0,0 +1,129 @@
+import re
+from typing import Dict, Iterable, List, Set, Tuple
+
+# Precompiled keyword matcher returning every hit category in one call.
+#
+# With pyahocorasick installed, all phrases of all categories are compiled
+# into a single Aho-Corasick automaton and the text is scanned once; every
+# occurrence of every phrase is reported, so results have exactly the same
+# substring semantics as running `phrase in text` for each phrase.
+#
+# Without it, substring matching falls back to a precomputed flat phrase
+# table (CPython's str.__contains__ outperforms a regex alternation on
+# response-sized texts), and word-boundary matching uses one compiled
+# trie-shaped regex.
+
+try:
+    import ahocorasick
+except ImportError:  # optional dependency
+    ahocorasick = None
+
+BACKENDS = ("auto", "automaton", "regex", "scan")
+
+def _is_word_char(ch: str) -> bool:
+    return ch.isalnum() or ch == "_"
+
+def _trie_pattern(phrases: Iterable[str]) -> str:
+    """Regex matching the longest of phrases at a position, with shared prefixes factored out."""
+    trie: Dict[str, dict] = {}
+    for phrase in phrases:
+        node = trie
+        for ch in phrase:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def build(node: dict) -> str:
+        branches = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        # Greedy optional tail: prefer the longer phrase when one phrase prefixes another
+        return f"(?:{body})?" if "" in node else body
+
+    return build(trie)
+
+class KeywordMatcher:
+    def __init__(self, categories: Iterable[Tuple[str, List[str]]], word_boundaries: bool = False, backend: str = "auto"):
+        """
+        categories: (category, phrases) pairs. A phrase may belong to several categories.
+        word_boundaries: only count phrases that are not part of a longer word.
+        backend: "automaton" (pyahocorasick), "regex", "scan" (substring mode only) or "auto".
+        """
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown matcher backend: {backend} (expected one of {BACKENDS})")
+        if backend == "auto":
+            backend = "automaton" if ahocorasick is not None else ("regex" if word_boundaries else "scan")
+        if backend == "automaton" and ahocorasick is None:
+            raise ImportError("The 'automaton' backend requires pyahocorasick")
+        if backend == "scan" and word_boundaries:
+            raise ValueError("The 'scan' backend does not support word boundaries")
+
+        categories = list(categories)
+        self.categories = [name for name, _ in categories]
+        self.word_boundaries = word_boundaries
+        self.backend = backend
+
+        phrase_categories: Dict[str, Set[str]] = {}
+        for name, phrases in categories:
+            for phrase in phrases:
+                phrase_categories.setdefault(phrase, set()).add(name)
+
+        if backend == "automaton":
+            automaton = ahocorasick.Automaton()
+            for phrase, names in phrase_categories.items():
+                automaton.add_word(phrase, (len(phrase), frozenset(names)))
+            automaton.make_automaton()
+            self._iter = automaton.iter
+        elif backend == "regex":
+            # Lookahead reports the longest phrase at every start position
+            # (overlapping); shorter phrases that prefix it are implied hits.
+            pattern = _trie_pattern(phrase_categories)
+            if word_boundaries:
+                pattern = rf"(?<!\w)(?=({pattern})(?!\w))"
+            else:
+                pattern = rf"(?=({pattern}))"
+            self._findall = re.compile(pattern).findall
+            self._implied = {
+                phrase: frozenset().union(*(
+                    names for other, names in phrase_categories.items()
+                    if phrase.startswith(other) and (
+                        not word_boundaries or len(other) == len(phrase) or not _is_word_char(phrase[len(other)])
+                    )
+                ))
+                for phrase in phrase_categories
+            }
+        else:
+            self._table = tuple((phrase, frozenset(names)) for phrase, names in phrase_categories.items())
+
+    def match(self, text: str) -> Set[str]:
+        """All categories with at least one phrase present in text."""
+        hits = set()
+        if self.backend == "automaton":
+            if not self.word_boundaries:
+                for _, (_, names) in self._iter(text):
+                    hits |= names
+                return hits
+            last = len(text) - 1
+            for end, (length, names) in self._iter(text):
+                start = end - length + 1
+                if (start > 0 and _is_word_char(text[start - 1])) or (end < last and _is_word_char(text[end + 1])):
+                    continue
+                hits |= names
+            return hits
+        if self.backend == "regex":
+            implied = self._implied
+            for phrase in set(self._findall(text)):
+                hits |= implied[phrase]
+            return hits
+        for phrase, names in self._table:
+            if phrase in text:
+                hits |= names
+        return hits
+
+    def first(self, text: str) -> str | None:
+        """The first category (in declaration order) present in text."""
+        hits = self.match(text)
+        for name in self.categories:
+            if name in hits:
+                return name
+        return None
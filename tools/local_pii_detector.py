@@ -0,0 +1,166 @@
+import re
+from typing import Dict, List, Any
+
+# Local PII detection on OCR text.
+#
+# Regexes find candidates and checksums confirm them (Verhoeff for Aadhaar,
+# Luhn for card numbers), so most images can be decided without a Gemini
+# call. Candidates that look like PII but fail validation, or PII context
+# words with nothing confirmed next to them, are reported as ambiguous and
+# left to Gemini.
+
+PII_LABELS = {
+    "aadhaar": "Aadhaar number",
+    "pan": "PAN",
+    "phone": "phone number",
+    "email": "email address",
+    "ifsc": "IFSC",
+    "card": "card number",
+}
+
+# Verhoeff dihedral-group tables
+_VERHOEFF_D = [
+    [0, 1, 2, 3, 4, 5, 6, 7, 8, 9],
+    [1, 2, 3, 4, 0, 6, 7, 8, 9, 5],
+    [2, 3, 4, 0, 1, 7, 8, 9, 5, 6],
+    [3, 4, 0, 1, 2, 8, 9, 5, 6, 7],
+    [4, 0, 1, 2, 3, 9, 5, 6, 7, 8],
+    [5, 9, 8, 7, 6, 0, 4, 3, 2, 1],
+    [6, 5, 9, 8, 7, 1, 0, 4, 3, 2],
+    [7, 6, 5, 9, 8, 2, 1, 0, 4, 3],
+    [8, 7, 6, 5, 9, 3, 2, 1, 0, 4],
+    [9, 8, 7, 6, 5, 4, 3, 2, 1, 0],
+]
+_VERHOEFF_P = [
+    [0, 1, 2, 3, 4, 5, 6, 7, 8, 9],
+    [1, 5, 7, 6, 2, 8, 3, 0, 9, 4],
+    [5, 8, 0, 3, 7, 9, 6, 1, 4, 2],
+    [8, 9, 1, 6, 0, 4, 3, 5, 2, 7],
+    [9, 4, 5, 3, 1, 2, 6, 8, 7, 0],
+    [4, 2, 8, 6, 5, 7, 3, 9, 0, 1],
+    [2, 7, 9, 3, 8, 0, 6, 4, 1, 5],
+    [7, 0, 4, 6, 9, 1, 3, 2, 5, 8],
+]
+
+def verhoeff_valid(digits: str) -> bool:
+    check = 0
+    for i, digit in enumerate(reversed(digits)):
+        check = _VERHOEFF_D[check][_VERHOEFF_P[i % 8][int(digit)]]
+    return check == 0
+
+def luhn_valid(digits: str) -> bool:
+    total = 0
+    for i, digit in enumerate(reversed(digits)):
+        value = int(digit)
+        if i % 2 == 1:
+            value *= 2
+            if value > 9:
+                value -= 9
+        total += value
+    return total % 10 == 0
+
+# Digit runs with optional single space/hyphen separators, e.g. "+91 98765-43210"
+_NUMBER_RE = re.compile(r"(?<![\w+])\+?\d(?:[ -]?\d){7,22}(?![\w])")
+_EMAIL_RE = re.compile(r"\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}\b")
+# Fourth character is the PAN holder type (P=person, C=company, ...)
+_PAN_RE = re.compile(r"\b[A-Z]{3}[PCHFATBLJG][A-Z]\d{4}[A-Z]\b")
+_IFSC_RE = re.compile(r"\b[A-Z]{4}0[A-Z0-9]{6}\b")
+# Words that suggest PII is present even when no candidate validates
+_CONTEXT_RE = re.compile(
+    r"\b(aadhaa?r|pan\s*(?:no|card|number)|a/c|account\s*(?:no|number)|ifsc|dob|date\s+of\s+birth|passport|"
+    r"mobile|phone|whats\s?app|e-?mail|upi)\b",
+    re.IGNORECASE,
+)
+
+def _is_mobile(digits: str) -> bool:
+    return len(digits) == 10 and digits[0] in "6789"
+
+def classify_number(candidate: str) -> str | None:
+    """
+    PII type of a numeric candidate, "ambiguous" for near misses, or None.
+    """
+    digits = re.sub(r"\D", "", candidate)
+    if candidate.startswith("+"):
+        if digits.startswith("91") and _is_mobile(digits[2:]):
+            return "phone"
+        return "ambiguous"
+    if _is_mobile(digits) or (len(digits) == 11 and digits[0] == "0" and _is_mobile(digits[1:])):
+        return "phone"
+    if len(digits) == 12:
+        if digits[0] in "23456789" and verhoeff_valid(digits):
+            return "aadhaar"
+        if digits.startswith("91") and _is_mobile(digits[2:]):
+            return "phone"
+        return "ambiguous"
+    if 13 <= len(digits) <= 19:
+        if luhn_valid(digits):
+            return "card"
+        return "ambiguous" if len(digits) in (15, 16) else None
+    return None
+
+def mask(value: str, keep: int = 4) -> str:
+    """Hide all but the last `keep` alphanumerics, keeping separators."""
+    visible = sum(c.isalnum() for c in value) - keep
+    masked = []
+    for c in value:
+        if c.isalnum() and visible > 0:
+            masked.append("X")
+            visible -= 1
+        else:
+            masked.append(c)
+    return "".join(masked)
+
+def scan_text_for_pii(text: str) -> Dict[str, Any]:
+    """
+    Find PII in text.
+
+    Returns:
+        - matches: confirmed PII as [{"type", "start", "end", "masked"}], in text order
+        - ambiguous: near misses and unmatched context words, same shape
+        - pii_found: True if any match was confirmed
+        - needs_review: True if nothing was confirmed but something ambiguous was seen
+    """
+    matches: List[dict] = []
+    ambiguous: List[dict] = []
+
+    def add(target: List[dict], pii_type: str, m: re.Match) -> None:
+        # Context words are not PII themselves and are kept readable
+        value = m.group() if pii_type == "context" else mask(m.group())
+        target.append({"type": pii_type, "start": m.start(), "end": m.end(), "masked": value})
+
+    for m in _EMAIL_RE.finditer(text):
+        add(matches, "email", m)
+    for m in _PAN_RE.finditer(text):
+        add(matches, "pan", m)
+    for m in _IFSC_RE.finditer(text):
+        add(matches, "ifsc", m)
+    for m in _NUMBER_RE.finditer(text):
+        # Ignore digits inside an email address
+        if any(hit["start"] <= m.start() < hit["end"] for hit in matches):
+            continue
+        pii_type = classify_number(m.group())
+        if pii_type == "ambiguous":
+            add(ambiguous, "number", m)
+        elif pii_type is not None:
+            add(matches, pii_type, m)
+
+    if not matches:
+        for m in _CONTEXT_RE.finditer(text):
+            add(ambiguous, "context", m)
+
+    matches.sort(key=lambda hit: hit["start"])
+    ambiguous.sort(key=lambda hit: hit["start"])
+    return {
+        "matches": matches,
+        "ambiguous": ambiguous,
+        "pii_found": bool(matches),
+        "needs_review": not matches and bool(ambiguous),
+    }
+
+def summarize_matches(matches: List[dict]) -> str:
+    """Response-style summary, e.g. "YES - Personal identifiable information detected locally: phone number (2)"."""
+    counts: Dict[str, int] = {}
+    for hit in matches:
+        counts[hit["type"]] = counts.get(hit["type"], 0) + 1
+    found = ", ".join(f"{PII_LABELS[t]} ({n})" for t, n in counts.items())
+    return f"YES - Personal identifiable information detected locally: {found}"
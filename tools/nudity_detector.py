@@ -4,6 +4,9 @@ import os
 # Load detector once globally
 detector = NudeDetector()
 
+# Images per NudeNet inference call in detect_nudity_batch
+BATCH_SIZE = int(os.environ.get("NUDENET_BATCH_SIZE", "8"))
+
 def detect_nudity(image_path: str) -> dict:
     """
     Uses NudeNet (NudeDetector) to classify an image for nudity.
@@ -15,12 +18,40 @@ def detect_nudity(image_path: str) -> dict:
     """
     if not os.path.exists(image_path):
         return {"status": "error", "message": f"Image not found at: {image_path}"}
+    return _detect(image_path)
+
+def detect_nudity_in_pixels(pixels) -> dict:
+    """detect_nudity on an already decoded BGR uint8 array (as cv2.imread returns), e.g. a shared-memory view."""
+    return _detect(pixels)
 
+def detect_nudity_batch(image_paths: list, batch_size: int = BATCH_SIZE) -> list:
+    """detect_nudity on several images, batch_size per NudeNet inference call; results in order."""
+    results = [None] * len(image_paths)
+    found = []
+    for i, image_path in enumerate(image_paths):
+        if os.path.exists(image_path):
+            found.append(i)
+        else:
+            results[i] = {"status": "error", "message": f"Image not found at: {image_path}"}
+    try:
+        batches = detector.detect_batch([image_paths[i] for i in found], batch_size=batch_size) if found else []
+    except Exception:
+        # One unreadable image fails its whole batch: fall back to one call per image
+        batches = [None] * len(found)
+    for i, detections in zip(found, batches):
+        results[i] = _detect(image_paths[i]) if detections is None else _summarize(detections)
+    return results
+
+def _detect(image) -> dict:
     try:
         # NudeDetector.detect returns a list of dictionaries,
         # where each dictionary represents a detected object.
-        detections = detector.detect(image_path)
+        return _summarize(detector.detect(image))
+    except Exception as e:
+        return {"status": "error", "message": str(e)}
 
+def _summarize(detections: list) -> dict:
+    try:
         unsafe_score = 0.0
         is_unsafe = False
         explanation_parts = []
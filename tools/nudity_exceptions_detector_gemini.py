@@ -4,4 +4,4 @@ def detect_nudity_exceptions_with_gemini(image_path: str) -> dict:
     with open("configs/prompts/nudity_exceptions_prompt.txt", "r") as f:
         prompt = f.read()
 
-    return analyze_image_with_prompt(image_path, prompt)
+    return analyze_image_with_prompt(image_path, prompt, agent="nudity_exceptions")
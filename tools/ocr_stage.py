@@ -0,0 +1,191 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from typing import Dict, List, Any
+
+import numpy as np
+import pytesseract
+import yaml
+from PIL import Image
+
+from tools.gemini_cassette import hash_file
+
+# Optional: Set Tesseract path (Windows only)
+# pytesseract.pytesseract.tesseract_cmd = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
+
+# Fast OCR stage.
+#
+# A cheap edge-density check skips Tesseract on text-free images; images
+# that may contain text are OCR'd as a rescaled, binarized grayscale copy.
+# Results are cached by image content hash and settings, and batches can be
+# spread over a process pool.
+
+DEFAULT_OCR_CONFIG_PATH = "configs/ocr.yaml"
+OCR_CACHE_SIZE = int(os.environ.get("OCR_CACHE_SIZE", "1024"))
+
+# Longest side used for the text-presence check
+ANALYSIS_SIDE = 1024
+
+class OcrConfig:
+    def __init__(self, min_edge_density: float = 0.01, edge_threshold: int = 40, max_side: int | None = 2000,
+                 min_side: int | None = 1000, binarize: bool = True, psm: int = 3, oem: int = 3, lang: str = "eng"):
+        self.min_edge_density = min_edge_density
+        self.edge_threshold = edge_threshold
+        self.max_side = max_side
+        self.min_side = min_side
+        self.binarize = binarize
+        self.psm = psm
+        self.oem = oem
+        self.lang = lang
+
+    @property
+    def tesseract_args(self) -> str:
+        return f"--psm {self.psm} --oem {self.oem}"
+
+    @property
+    def key(self) -> tuple:
+        return (self.min_edge_density, self.edge_threshold, self.max_side, self.min_side,
+                self.binarize, self.psm, self.oem, self.lang)
+
+    def __repr__(self) -> str:
+        return (f"OcrConfig(min_edge_density={self.min_edge_density}, max_side={self.max_side}, "
+                f"min_side={self.min_side}, binarize={self.binarize}, psm={self.psm}, oem={self.oem}, lang={self.lang})")
+
+@lru_cache(maxsize=1)
+def load_ocr_config(path: str = DEFAULT_OCR_CONFIG_PATH) -> OcrConfig:
+    if not os.path.exists(path):
+        return OcrConfig()
+    with open(path, "r") as f:
+        return OcrConfig(**(yaml.safe_load(f) or {}))
+
+def edge_density(gray: Image.Image, threshold: int) -> float:
+    """Fraction of pixels with a horizontal or vertical grey-level step above threshold."""
+    if max(gray.size) > ANALYSIS_SIDE:
+        gray = gray.copy()
+        gray.thumbnail((ANALYSIS_SIDE, ANALYSIS_SIDE), Image.BILINEAR)
+    pixels = np.asarray(gray, dtype=np.int16)
+    if pixels.shape[0] < 2 or pixels.shape[1] < 2:
+        return 0.0
+    dx = np.abs(np.diff(pixels, axis=1))[:-1, :] > threshold
+    dy = np.abs(np.diff(pixels, axis=0))[:, :-1] > threshold
+    return float(np.mean(dx | dy))
+
+def otsu_threshold(pixels: np.ndarray) -> int:
+    hist = np.bincount(pixels.ravel(), minlength=256).astype(np.float64)
+    total = hist.sum()
+    levels = np.arange(256)
+    weight_bg = np.cumsum(hist)
+    weight_fg = total - weight_bg
+    mean_bg = np.cumsum(hist * levels)
+    mean_total = mean_bg[-1]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        between = (mean_total * weight_bg / total - mean_bg) ** 2 / (weight_bg * weight_fg)
+    if np.isnan(between).all():
+        # Single grey level: nothing to separate, split at mid-grey
+        return 127
+    return int(np.nanargmax(between))
+
+def prepare_for_ocr(gray: Image.Image, config: OcrConfig) -> Image.Image:
+    """Rescale to the configured range and optionally binarize."""
+    longest = max(gray.size)
+    if config.max_side and longest > config.max_side:
+        scale = config.max_side / longest
+    elif config.min_side and longest < config.min_side:
+        scale = config.min_side / longest
+    else:
+        scale = 1.0
+    if scale != 1.0:
+        size = (max(1, round(gray.size[0] * scale)), max(1, round(gray.size[1] * scale)))
+        gray = gray.resize(size, Image.LANCZOS if scale < 1 else Image.BICUBIC)
+    if config.binarize:
+        pixels = np.asarray(gray, dtype=np.uint8)
+        gray = Image.fromarray(np.where(pixels > otsu_threshold(pixels), 255, 0).astype(np.uint8))
+    return gray
+
+def run_ocr(image_path: str, config: OcrConfig) -> Dict[str, Any]:
+    """
+    Uncached OCR of one image.
+    Returns {"text", "text_detected", "edge_density", "seconds"}.
+    """
+    start = time.perf_counter()
+    with Image.open(image_path) as img:
+        gray = img.convert("L")
+    density = edge_density(gray, config.edge_threshold)
+    if density < config.min_edge_density:
+        return {"text": "", "text_detected": False, "edge_density": density, "seconds": time.perf_counter() - start}
+
+    text = pytesseract.image_to_string(prepare_for_ocr(gray, config), lang=config.lang, config=config.tesseract_args)
+    return {"text": text, "text_detected": True, "edge_density": density, "seconds": time.perf_counter() - start}
+
+class OcrCache:
+    """Thread-safe LRU of OCR results keyed by (content hash, settings)."""
+
+    def __init__(self, max_entries: int = OCR_CACHE_SIZE):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            result = self._entries.get(key)
+            if result is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return result
+
+    def put(self, key, result: dict) -> None:
+        with self._lock:
+            self._entries[key] = result
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+ocr_cache = OcrCache()
+
+def extract_text(image_path: str, config: OcrConfig | None = None) -> Dict[str, Any]:
+    """Cached run_ocr; the same image content is OCR'd at most once per settings."""
+    config = config or load_ocr_config()
+    key = (hash_file(image_path), config.key)
+    result = ocr_cache.get(key)
+    if result is None:
+        result = run_ocr(image_path, config)
+        ocr_cache.put(key, result)
+    return dict(result)
+
+def extract_texts(image_paths: List[str], config: OcrConfig | None = None, workers: int | None = None) -> Dict[str, Dict[str, Any]]:
+    """
+    OCR a batch in a process pool. Cached images are answered without
+    starting work; duplicates within the batch are OCR'd once.
+    Returns image path -> result.
+    """
+    config = config or load_ocr_config()
+    keys = {path: (hash_file(path), config.key) for path in image_paths}
+    results = {}
+    todo: Dict[tuple, str] = {}
+    for path, key in keys.items():
+        cached = ocr_cache.get(key)
+        if cached is not None:
+            results[path] = dict(cached)
+        else:
+            todo.setdefault(key, path)
+
+    if todo:
+        if workers == 1 or len(todo) == 1:
+            computed = [run_ocr(path, config) for path in todo.values()]
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                computed = list(executor.map(run_ocr, todo.values(), [config] * len(todo)))
+        computed_by_key = dict(zip(todo, computed))
+        for key, result in computed_by_key.items():
+            ocr_cache.put(key, result)
+        for path, key in keys.items():
+            if path not in results:
+                results[path] = dict(computed_by_key[key])
+    return results
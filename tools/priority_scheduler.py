@@ -0,0 +1,235 @@
+import contextlib
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Dict
+
+import yaml
+
+from tools.adaptive_limiter import AdaptiveLimiter
+from tools.deadlines import DeadlineExceeded
+
+# Priority lanes for Gemini calls.
+#
+# Live uploads, ordinary API traffic and sheet backfills share one Gemini
+# quota. Every call waits in its lane's queue (configs/priority_lanes.yaml)
+# and a free slot goes to, in order: a lane below its reserved slots, a lane
+# whose oldest call is past its SLA wait, then the lane next in weighted
+# fair-queueing order. Idle-only lanes (backfill) are served only when no
+# other lane is waiting, and never into the slots other lanes have reserved
+# but are not using, so a new live request always finds one free.
+#
+# Total capacity follows the adaptive limiter when the scheduler wraps one
+# (tools/adaptive_limiter.py), else it is fixed.
+#
+# The lane is per thread, like deadlines: wrap work in lane_scope("backfill");
+# the pipeline passes the caller's lane on to its agent threads.
+#
+# Enable with GEMINI_PRIORITY_LANES=on, or programmatically via
+# tools.gemini_vision.use_scheduler().
+
+DEFAULT_LANES_PATH = "configs/priority_lanes.yaml"
+# Slots without an adaptive limiter
+SCHEDULER_CAPACITY = int(os.environ.get("GEMINI_SCHEDULER_CAPACITY", "8"))
+
+_local = threading.local()
+
+@contextlib.contextmanager
+def lane_scope(lane: str | None):
+    previous = getattr(_local, "lane", None)
+    _local.lane = lane
+    try:
+        yield
+    finally:
+        _local.lane = previous
+
+def current_lane() -> str | None:
+    return getattr(_local, "lane", None)
+
+class Lane:
+    def __init__(self, name: str, weight: float = 1.0, reserved: int = 0,
+                 sla_seconds: float | None = None, idle_only: bool = False):
+        if weight <= 0:
+            raise ValueError(f"Lane {name}: weight must be positive, got {weight}")
+        self.name = name
+        self.weight = weight
+        self.reserved = reserved
+        self.sla_seconds = sla_seconds
+        self.idle_only = idle_only
+        self.queue: deque = deque()
+        self.in_flight = 0
+        self.peak_queue_depth = 0
+        self.dispatched = 0
+        self.waited_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self.sla_misses = 0
+        self.timed_out = 0
+        # Weighted fair queueing: virtual finish time of the lane's last dispatched call
+        self.last_finish = 0.0
+
+    def __repr__(self) -> str:
+        return (f"Lane({self.name}, weight={self.weight}, reserved={self.reserved}, "
+                f"sla_seconds={self.sla_seconds}, idle_only={self.idle_only})")
+
+def load_lanes(path: str = DEFAULT_LANES_PATH) -> tuple[str, Dict[str, Lane]]:
+    """(default lane name, lane name -> Lane) from a lanes config; fresh Lanes on every call."""
+    with open(path, "r") as f:
+        config = yaml.safe_load(f) or {}
+    lanes = {name: Lane(name, **(settings or {})) for name, settings in (config.get("lanes") or {}).items()}
+    default_lane = config.get("default_lane", "standard")
+    if default_lane not in lanes:
+        raise ValueError(f"Default lane {default_lane!r} is not defined in {path}")
+    return default_lane, lanes
+
+class _Ticket:
+    __slots__ = ("enqueued", "granted")
+
+    def __init__(self):
+        self.enqueued = time.monotonic()
+        self.granted = False
+
+class PriorityScheduler:
+    def __init__(self, limiter: AdaptiveLimiter | None = None, capacity: int = SCHEDULER_CAPACITY,
+                 lanes: Dict[str, Lane] | None = None, default_lane: str | None = None,
+                 config_path: str = DEFAULT_LANES_PATH):
+        if lanes is None:
+            config_default, lanes = load_lanes(config_path)
+            default_lane = default_lane or config_default
+        self.limiter = limiter
+        self.capacity = capacity
+        self.lanes = lanes
+        self.default_lane = default_lane or next(iter(lanes))
+        self.in_flight = 0
+        self._virtual_clock = 0.0
+        self._condition = threading.Condition()
+
+    def _capacity(self) -> int:
+        if self.limiter is not None:
+            return max(1, int(self.limiter.limit))
+        return self.capacity
+
+    def _lane(self, name: str | None) -> Lane:
+        name = name or self.default_lane
+        if name not in self.lanes:
+            raise ValueError(f"Unknown priority lane: {name} (expected one of {sorted(self.lanes)})")
+        return self.lanes[name]
+
+    def _next_lane(self, capacity: int) -> Lane | None:
+        waiting = [lane for lane in self.lanes.values() if lane.queue]
+        others_waiting = any(not lane.idle_only for lane in waiting)
+        unused_reservations = sum(
+            max(0, lane.reserved - lane.in_flight) for lane in self.lanes.values() if not lane.idle_only
+        )
+        now = time.monotonic()
+        best, best_rank = None, None
+        for lane in waiting:
+            if lane.idle_only and (others_waiting or capacity - self.in_flight <= unused_reservations):
+                continue
+            overdue = lane.sla_seconds is not None and now - lane.queue[0].enqueued > lane.sla_seconds
+            finish = lane.last_finish + 1.0 / lane.weight
+            rank = (lane.in_flight >= lane.reserved, not overdue, finish)
+            if best_rank is None or rank < best_rank:
+                best, best_rank = lane, rank
+        return best
+
+    def _dispatch(self) -> None:
+        """Hand free slots to waiting calls; caller holds the condition."""
+        capacity = self._capacity()
+        granted = False
+        while self.in_flight < capacity:
+            lane = self._next_lane(capacity)
+            if lane is None:
+                break
+            ticket = lane.queue.popleft()
+            ticket.granted = True
+            granted = True
+            start = lane.last_finish
+            lane.last_finish = start + 1.0 / lane.weight
+            self._virtual_clock = start
+            lane.in_flight += 1
+            lane.dispatched += 1
+            self.in_flight += 1
+            waited = time.monotonic() - ticket.enqueued
+            lane.waited_seconds += waited
+            lane.max_wait_seconds = max(lane.max_wait_seconds, waited)
+            if lane.sla_seconds is not None and waited > lane.sla_seconds:
+                lane.sla_misses += 1
+        if granted:
+            self._condition.notify_all()
+
+    def acquire(self, lane: str | None = None, timeout: float | None = None) -> str:
+        """
+        Wait for a slot in `lane` (the scheduler's default lane for None);
+        returns the lane name to pass to release(). Raises DeadlineExceeded
+        if no slot is granted within `timeout` seconds.
+        """
+        chosen = self._lane(lane)
+        ticket = _Ticket()
+        end = None if timeout is None else ticket.enqueued + timeout
+        with self._condition:
+            if not chosen.queue:
+                # A lane that was idle does not get credit for the time it was idle
+                chosen.last_finish = max(chosen.last_finish, self._virtual_clock)
+            chosen.queue.append(ticket)
+            chosen.peak_queue_depth = max(chosen.peak_queue_depth, len(chosen.queue))
+            self._dispatch()
+            while not ticket.granted:
+                remaining = None if end is None else end - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    chosen.queue.remove(ticket)
+                    chosen.timed_out += 1
+                    # A waiting interactive call may have been holding backfill back
+                    self._dispatch()
+                    raise DeadlineExceeded(f"Image deadline passed while queued in the {chosen.name} lane")
+                self._condition.wait(remaining)
+        return chosen.name
+
+    def release(self, lane: str) -> None:
+        with self._condition:
+            self.lanes[lane].in_flight -= 1
+            self.in_flight -= 1
+            self._dispatch()
+
+    @contextlib.contextmanager
+    def slot(self, lane: str | None = None, timeout: float | None = None):
+        """Hold a lane slot (and the wrapped limiter's slot) around one call; `timeout` covers both waits."""
+        end = None if timeout is None else time.monotonic() + timeout
+        name = self.acquire(lane, timeout)
+        try:
+            if self.limiter is None:
+                yield
+            else:
+                with self.limiter.slot(None if end is None else end - time.monotonic()):
+                    yield
+        finally:
+            self.release(name)
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._condition:
+            metrics = {
+                "capacity": self._capacity(),
+                "in_flight": self.in_flight,
+                "lanes": {
+                    name: {
+                        "queue_depth": len(lane.queue),
+                        "peak_queue_depth": lane.peak_queue_depth,
+                        "in_flight": lane.in_flight,
+                        "dispatched": lane.dispatched,
+                        "mean_wait_seconds": round(lane.waited_seconds / lane.dispatched, 4) if lane.dispatched else 0.0,
+                        "max_wait_seconds": round(lane.max_wait_seconds, 4),
+                        "sla_misses": lane.sla_misses,
+                        "timed_out": lane.timed_out,
+                    }
+                    for name, lane in self.lanes.items()
+                },
+            }
+        if self.limiter is not None:
+            metrics["limiter"] = self.limiter.metrics()
+        return metrics
+
+def scheduler_from_env(limiter: AdaptiveLimiter | None = None) -> PriorityScheduler | None:
+    mode = os.environ.get("GEMINI_PRIORITY_LANES", "off")
+    if mode not in ("on", "off"):
+        raise ValueError(f"Invalid GEMINI_PRIORITY_LANES: {mode} (expected 'on' or 'off')")
+    return PriorityScheduler(limiter) if mode == "on" else None
@@ -0,0 +1,92 @@
+import hashlib
+import json
+import os
+import threading
+from typing import Dict
+
+# Prompt version IDs.
+#
+# Reports store "<agent>@<hash>" instead of the full prompt text; the hash
+# changes whenever the prompt file changes, so stored results stay traceable
+# to the exact prompt version. The texts can be exported once as a catalog
+# and resolved again for a verbose view.
+
+# Prompt files used by each Gemini agent of the central pipeline
+AGENT_PROMPT_FILES = {
+    "nudity_exceptions": "configs/prompts/nudity_exceptions_prompt.txt",
+    "drugs": "configs/prompts/drugs_prompt.txt",
+    "alcohol_smoking": "configs/prompts/alcohol_smoke_prompt.txt",
+    "hate": "configs/prompts/hate_prompt.txt",
+    "pii_text": "configs/prompts/text_pii_vision_prompt.txt",
+    "pii_text_ocr": "configs/prompts/text_pii_prompt.txt",
+    "qr_code": "configs/prompts/qr_prompt.txt",
+}
+
+# Suffix for prompts built from a known prompt plus per-image context (e.g. OCR text)
+CONTEXT_SUFFIX = "+context"
+
+def load_agent_prompts() -> Dict[str, str]:
+    """Map agent name -> static prompt text."""
+    prompts = {}
+    for agent, path in AGENT_PROMPT_FILES.items():
+        if os.path.exists(path):
+            with open(path, "r") as f:
+                prompts[agent] = f.read()
+    try:
+        from tools.violence_detection_gemini import VIOLENCE_PROMPT
+        prompts["violence"] = VIOLENCE_PROMPT
+    except ImportError:
+        pass
+    return prompts
+
+def version_id(name: str, text: str) -> str:
+    return f"{name}@{hashlib.sha256(text.encode('utf-8')).hexdigest()[:12]}"
+
+class PromptRegistry:
+    """Known prompt texts by version ID; unknown prompts are registered on first use."""
+
+    def __init__(self):
+        self._texts: Dict[str, str] = {}
+        self._known: Dict[str, str] | None = None  # agent -> text, loaded lazily
+        self._lock = threading.Lock()
+
+    def _known_prompts(self) -> Dict[str, str]:
+        if self._known is None:
+            known = load_agent_prompts()
+            with self._lock:
+                for name, text in known.items():
+                    self._texts[version_id(name, text)] = text
+                self._known = known
+        return self._known
+
+    def id_for(self, prompt: str) -> str:
+        """Version ID of a prompt; prompts extending a known prompt get CONTEXT_SUFFIX."""
+        known = self._known_prompts()
+        for name, text in known.items():
+            if prompt == text:
+                return version_id(name, text)
+        stripped = prompt.strip()
+        for name, text in known.items():
+            if stripped.startswith(text.strip()):
+                return version_id(name, text) + CONTEXT_SUFFIX
+        prompt_id = version_id("adhoc", prompt)
+        with self._lock:
+            self._texts[prompt_id] = prompt
+        return prompt_id
+
+    def text_for(self, prompt_id: str) -> str | None:
+        """Prompt text for an ID (the base prompt for context IDs), or None if unknown."""
+        self._known_prompts()
+        return self._texts.get(prompt_id.removesuffix(CONTEXT_SUFFIX))
+
+    def catalog(self) -> Dict[str, str]:
+        self._known_prompts()
+        with self._lock:
+            return dict(self._texts)
+
+    def export_catalog(self, output_path: str) -> None:
+        """Write ID -> prompt text as JSON, stored once alongside compact reports."""
+        with open(output_path, "w") as f:
+            json.dump(self.catalog(), f, indent=2)
+
+prompt_registry = PromptRegistry()
@@ -4,4 +4,4 @@ def detect_qr_code_with_gemini(image_path: str) -> dict:
     with open("configs/prompts/qr_prompt.txt", "r") as f:
         prompt = f.read()
 
-    return analyze_image_with_prompt(image_path, prompt)
+    return analyze_image_with_prompt(image_path, prompt, agent="qr_code")
@@ -0,0 +1,65 @@
+from typing import Dict, Any
+
+from tools.prompt_registry import prompt_registry, CONTEXT_SUFFIX
+
+# Compact and verbose report views.
+#
+# Reports are kept compact: agent results reference prompts by version ID,
+# there is no detailed_report copy of agent_results and no confidence
+# reference table. expand_report() rebuilds the verbose view on demand.
+
+CONFIDENCE_TABLE_REFERENCE = {
+    "description": "Confidence Score Reference Table",
+    "table": {
+        "0.9": {"level": "Very High", "meaning": "Agent is extremely confident in detection", "keywords": ["CLEARLY", "DEFINITELY", "CERTAINLY", "OBVIOUSLY", "UNDOUBTEDLY", "WITHOUT DOUBT", "CONFIRMED", "IDENTIFIED"]},
+        "0.8": {"level": "High", "meaning": "Agent detected violation with high certainty", "keywords": ["YES", "VIOLATION", "DETECTED", "FOUND", "PRESENT", "SHOWS", "CONTAINS", "DISPLAYS"]},
+        "0.6": {"level": "Medium-High", "meaning": "Agent thinks violation is likely", "keywords": ["LIKELY", "PROBABLY", "APPEARS", "SEEMS", "INDICATES", "SUGGESTS", "MIGHT BE"]},
+        "0.5": {"level": "Medium", "meaning": "Agent is uncertain or neutral", "keywords": ["No specific confidence indicators found"]},
+        "0.4": {"level": "Medium-Low", "meaning": "Agent is uncertain about detection", "keywords": ["UNCERTAIN", "NOT CLEARLY", "MAYBE", "POSSIBLY", "MIGHT", "COULD BE", "UNSURE"]},
+        "0.1": {"level": "Low", "meaning": "Agent found no violations", "keywords": ["NO", "NOT DETECTED", "CLEAN", "SAFE", "NONE FOUND", "ABSENT", "NOT PRESENT"]},
+        "0.0": {"level": "Error", "meaning": "Agent failed to process", "keywords": ["Agent error or no response"]}
+    },
+    "explanation": {
+        "0.9": "Very High - Strong evidence for decision-making",
+        "0.8": "High - Reliable detection, can be used for automated decisions",
+        "0.6": "Medium-High - Good evidence, may need review",
+        "0.5": "Medium - Neutral evidence, requires human review",
+        "0.4": "Medium-Low - Weak evidence, likely false positive",
+        "0.1": "Low - Strong evidence of safety",
+        "0.0": "Error - No evidence available, manual review required"
+    }
+}
+
+# Sections that only exist in the verbose view
+VERBOSE_SECTIONS = ("detailed_report", "confidence_table_reference")
+
+def compact_report(report: Dict[str, Any]) -> Dict[str, Any]:
+    """Compact view of a report (also converts older reports that embed prompt text)."""
+    compact = {key: value for key, value in report.items() if key not in VERBOSE_SECTIONS}
+    agent_results = {}
+    for agent, result in report.get("agent_results", {}).items():
+        if isinstance(result, dict) and "prompt" in result:
+            result = {key: value for key, value in result.items() if key != "prompt"}
+            prompt = report["agent_results"][agent]["prompt"]
+            result["prompt_id"] = prompt_registry.id_for(prompt) if prompt else None
+        agent_results[agent] = result
+    compact["agent_results"] = agent_results
+    return compact
+
+def expand_report(report: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Verbose view: prompt text next to each prompt_id (the base prompt for
+    "+context" IDs), a detailed_report section and the confidence reference table.
+    """
+    verbose = compact_report(report)
+    agent_results = {}
+    for agent, result in verbose["agent_results"].items():
+        if isinstance(result, dict) and result.get("prompt_id"):
+            result = dict(result, prompt=prompt_registry.text_for(result["prompt_id"]))
+            if result["prompt_id"].endswith(CONTEXT_SUFFIX) and result.get("extracted_text"):
+                result["prompt"] = f"{result['prompt']}\n\nExtracted Text:\n{result['extracted_text']}"
+        agent_results[agent] = result
+    verbose["agent_results"] = agent_results
+    verbose["detailed_report"] = agent_results
+    verbose["confidence_table_reference"] = CONFIDENCE_TABLE_REFERENCE
+    return verbose
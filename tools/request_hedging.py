@@ -0,0 +1,131 @@
+import contextlib
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+from typing import Any, Callable, ContextManager, Dict
+
+# Hedged Gemini requests.
+#
+# If a call has not returned after the given percentile of recent latency
+# for its agent, an identical second call is sent and whichever succeeds
+# first is used; the slower one is left to finish and discarded. Hedges
+# are capped at a fraction of all calls (the budget), so the extra spend is
+# bounded even when the API is slow across the board.
+#
+# With a concurrency limiter or scheduler, each attempt waits for its own
+# slot. The hedge delay and the latency samples start once the first
+# attempt holds its slot: a call that is still queued is not slow, and
+# hedging it would only add load while the limiter is backing off.
+#
+# Enable with GEMINI_HEDGE_PERCENTILE (e.g. 95), or programmatically via
+# tools.gemini_vision.use_hedger().
+
+HEDGE_PERCENTILE = float(os.environ.get("GEMINI_HEDGE_PERCENTILE", "0") or 0)
+# At most this fraction of calls may send a hedge
+HEDGE_BUDGET = float(os.environ.get("GEMINI_HEDGE_BUDGET", "0.05"))
+# Recent successful latencies kept per agent, and how many are needed before hedging
+LATENCY_WINDOW = 200
+MIN_SAMPLES = 20
+
+def _run_in_thread(fn: Callable[[], Any]) -> Future:
+    future: Future = Future()
+
+    def run():
+        try:
+            future.set_result(fn())
+        except BaseException as e:
+            future.set_exception(e)
+
+    threading.Thread(target=run, daemon=True).start()
+    return future
+
+class Hedger:
+    def __init__(self, percentile: float = 95.0, budget: float = HEDGE_BUDGET, window: int = LATENCY_WINDOW, min_samples: int = MIN_SAMPLES):
+        if not 0 < percentile < 100:
+            raise ValueError(f"Invalid hedge percentile: {percentile}")
+        self.percentile = percentile
+        self.budget = budget
+        self.window = window
+        self.min_samples = min_samples
+        self.calls = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self._latencies: Dict[str, deque] = {}
+        self._lock = threading.Lock()
+
+    def record(self, key: str, latency: float) -> None:
+        with self._lock:
+            self._latencies.setdefault(key, deque(maxlen=self.window)).append(latency)
+
+    def hedge_delay(self, key: str) -> float | None:
+        """Seconds to wait before hedging a call for `key`, or None until enough latencies are known."""
+        with self._lock:
+            samples = sorted(self._latencies.get(key, ()))
+        if len(samples) < self.min_samples:
+            return None
+        return samples[min(len(samples) - 1, int(len(samples) * self.percentile / 100.0))]
+
+    def _take_budget(self) -> bool:
+        with self._lock:
+            if self.hedged + 1 > self.budget * self.calls:
+                return False
+            self.hedged += 1
+            return True
+
+    def call(self, fn: Callable[[], Any], key: str = "default",
+             slot: Callable[[], ContextManager] | None = None) -> Any:
+        """
+        fn(), hedged with a second fn() if the first is slow; raises only if
+        every attempt failed. With `slot` (e.g. limiter.slot), each attempt
+        runs inside its own slot() and is timed from when it holds it.
+        """
+        with self._lock:
+            self.calls += 1
+        delay = self.hedge_delay(key)
+        started = threading.Event()
+
+        def timed():
+            with slot() if slot is not None else contextlib.nullcontext():
+                started.set()
+                start = time.perf_counter()
+                result = fn()
+            self.record(key, time.perf_counter() - start)
+            return result
+
+        if delay is None:
+            return timed()
+
+        primary = _run_in_thread(timed)
+        # Also wakes if the primary fails while still waiting for its slot
+        primary.add_done_callback(lambda _: started.set())
+        started.wait()
+        attempts = {primary}
+        done, _ = wait(attempts, timeout=delay)
+        if not done and self._take_budget():
+            attempts.add(_run_in_thread(timed))
+
+        error = None
+        while attempts:
+            done, attempts = wait(attempts, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is not primary:
+                        with self._lock:
+                            self.hedge_wins += 1
+                    return future.result()
+                error = error or future.exception()
+        raise error
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "hedged": self.hedged,
+                "hedge_wins": self.hedge_wins,
+                "hedge_rate": round(self.hedged / self.calls, 4) if self.calls else 0.0,
+            }
+
+def hedger_from_env() -> Hedger | None:
+    return Hedger(HEDGE_PERCENTILE) if HEDGE_PERCENTILE else None
@@ -0,0 +1,71 @@
+from typing import List
+from tools.keyword_matcher import KeywordMatcher
+
+# Keyword tables used to interpret free-text Gemini answers.
+# Kept free of heavy imports so stored reports can be re-scored offline.
+
+# (confidence, indicators) from strongest to weakest; the first level with a hit wins
+CONFIDENCE_LEVELS = [
+    (0.9, ["CLEARLY", "DEFINITELY", "CERTAINLY", "OBVIOUSLY", "UNDOUBTEDLY", "WITHOUT DOUBT", "CONFIRMED", "IDENTIFIED"]),
+    (0.8, ["YES", "VIOLATION", "DETECTED", "FOUND", "PRESENT", "SHOWS", "CONTAINS", "DISPLAYS"]),
+    (0.6, ["LIKELY", "PROBABLY", "APPEARS", "SEEMS", "INDICATES", "SUGGESTS", "MIGHT BE"]),
+    (0.4, ["UNCERTAIN", "NOT CLEARLY", "MAYBE", "POSSIBLY", "MIGHT", "COULD BE", "UNSURE"]),
+    (0.1, ["NO", "NOT DETECTED", "CLEAN", "SAFE", "NONE FOUND", "ABSENT", "NOT PRESENT"]),
+]
+DEFAULT_CONFIDENCE = 0.5
+
+# (violation type, keywords) in report order
+VIOLATION_KEYWORDS = [
+    # Violence types
+    ("blood/gore", ["BLOOD", "WOUND", "GORE", "INJURY"]),
+    ("weapons", ["WEAPON", "GUN", "KNIFE", "EXPLOSIVE"]),
+    ("death/corpses", ["CORPSE", "DEAD", "HANGING", "AUTOPSY"]),
+    ("self-harm", ["SELF-HARM", "CUTTING", "BURNING", "SUICIDAL"]),
+    ("abuse/torture", ["ABUSE", "TORTURE", "CRUELTY"]),
+    # Drugs types
+    ("drugs/paraphernalia", ["DRUG", "PARAPHERNALIA", "SYRINGE", "PIPE"]),
+    # Alcohol/Smoking types
+    ("alcohol", ["ALCOHOL", "BEER", "WINE", "LIQUOR"]),
+    ("smoking", ["SMOKING", "CIGARETTE", "TOBACCO", "VAPE"]),
+    # Hate types
+    ("hate symbols", ["HATE", "SYMBOL", "EXTREMIST", "RACIST"]),
+    # PII types
+    ("personal information", ["PII", "PERSONAL", "IDENTIFIABLE", "PRIVATE"]),
+    ("threatening/abusive text", ["THREAT", "ABUSIVE", "HARASSMENT"]),
+    # QR types
+    ("qr codes", ["QR", "CODE", "BARCODE"]),
+]
+
+# Each table is compiled once into a single-pass matcher
+CONFIDENCE_MATCHER = KeywordMatcher(CONFIDENCE_LEVELS)
+VIOLATION_MATCHER = KeywordMatcher(VIOLATION_KEYWORDS)
+
+def extract_confidence_from_response(response_text: str) -> float:
+    """Enhanced confidence extraction with more sophisticated keyword analysis."""
+    if not response_text:
+        return 0.0
+
+    # Weighted scoring with priority: the strongest level with a hit wins
+    confidence = CONFIDENCE_MATCHER.first(response_text.upper())
+    return DEFAULT_CONFIDENCE if confidence is None else confidence
+
+def calculate_nudity_confidence(nudity_result: dict) -> float:
+    """Use actual NudeNet confidence scores when available."""
+    if nudity_result.get("label") == "unsafe":
+        # Try to extract actual confidence from NudeNet violations
+        violations = nudity_result.get("violations", [])
+        if violations:
+            # Use the highest confidence score from detected violations
+            max_confidence = max(violation.get("score", 0.5) for violation in violations)
+            return max_confidence
+        return 0.9  # Fallback for unsafe without detailed scores
+    else:
+        return 0.1  # Safe content has low confidence for violations
+
+def parse_violation_type(response_text: str) -> List[str]:
+    """Parse violation types from Gemini response."""
+    if not response_text:
+        return []
+
+    hits = VIOLATION_MATCHER.match(response_text.upper())
+    return [violation for violation in VIOLATION_MATCHER.categories if violation in hits]
@@ -0,0 +1,174 @@
+import json
+import os
+from typing import Dict, List, Any
+
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from tools.agent_dag import dag_node_names
+from tools.decision_policy import DecisionPolicy, default_policy
+
+# Columnar sink for moderation reports.
+#
+# Reports are buffered and flushed in row groups to Parquet or Arrow IPC,
+# with violations, per-agent flags, confidences and timings as typed
+# columns, so millions of verdicts can be filtered and aggregated from a
+# memory-mapped file instead of parsing per-image JSON:
+#
+#     with ResultStore("results.parquet") as store:
+#         store.add(run_central_moderation_pipeline(path))
+#     rejected = query_results("results.parquet", decision="Reject")
+
+DEFAULT_ROW_GROUP_SIZE = 10000
+STORE_FORMATS = ("parquet", "arrow")
+ARROW_EXTENSIONS = (".arrow", ".feather", ".ipc")
+
+# Violations added by the pipeline itself rather than by the policy
+PIPELINE_VIOLATIONS = ["image_processing_error", "pipeline_error"]
+
+def format_for_path(path: str) -> str:
+    return "arrow" if path.lower().endswith(ARROW_EXTENSIONS) else "parquet"
+
+def report_schema(agents: List[str], violations: List[str], policy_agents: List[str], keep_agent_results: bool = True) -> pa.Schema:
+    fields = [
+        pa.field("image_path", pa.string()),
+        pa.field("status", pa.string()),
+        pa.field("final_decision", pa.string()),
+        pa.field("violations", pa.list_(pa.string())),
+        pa.field("error_message", pa.string()),
+        pa.field("total_seconds", pa.float64()),
+    ]
+    fields += [pa.field(f"violation.{v}", pa.bool_()) for v in violations]
+    fields += [pa.field(f"flagged.{a}", pa.bool_()) for a in policy_agents]
+    for agent in agents:
+        fields += [
+            pa.field(f"status.{agent}", pa.string()),
+            pa.field(f"confidence.{agent}", pa.float64()),
+            pa.field(f"time.{agent}", pa.float64()),
+        ]
+    if keep_agent_results:
+        # Compact JSON, so stored reports can still be re-decided (redecide_reports.py)
+        fields.append(pa.field("agent_results", pa.string()))
+    return pa.schema(fields)
+
+class ResultStore:
+    """Buffers reports and writes them to Parquet/Arrow IPC one row group at a time."""
+
+    def __init__(self, path: str, format: str | None = None, row_group_size: int = DEFAULT_ROW_GROUP_SIZE,
+                 agents: List[str] | None = None, policy: DecisionPolicy | None = None, keep_agent_results: bool = True):
+        self.path = path
+        self.format = format or format_for_path(path)
+        if self.format not in STORE_FORMATS:
+            raise ValueError(f"Unsupported store format: {self.format} (expected one of {STORE_FORMATS})")
+        self.row_group_size = row_group_size
+        self.policy = policy or default_policy()
+        self.agents = agents or dag_node_names()
+        self.violations = list(dict.fromkeys(self.policy.known_violations() + PIPELINE_VIOLATIONS))
+        self.keep_agent_results = keep_agent_results
+        self.schema = report_schema(self.agents, self.violations, [rule.agent for rule in self.policy.agents], keep_agent_results)
+        self.rows_written = 0
+        self._buffer: Dict[str, list] = {name: [] for name in self.schema.names}
+        self._buffered = 0
+        self._sink = None
+        self._writer = None
+
+    def add(self, report: Dict[str, Any]) -> None:
+        agent_results = report.get("agent_results", {})
+        confidences = report.get("confidence_scores", {})
+        timings = (report.get("timings") or {}).get("agents", {})
+        violations = report.get("violations", [])
+
+        row = {
+            "image_path": report.get("image_path"),
+            "status": report.get("status"),
+            "final_decision": report.get("final_decision"),
+            "violations": list(violations),
+            "error_message": report.get("error_message"),
+            "total_seconds": (report.get("timings") or {}).get("total_seconds"),
+        }
+        for violation in self.violations:
+            row[f"violation.{violation}"] = violation in violations
+        for rule in self.policy.agents:
+            result = agent_results.get(rule.agent)
+            row[f"flagged.{rule.agent}"] = isinstance(result, dict) and rule.is_triggered(result)
+        for agent in self.agents:
+            result = agent_results.get(agent)
+            row[f"status.{agent}"] = result.get("status") if isinstance(result, dict) else None
+            row[f"confidence.{agent}"] = confidences.get(agent)
+            row[f"time.{agent}"] = timings.get(agent)
+        if self.keep_agent_results:
+            row["agent_results"] = json.dumps(agent_results, default=str)
+
+        for name, values in self._buffer.items():
+            values.append(row.get(name))
+        self._buffered += 1
+        if self._buffered >= self.row_group_size:
+            self.flush()
+
+    def _open_writer(self) -> None:
+        if self.format == "parquet":
+            self._writer = pq.ParquetWriter(self.path, self.schema)
+        else:
+            self._sink = pa.OSFile(self.path, "wb")
+            self._writer = pa.ipc.new_file(self._sink, self.schema)
+
+    def flush(self) -> None:
+        """Write buffered reports as one row group / record batch."""
+        if not self._buffered:
+            return
+        table = pa.Table.from_pydict(self._buffer, schema=self.schema)
+        if self._writer is None:
+            self._open_writer()
+        if self.format == "parquet":
+            self._writer.write_table(table, row_group_size=len(table))
+        else:
+            self._writer.write_table(table)
+        self.rows_written += self._buffered
+        self._buffer = {name: [] for name in self.schema.names}
+        self._buffered = 0
+
+    def close(self) -> None:
+        self.flush()
+        if self._writer is None:
+            # No reports: still leave a valid, empty file behind
+            self._open_writer()
+        self._writer.close()
+        if self._sink is not None:
+            self._sink.close()
+        self._writer = None
+        self._sink = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def read_results(path: str, columns: List[str] | None = None) -> pa.Table:
+    """Load a result store, memory-mapped."""
+    if format_for_path(path) == "arrow":
+        with pa.memory_map(path, "r") as source:
+            table = pa.ipc.open_file(source).read_all()
+        return table.select(columns) if columns else table
+    return pq.read_table(path, columns=columns, memory_map=True)
+
+def query_results(path: str, decision: str | None = None, agent: str | None = None,
+                  violation: str | None = None, columns: List[str] | None = None) -> pa.Table:
+    """
+    Filter stored reports by final decision, by an agent whose policy rule
+    triggered (flagged.<agent>) and/or by violation type. Only row groups and
+    columns that are needed are read.
+    """
+    dataset = ds.dataset(path, format="ipc" if format_for_path(path) == "arrow" else "parquet")
+    conditions = []
+    if decision is not None:
+        conditions.append(ds.field("final_decision") == decision)
+    if agent is not None:
+        conditions.append(ds.field(f"flagged.{agent}") == True)
+    if violation is not None:
+        conditions.append(ds.field(f"violation.{violation}") == True)
+    expression = None
+    for condition in conditions:
+        expression = condition if expression is None else expression & condition
+    return dataset.to_table(columns=columns, filter=expression)
@@ -0,0 +1,87 @@
+import threading
+from multiprocessing import shared_memory
+from typing import Any, Callable, Tuple
+
+import cv2
+import numpy as np
+
+# Decoded images in shared memory.
+#
+# The parent decodes an image once into a shared-memory block and hands
+# worker processes a SharedImageRef (block name, shape, dtype: a few dozen
+# bytes to pickle) instead of the pixels. Workers map the block and read the
+# pixels in place (run_on_shared), so the local detectors all see the same
+# buffer and no process holds a private copy.
+#
+# The parent owns the block: retain() once per task that will read it,
+# release() as each task finishes; the last release unlinks it. Workers
+# only open, read and close.
+
+def decode_image(image_path: str) -> np.ndarray:
+    """Decode to BGR uint8, exactly as the local detectors read files (cv2.imread)."""
+    pixels = cv2.imread(image_path, cv2.IMREAD_COLOR)
+    if pixels is None:
+        raise ValueError(f"Could not decode image: {image_path}")
+    return pixels
+
+class SharedImageRef:
+    """Picklable handle to a SharedImage."""
+
+    def __init__(self, name: str, shape: Tuple[int, ...], dtype: str):
+        self.name = name
+        self.shape = tuple(shape)
+        self.dtype = dtype
+
+    def __repr__(self) -> str:
+        return f"SharedImageRef({self.name}, shape={self.shape}, dtype={self.dtype})"
+
+class SharedImage:
+    def __init__(self, pixels: np.ndarray):
+        self._shm = shared_memory.SharedMemory(create=True, size=max(1, pixels.nbytes))
+        view = np.ndarray(pixels.shape, dtype=pixels.dtype, buffer=self._shm.buf)
+        view[...] = pixels
+        del view
+        self.ref = SharedImageRef(self._shm.name, pixels.shape, pixels.dtype.str)
+        self.nbytes = pixels.nbytes
+        self._refs = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_file(cls, image_path: str) -> "SharedImage":
+        return cls(decode_image(image_path))
+
+    def retain(self, count: int = 1) -> None:
+        with self._lock:
+            if self._shm is None:
+                raise RuntimeError(f"Shared image {self.ref.name} was already released")
+            self._refs += count
+
+    def release(self) -> None:
+        """Drop one reference; the last one frees the block."""
+        with self._lock:
+            self._refs -= 1
+            if self._refs > 0 or self._shm is None:
+                return
+            shm, self._shm = self._shm, None
+        shm.close()
+        shm.unlink()
+
+    @property
+    def released(self) -> bool:
+        return self._shm is None
+
+def run_on_shared(ref: SharedImageRef, fn: Callable[[np.ndarray], Any]) -> Any:
+    """
+    fn(pixels) in a worker, where `pixels` is a view of the shared block.
+    fn must treat it as read-only and keep no reference to it (or to views
+    of it) after returning.
+    """
+    shm = shared_memory.SharedMemory(name=ref.name)
+    try:
+        return fn(np.ndarray(ref.shape, dtype=np.dtype(ref.dtype), buffer=shm.buf))
+    finally:
+        try:
+            shm.close()
+        except BufferError:
+            # A view is still alive (e.g. in a traceback); the mapping goes with it
+            pass
@@ -1,22 +1,39 @@
-import pytesseract
-from PIL import Image
 from tools.gemini_vision import analyze_image_with_prompt
+from tools.local_pii_detector import scan_text_for_pii, summarize_matches
+from tools.ocr_stage import extract_text
 
-# Optional: Set Tesseract path (Windows only)
-# pytesseract.pytesseract.tesseract_cmd = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
+# When to ask Gemini about the OCR text:
+#   "ambiguous" - only when the local regex/checksum scan is unsure
+#   "always"    - every image with text (also covers threats/profanity/links)
+ESCALATION_MODES = ("ambiguous", "always")
+
+def detect_text_pii_with_gemini(image_path: str, escalate: str = "ambiguous") -> dict:
+    if escalate not in ESCALATION_MODES:
+        return {"status": "error", "message": f"Invalid escalation mode: {escalate} (expected one of {ESCALATION_MODES})"}
 
-def detect_text_pii_with_gemini(image_path: str) -> dict:
     try:
-        # Extract text using Tesseract
-        text = pytesseract.image_to_string(Image.open(image_path))
+        # Extract text (skips Tesseract on text-free images, cached by image hash)
+        text = extract_text(image_path)["text"]
 
         if not text.strip():
             return {
                 "status": "success",
-                "prompt": "",
+                "prompt_id": None,
                 "response_text": "No readable text found in image."
             }
 
+        # Local regex/checksum scan first; confirmed PII needs no Gemini call
+        scan = scan_text_for_pii(text)
+        if escalate == "ambiguous" and not scan["needs_review"]:
+            return {
+                "status": "success",
+                "prompt_id": None,
+                "response_text": summarize_matches(scan["matches"]) if scan["pii_found"] else "Clean text – no violations.",
+                "extracted_text": text,
+                "pii_matches": scan["matches"],
+                "pii_source": "local"
+            }
+
         # Load Gemini prompt
         with open("configs/prompts/text_pii_prompt.txt", "r") as f:
             prompt = f.read()
@@ -24,10 +41,13 @@ def detect_text_pii_with_gemini(image_path: str) -> dict:
         full_prompt = f"{prompt}\n\nExtracted Text:\n{text}"
 
         # Send to Gemini
-        response = analyze_image_with_prompt(image_path, full_prompt)
+        response = analyze_image_with_prompt(image_path, full_prompt, agent="pii_text_ocr")
 
-        # Include extracted text for reference
+        # Include extracted text and local findings for reference
         response["extracted_text"] = text
+        response["pii_matches"] = scan["matches"]
+        response["pii_ambiguous"] = scan["ambiguous"]
+        response["pii_source"] = "gemini"
         return response
 
     except Exception as e:
@@ -5,7 +5,7 @@ def detect_text_pii_with_gemini_vision(image_path: str) -> dict:
         with open("configs/prompts/text_pii_vision_prompt.txt", "r") as f:
             prompt = f.read()
 
-        return analyze_image_with_prompt(image_path, prompt)
+        return analyze_image_with_prompt(image_path, prompt, agent="pii_text")
 
     except Exception as e:
         return {"status": "error", "message": str(e)}
@@ -0,0 +1,134 @@
+import io
+import os
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Dict, Any
+
+import yaml
+from PIL import Image
+
+# Per-agent image encoding for Gemini uploads.
+#
+# Instead of handing a decoded PIL image to the SDK (which re-encodes it,
+# often as a large PNG, on every call), each agent gets an upload profile
+# from configs/upload_profiles.yaml and the encoded bytes are cached once
+# per (image, profile), so the six category agents share one encode.
+
+DEFAULT_PROFILES_PATH = "configs/upload_profiles.yaml"
+ENCODED_CACHE_SIZE = int(os.environ.get("GEMINI_UPLOAD_CACHE_SIZE", "64"))
+
+MIME_TYPES = {"JPEG": "image/jpeg", "WEBP": "image/webp", "PNG": "image/png"}
+
+class UploadProfile:
+    def __init__(self, max_side: int | None = None, format: str = "JPEG", quality: int = 85):
+        format = format.upper()
+        if format not in MIME_TYPES:
+            raise ValueError(f"Unsupported upload format: {format} (expected one of {sorted(MIME_TYPES)})")
+        self.max_side = max_side
+        self.format = format
+        self.quality = quality
+
+    @property
+    def mime_type(self) -> str:
+        return MIME_TYPES[self.format]
+
+    @property
+    def key(self) -> tuple:
+        return (self.max_side, self.format, self.quality)
+
+    def __repr__(self) -> str:
+        return f"UploadProfile(max_side={self.max_side}, format={self.format}, quality={self.quality})"
+
+@lru_cache(maxsize=1)
+def load_upload_profiles(path: str = DEFAULT_PROFILES_PATH) -> Dict[str, UploadProfile]:
+    """Agent name -> UploadProfile; the "default" entry applies to unlisted agents."""
+    with open(path, "r") as f:
+        config = yaml.safe_load(f) or {}
+    profiles = {"default": UploadProfile(**config.get("default", {}))}
+    for agent, settings in (config.get("agents") or {}).items():
+        profiles[agent] = UploadProfile(**settings)
+    return profiles
+
+def profile_for(agent: str | None) -> UploadProfile:
+    profiles = load_upload_profiles()
+    return profiles.get(agent or "default", profiles["default"])
+
+class EncodedImageCache:
+    """Small thread-safe LRU of encoded upload parts, keyed by file identity and profile."""
+
+    def __init__(self, max_entries: int = ENCODED_CACHE_SIZE):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.bytes_encoded = 0
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            part = self._entries.get(key)
+            if part is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return part
+
+    def put(self, key, part: dict) -> None:
+        with self._lock:
+            self._entries[key] = part
+            self._entries.move_to_end(key)
+            self.bytes_encoded += len(part["data"])
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "bytes_encoded": self.bytes_encoded,
+            }
+
+encoded_cache = EncodedImageCache()
+
+def encode_image(image_path: str, profile: UploadProfile) -> dict:
+    """Encode an image file for upload. Returns {"mime_type": ..., "data": bytes}."""
+    with Image.open(image_path) as img:
+        fits = profile.max_side is None or max(img.size) <= profile.max_side
+        # Already in the target format and size: send the file as-is
+        if fits and img.format == profile.format:
+            with open(image_path, "rb") as f:
+                return {"mime_type": profile.mime_type, "data": f.read()}
+
+        if profile.format == "JPEG" and img.mode in ("RGBA", "LA", "P"):
+            # JPEG has no alpha; flatten onto white like a viewer would
+            rgba = img.convert("RGBA")
+            img = Image.new("RGB", rgba.size, (255, 255, 255))
+            img.paste(rgba, mask=rgba.split()[-1])
+        elif img.mode not in ("RGB", "RGBA", "L"):
+            img = img.convert("RGB")
+        else:
+            img = img.copy()
+
+        if not fits:
+            img.thumbnail((profile.max_side, profile.max_side), Image.LANCZOS)
+
+        buffer = io.BytesIO()
+        if profile.format == "PNG":
+            img.save(buffer, format="PNG")
+        else:
+            img.save(buffer, format=profile.format, quality=profile.quality)
+        return {"mime_type": profile.mime_type, "data": buffer.getvalue()}
+
+def encode_for_upload(image_path: str, profile: UploadProfile) -> dict:
+    """Cached encode_image: each image is encoded at most once per profile."""
+    stat = os.stat(image_path)
+    key = (os.path.abspath(image_path), stat.st_mtime_ns, stat.st_size, profile.key)
+    part = encoded_cache.get(key)
+    if part is None:
+        part = encode_image(image_path, profile)
+        encoded_cache.put(key, part)
+    return part
@@ -1,7 +1,6 @@
 from tools.gemini_vision import analyze_image_with_prompt
 
-def detect_violence_with_gemini(image_path: str) -> dict:
-    prompt = """
+VIOLENCE_PROMPT = """
 You are an expert visual content moderation agent.
 
 Analyze the given image and answer whether it contains any of the following types of visual violations related to violence or harm:
@@ -21,4 +20,6 @@ Your response must be structured as follows:
 
 Be accurate and objective. If uncertain, say "Not clearly identifiable."
 """
-    return analyze_image_with_prompt(image_path, prompt)
+
+def detect_violence_with_gemini(image_path: str) -> dict:
+    return analyze_image_with_prompt(image_path, VIOLENCE_PROMPT, agent="violence")
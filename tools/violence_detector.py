@@ -25,14 +25,20 @@ VIOLENT_KEYWORDS = [
 ]
 
 # Preprocessing
+normalize = transforms.Normalize(
+    mean=[0.485, 0.456, 0.406],
+    std=[0.229, 0.224, 0.225]
+)
 preprocess = transforms.Compose([
     transforms.Resize(256),
     transforms.CenterCrop(224),
     transforms.ToTensor(),
-    transforms.Normalize(
-        mean=[0.485, 0.456, 0.406],
-        std=[0.229, 0.224, 0.225]
-    )
+    normalize
+])
+# The same resize and crop on a uint8 CHW tensor (decoded pixel buffers)
+tensor_preprocess = transforms.Compose([
+    transforms.Resize(256, antialias=True),
+    transforms.CenterCrop(224),
 ])
 
 def detect_violence(image_path: str) -> dict:
@@ -42,37 +48,53 @@ def detect_violence(image_path: str) -> dict:
     try:
         image = Image.open(image_path).convert("RGB")
         input_tensor = preprocess(image).unsqueeze(0)  # Add batch dim
+        return _classify(input_tensor)
+    except Exception as e:
+        return {"status": "error", "message": str(e)}
+
+def detect_violence_in_pixels(pixels) -> dict:
+    """
+    detect_violence on an already decoded BGR uint8 array (as cv2.imread
+    returns), e.g. a shared-memory view. The full-size array is read in
+    place; only the resized 256px copy is converted to RGB floats.
+    """
+    try:
+        image = torch.from_numpy(pixels).permute(2, 0, 1)  # HWC view -> CHW view
+        image = tensor_preprocess(image).flip(0)  # BGR -> RGB
+        input_tensor = normalize(image.float() / 255.0).unsqueeze(0)
+        return _classify(input_tensor)
+    except Exception as e:
+        return {"status": "error", "message": str(e)}
 
-        with torch.no_grad():
-            outputs = model(input_tensor)
+def _classify(input_tensor) -> dict:
+    with torch.no_grad():
+        outputs = model(input_tensor)
 
-        probs = torch.nn.functional.softmax(outputs[0], dim=0)
-        top5 = torch.topk(probs, 5)
+    probs = torch.nn.functional.softmax(outputs[0], dim=0)
+    top5 = torch.topk(probs, 5)
 
-        flagged = []
-        for i in range(top5.indices.size(0)):
-            label = idx_to_labels[top5.indices[i]]
-            prob = round(probs[top5.indices[i]].item(), 2)
-            for keyword in VIOLENT_KEYWORDS:
-                if keyword in label.lower():
-                    flagged.append({"label": label, "score": prob})
-                    break
+    flagged = []
+    for i in range(top5.indices.size(0)):
+        label = idx_to_labels[top5.indices[i]]
+        prob = round(probs[top5.indices[i]].item(), 2)
+        for keyword in VIOLENT_KEYWORDS:
+            if keyword in label.lower():
+                flagged.append({"label": label, "score": prob})
+                break
 
-        if flagged:
-            explanation = f"Detected violence-related content: {', '.join([f['label'] for f in flagged])}"
-            return {
-                "status": "success",
-                "violence": True,
-                "violations": flagged,
-                "explanation": explanation
-            }
-        else:
-            return {
-                "status": "success",
-                "violence": False,
-                "violations": [],
-                "explanation": "No violence-related content detected."
-            }
+    if flagged:
+        explanation = f"Detected violence-related content: {', '.join([f['label'] for f in flagged])}"
+        return {
+            "status": "success",
+            "violence": True,
+            "violations": flagged,
+            "explanation": explanation
+        }
+    else:
+        return {
+            "status": "success",
+            "violence": False,
+            "violations": [],
+            "explanation": "No violence-related content detected."
+        }
 
-    except Exception as e:
-        return {"status": "error", "message": str(e)}
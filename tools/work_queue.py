@@ -0,0 +1,533 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, Iterator, Tuple
+
+from tools.image_fetch import normalize_url
+
+# Work queue for moderating images across many hosts.
+#
+# Producers enqueue image URLs/IDs; workers on any node receive a task,
+# which hides it from other workers for a visibility timeout (extended by a
+# heartbeat while the pipeline runs), moderate it and complete it. A task
+# whose worker dies becomes visible again when its lease runs out; a task
+# that fails or is redelivered max_attempts times moves to the dead letters.
+#
+# Every receive hands out a new receipt, and only the current receipt can
+# complete, retry or extend a task, so a worker whose lease expired cannot
+# overwrite the result of the worker that took over. Completing stores the
+# result and removes the task in one atomic step, keyed by task ID: each
+# task gets exactly one result row no matter how often it was delivered.
+#
+# Backends share receive/complete/fail/extend semantics:
+#   LocalQueueBackend  - in-process, for tests and single-process runs
+#   SQLiteQueueBackend - one file, safe across processes on one host
+#   RedisQueueBackend  - Redis server shared by many hosts (pip install redis)
+# queue_from_url() picks one from memory://, sqlite:///path or redis://host:port/db.
+
+VISIBILITY_TIMEOUT_SECONDS = float(os.environ.get("MODERATION_QUEUE_VISIBILITY_TIMEOUT", "300"))
+MAX_ATTEMPTS = int(os.environ.get("MODERATION_QUEUE_MAX_ATTEMPTS", "3"))
+# Failed tasks become visible again after this many seconds
+RETRY_DELAY_SECONDS = 30.0
+POLL_INTERVAL_SECONDS = 1.0
+DEFAULT_QUEUE_URL = os.environ.get("MODERATION_QUEUE", "sqlite:///data/queue/moderation_queue.sqlite")
+
+class TaskError(Exception):
+    """A task could not be processed; it is retried, then dead-lettered."""
+
+class Task:
+    def __init__(self, task_id: str, payload: str, attempts: int, receipt: str):
+        self.task_id = task_id
+        self.payload = payload
+        self.attempts = attempts
+        self.receipt = receipt
+
+    def __repr__(self) -> str:
+        return f"Task({self.task_id}, payload={self.payload!r}, attempts={self.attempts})"
+
+def task_id_for(payload: str) -> str:
+    """Stable task ID of the normalized URL, so enqueueing the same image twice (however spelled) is a no-op."""
+    return hashlib.sha256(normalize_url(payload).encode("utf-8")).hexdigest()[:32]
+
+def _new_receipt() -> str:
+    return uuid.uuid4().hex
+
+class LocalQueueBackend:
+    """In-process queue with the same semantics as the shared backends."""
+
+    def __init__(self, max_attempts: int = MAX_ATTEMPTS):
+        self.max_attempts = max_attempts
+        self._tasks: Dict[str, Dict[str, Any]] = {}
+        self._results: Dict[str, Tuple[str, Dict[str, Any]]] = {}
+        self._dead: Dict[str, Dict[str, Any]] = {}
+        self._order = 0
+        self._lock = threading.Lock()
+
+    def enqueue(self, payload: str, task_id: str | None = None) -> bool:
+        """Add a task; False if a task with this ID is queued, done or dead."""
+        task_id = task_id or task_id_for(payload)
+        with self._lock:
+            if task_id in self._tasks or task_id in self._results or task_id in self._dead:
+                return False
+            self._order += 1
+            self._tasks[task_id] = {"payload": payload, "attempts": 0, "receipt": None,
+                                    "visible_at": 0.0, "order": self._order, "error": None}
+            return True
+
+    def receive(self, visibility_timeout: float = VISIBILITY_TIMEOUT_SECONDS) -> Task | None:
+        now = time.time()
+        with self._lock:
+            while True:
+                visible = [(t["visible_at"], t["order"], task_id) for task_id, t in self._tasks.items() if t["visible_at"] <= now]
+                if not visible:
+                    return None
+                task_id = min(visible)[2]
+                task = self._tasks[task_id]
+                if task["attempts"] >= self.max_attempts:
+                    # Its last worker never finished it
+                    self._bury(task_id, task["error"] or "Visibility timeout expired on the last attempt")
+                    continue
+                task["attempts"] += 1
+                task["receipt"] = _new_receipt()
+                task["visible_at"] = now + visibility_timeout
+                return Task(task_id, task["payload"], task["attempts"], task["receipt"])
+
+    def _leased(self, task: Task) -> Dict[str, Any] | None:
+        entry = self._tasks.get(task.task_id)
+        return entry if entry is not None and entry["receipt"] == task.receipt else None
+
+    def complete(self, task: Task, result: Dict[str, Any]) -> bool:
+        """Store the result and remove the task; False if this worker no longer holds the lease."""
+        with self._lock:
+            entry = self._leased(task)
+            if entry is None:
+                return False
+            self._results.setdefault(task.task_id, (entry["payload"], result))
+            del self._tasks[task.task_id]
+            return True
+
+    def fail(self, task: Task, error: str, retry_delay: float = RETRY_DELAY_SECONDS) -> bool:
+        """Retry the task after retry_delay, or dead-letter it after max_attempts."""
+        with self._lock:
+            entry = self._leased(task)
+            if entry is None:
+                return False
+            entry["error"] = error
+            if entry["attempts"] >= self.max_attempts:
+                self._bury(task.task_id, error)
+            else:
+                entry["receipt"] = None
+                entry["visible_at"] = time.time() + retry_delay
+            return True
+
+    def extend(self, task: Task, visibility_timeout: float = VISIBILITY_TIMEOUT_SECONDS) -> bool:
+        with self._lock:
+            entry = self._leased(task)
+            if entry is None:
+                return False
+            entry["visible_at"] = time.time() + visibility_timeout
+            return True
+
+    def _bury(self, task_id: str, error: str) -> None:
+        task = self._tasks.pop(task_id)
+        self._dead[task_id] = {"payload": task["payload"], "attempts": task["attempts"], "error": error}
+
+    def stats(self) -> Dict[str, int]:
+        """Task counts; "in_flight" also counts failed tasks waiting out their retry delay."""
+        now = time.time()
+        with self._lock:
+            queued = sum(1 for t in self._tasks.values() if t["visible_at"] <= now)
+            return {"queued": queued, "in_flight": len(self._tasks) - queued,
+                    "done": len(self._results), "dead": len(self._dead)}
+
+    def results(self) -> Iterator[Tuple[str, str, Dict[str, Any]]]:
+        """(task_id, payload, result) for every completed task."""
+        with self._lock:
+            items = list(self._results.items())
+        for task_id, (payload, result) in items:
+            yield task_id, payload, result
+
+    def dead_letters(self) -> Iterator[Tuple[str, str, int, str]]:
+        """(task_id, payload, attempts, error) for every dead-lettered task."""
+        with self._lock:
+            items = list(self._dead.items())
+        for task_id, entry in items:
+            yield task_id, entry["payload"], entry["attempts"], entry["error"]
+
+class SQLiteQueueBackend:
+    """Queue in a SQLite file; every state change is one IMMEDIATE transaction, so processes can share it."""
+
+    def __init__(self, path: str, max_attempts: int = MAX_ATTEMPTS):
+        self.path = path
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30.0, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            """CREATE TABLE IF NOT EXISTS tasks (
+                task_id TEXT PRIMARY KEY,
+                payload TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                receipt TEXT,
+                visible_at REAL NOT NULL,
+                enqueued_at REAL NOT NULL,
+                error TEXT
+            );
+            CREATE INDEX IF NOT EXISTS tasks_visible ON tasks (visible_at, enqueued_at);
+            CREATE TABLE IF NOT EXISTS results (
+                task_id TEXT PRIMARY KEY,
+                payload TEXT NOT NULL,
+                result TEXT NOT NULL,
+                completed_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS dead_letters (
+                task_id TEXT PRIMARY KEY,
+                payload TEXT NOT NULL,
+                attempts INTEGER NOT NULL,
+                error TEXT,
+                failed_at REAL NOT NULL
+            );"""
+        )
+
+    def _transaction(self, fn: Callable[[sqlite3.Connection], Any]) -> Any:
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                value = fn(self._conn)
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+            return value
+
+    def enqueue(self, payload: str, task_id: str | None = None) -> bool:
+        task_id = task_id or task_id_for(payload)
+
+        def add(conn):
+            for table in ("tasks", "results", "dead_letters"):
+                if conn.execute(f"SELECT 1 FROM {table} WHERE task_id = ?", (task_id,)).fetchone():
+                    return False
+            now = time.time()
+            conn.execute("INSERT INTO tasks (task_id, payload, visible_at, enqueued_at) VALUES (?, ?, ?, ?)",
+                         (task_id, payload, 0.0, now))
+            return True
+
+        return self._transaction(add)
+
+    def receive(self, visibility_timeout: float = VISIBILITY_TIMEOUT_SECONDS) -> Task | None:
+        def claim(conn):
+            now = time.time()
+            while True:
+                row = conn.execute(
+                    "SELECT task_id, payload, attempts, error FROM tasks WHERE visible_at <= ? "
+                    "ORDER BY visible_at, enqueued_at LIMIT 1", (now,)
+                ).fetchone()
+                if row is None:
+                    return None
+                task_id, payload, attempts, error = row
+                if attempts >= self.max_attempts:
+                    self._bury(conn, task_id, error or "Visibility timeout expired on the last attempt")
+                    continue
+                receipt = _new_receipt()
+                conn.execute("UPDATE tasks SET attempts = ?, receipt = ?, visible_at = ? WHERE task_id = ?",
+                             (attempts + 1, receipt, now + visibility_timeout, task_id))
+                return Task(task_id, payload, attempts + 1, receipt)
+
+        return self._transaction(claim)
+
+    @staticmethod
+    def _leased(conn, task: Task):
+        return conn.execute("SELECT payload, attempts FROM tasks WHERE task_id = ? AND receipt = ?",
+                            (task.task_id, task.receipt)).fetchone()
+
+    def complete(self, task: Task, result: Dict[str, Any]) -> bool:
+        def finish(conn):
+            row = self._leased(conn, task)
+            if row is None:
+                return False
+            conn.execute("INSERT OR IGNORE INTO results VALUES (?, ?, ?, ?)",
+                         (task.task_id, row[0], json.dumps(result), time.time()))
+            conn.execute("DELETE FROM tasks WHERE task_id = ?", (task.task_id,))
+            return True
+
+        return self._transaction(finish)
+
+    def fail(self, task: Task, error: str, retry_delay: float = RETRY_DELAY_SECONDS) -> bool:
+        def retry(conn):
+            row = self._leased(conn, task)
+            if row is None:
+                return False
+            conn.execute("UPDATE tasks SET error = ? WHERE task_id = ?", (error, task.task_id))
+            if row[1] >= self.max_attempts:
+                self._bury(conn, task.task_id, error)
+            else:
+                conn.execute("UPDATE tasks SET receipt = NULL, visible_at = ? WHERE task_id = ?",
+                             (time.time() + retry_delay, task.task_id))
+            return True
+
+        return self._transaction(retry)
+
+    def extend(self, task: Task, visibility_timeout: float = VISIBILITY_TIMEOUT_SECONDS) -> bool:
+        def renew(conn):
+            return conn.execute("UPDATE tasks SET visible_at = ? WHERE task_id = ? AND receipt = ?",
+                                (time.time() + visibility_timeout, task.task_id, task.receipt)).rowcount == 1
+
+        return self._transaction(renew)
+
+    @staticmethod
+    def _bury(conn, task_id: str, error: str) -> None:
+        conn.execute("INSERT OR REPLACE INTO dead_letters SELECT task_id, payload, attempts, ?, ? FROM tasks WHERE task_id = ?",
+                     (error, time.time(), task_id))
+        conn.execute("DELETE FROM tasks WHERE task_id = ?", (task_id,))
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            now = time.time()
+            count = lambda sql, *args: self._conn.execute(sql, args).fetchone()[0]
+            queued = count("SELECT COUNT(*) FROM tasks WHERE visible_at <= ?", now)
+            return {
+                "queued": queued,
+                "in_flight": count("SELECT COUNT(*) FROM tasks") - queued,
+                "done": count("SELECT COUNT(*) FROM results"),
+                "dead": count("SELECT COUNT(*) FROM dead_letters"),
+            }
+
+    def results(self) -> Iterator[Tuple[str, str, Dict[str, Any]]]:
+        with self._lock:
+            rows = self._conn.execute("SELECT task_id, payload, result FROM results ORDER BY completed_at").fetchall()
+        for task_id, payload, result in rows:
+            yield task_id, payload, json.loads(result)
+
+    def dead_letters(self) -> Iterator[Tuple[str, str, int, str]]:
+        with self._lock:
+            rows = self._conn.execute("SELECT task_id, payload, attempts, error FROM dead_letters ORDER BY failed_at").fetchall()
+        yield from rows
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+# Redis layout under `prefix`: a hash of task JSON, a sorted set of task IDs
+# by the time they become visible, and hashes of results and dead letters.
+# Each state change is one Lua script, so it is atomic on the server.
+_REDIS_ENQUEUE = """
+if redis.call('HEXISTS', KEYS[1], ARGV[1]) == 1 or redis.call('HEXISTS', KEYS[3], ARGV[1]) == 1
+   or redis.call('HEXISTS', KEYS[4], ARGV[1]) == 1 then
+  return 0
+end
+redis.call('HSET', KEYS[1], ARGV[1], ARGV[2])
+redis.call('ZADD', KEYS[2], 0, ARGV[1])
+return 1
+"""
+_REDIS_RECEIVE = """
+while true do
+  local ids = redis.call('ZRANGEBYSCORE', KEYS[2], '-inf', ARGV[1], 'LIMIT', 0, 1)
+  if #ids == 0 then return false end
+  local id = ids[1]
+  local task = cjson.decode(redis.call('HGET', KEYS[1], id))
+  if task.attempts >= tonumber(ARGV[4]) then
+    task.error = task.error or 'Visibility timeout expired on the last attempt'
+    task.receipt = nil
+    redis.call('HSET', KEYS[4], id, cjson.encode(task))
+    redis.call('HDEL', KEYS[1], id)
+    redis.call('ZREM', KEYS[2], id)
+  else
+    task.attempts = task.attempts + 1
+    task.receipt = ARGV[3]
+    redis.call('HSET', KEYS[1], id, cjson.encode(task))
+    redis.call('ZADD', KEYS[2], tonumber(ARGV[1]) + tonumber(ARGV[2]), id)
+    return {id, task.payload, task.attempts}
+  end
+end
+"""
+# KEYS: tasks, visible, results, dead; ARGV: task_id, receipt, ...
+_REDIS_LEASED = """
+local raw = redis.call('HGET', KEYS[1], ARGV[1])
+if not raw then return nil end
+local task = cjson.decode(raw)
+if task.receipt ~= ARGV[2] then return nil end
+return task
+"""
+_REDIS_COMPLETE = "local function leased()" + _REDIS_LEASED + """end
+local task = leased()
+if not task then return 0 end
+redis.call('HSETNX', KEYS[3], ARGV[1], cjson.encode({payload = task.payload, result = ARGV[3]}))
+redis.call('HDEL', KEYS[1], ARGV[1])
+redis.call('ZREM', KEYS[2], ARGV[1])
+return 1
+"""
+_REDIS_FAIL = "local function leased()" + _REDIS_LEASED + """end
+local task = leased()
+if not task then return 0 end
+task.error = ARGV[3]
+task.receipt = nil
+if task.attempts >= tonumber(ARGV[6]) then
+  redis.call('HSET', KEYS[4], ARGV[1], cjson.encode(task))
+  redis.call('HDEL', KEYS[1], ARGV[1])
+  redis.call('ZREM', KEYS[2], ARGV[1])
+else
+  redis.call('HSET', KEYS[1], ARGV[1], cjson.encode(task))
+  redis.call('ZADD', KEYS[2], tonumber(ARGV[4]) + tonumber(ARGV[5]), ARGV[1])
+end
+return 1
+"""
+_REDIS_EXTEND = "local function leased()" + _REDIS_LEASED + """end
+if not leased() then return 0 end
+redis.call('ZADD', KEYS[2], 'XX', tonumber(ARGV[3]) + tonumber(ARGV[4]), ARGV[1])
+return 1
+"""
+
+class RedisQueueBackend:
+    """
+    Queue on a Redis server shared by every node. Visibility uses each
+    client's clock, so keep the nodes' clocks in sync (NTP).
+    """
+
+    def __init__(self, url: str, prefix: str = "moderation", max_attempts: int = MAX_ATTEMPTS):
+        import redis
+
+        self.client = redis.Redis.from_url(url)
+        self.max_attempts = max_attempts
+        self.keys = [f"{prefix}:tasks", f"{prefix}:visible", f"{prefix}:results", f"{prefix}:dead"]
+        self._enqueue = self.client.register_script(_REDIS_ENQUEUE)
+        self._receive = self.client.register_script(_REDIS_RECEIVE)
+        self._complete = self.client.register_script(_REDIS_COMPLETE)
+        self._fail = self.client.register_script(_REDIS_FAIL)
+        self._extend = self.client.register_script(_REDIS_EXTEND)
+
+    def enqueue(self, payload: str, task_id: str | None = None) -> bool:
+        task_id = task_id or task_id_for(payload)
+        task = json.dumps({"payload": payload, "attempts": 0})
+        return bool(self._enqueue(keys=self.keys, args=[task_id, task]))
+
+    def receive(self, visibility_timeout: float = VISIBILITY_TIMEOUT_SECONDS) -> Task | None:
+        receipt = _new_receipt()
+        claimed = self._receive(keys=self.keys, args=[time.time(), visibility_timeout, receipt, self.max_attempts])
+        if not claimed:
+            return None
+        task_id, payload, attempts = claimed
+        return Task(task_id.decode(), payload.decode(), int(attempts), receipt)
+
+    def complete(self, task: Task, result: Dict[str, Any]) -> bool:
+        return bool(self._complete(keys=self.keys, args=[task.task_id, task.receipt, json.dumps(result)]))
+
+    def fail(self, task: Task, error: str, retry_delay: float = RETRY_DELAY_SECONDS) -> bool:
+        return bool(self._fail(keys=self.keys, args=[task.task_id, task.receipt, error, time.time(), retry_delay, self.max_attempts]))
+
+    def extend(self, task: Task, visibility_timeout: float = VISIBILITY_TIMEOUT_SECONDS) -> bool:
+        return bool(self._extend(keys=self.keys, args=[task.task_id, task.receipt, time.time(), visibility_timeout]))
+
+    def stats(self) -> Dict[str, int]:
+        tasks, visible, results, dead = self.keys
+        queued = self.client.zcount(visible, "-inf", time.time())
+        return {"queued": queued, "in_flight": self.client.hlen(tasks) - queued,
+                "done": self.client.hlen(results), "dead": self.client.hlen(dead)}
+
+    def results(self) -> Iterator[Tuple[str, str, Dict[str, Any]]]:
+        for task_id, raw in self.client.hscan_iter(self.keys[2]):
+            entry = json.loads(raw)
+            yield task_id.decode(), entry["payload"], json.loads(entry["result"])
+
+    def dead_letters(self) -> Iterator[Tuple[str, str, int, str]]:
+        for task_id, raw in self.client.hscan_iter(self.keys[3]):
+            entry = json.loads(raw)
+            yield task_id.decode(), entry["payload"], entry["attempts"], entry.get("error")
+
+def queue_from_url(url: str = DEFAULT_QUEUE_URL, max_attempts: int = MAX_ATTEMPTS):
+    if url.startswith("memory://"):
+        return LocalQueueBackend(max_attempts)
+    if url.startswith("sqlite:///"):
+        return SQLiteQueueBackend(url[len("sqlite:///"):], max_attempts)
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisQueueBackend(url, max_attempts=max_attempts)
+    raise ValueError(f"Unsupported queue URL: {url} (expected memory://, sqlite:///path or redis://...)")
+
+class _Heartbeat:
+    """Extends a task's lease every third of the visibility timeout until stopped."""
+
+    def __init__(self, backend, task: Task, visibility_timeout: float):
+        self.lost = False
+        self._stop = threading.Event()
+
+        def beat():
+            while not self._stop.wait(visibility_timeout / 3):
+                if not backend.extend(task, visibility_timeout):
+                    self.lost = True
+                    return
+
+        self._thread = threading.Thread(target=beat, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+def moderate_task(payload: str) -> Dict[str, Any]:
+    """Default task handler: fetch the image (or animation/video) behind `payload` and moderate it."""
+    from tools.frame_moderation import run_frame_moderation
+    from tools.image_fetch import fetch_image, remove_download
+
+    fetch = fetch_image(payload)
+    if not fetch.ok:
+        # A URL in the fetch cache's negative cache fails at once on every retry until its TTL runs out
+        raise TaskError(f"Could not access image {payload} ({fetch.status}: {fetch.error})")
+    local_path = fetch.path
+    try:
+        report = run_frame_moderation(local_path)
+    finally:
+        remove_download(local_path)
+    if report.get("status") == "error":
+        raise TaskError(report.get("error_message") or "Pipeline error")
+    return dict(report, image_path=payload)
+
+def run_worker(
+    backend,
+    handler: Callable[[str], Dict[str, Any]] = moderate_task,
+    visibility_timeout: float = VISIBILITY_TIMEOUT_SECONDS,
+    retry_delay: float = RETRY_DELAY_SECONDS,
+    max_tasks: int | None = None,
+    idle_timeout: float | None = None,
+    poll_interval: float = POLL_INTERVAL_SECONDS,
+) -> Dict[str, int]:
+    """
+    Receive and process tasks until `max_tasks` have been handled or the
+    queue has stayed empty for `idle_timeout` seconds (None: run forever).
+    Handler exceptions retry the task (dead-lettered after max attempts).
+    Returns counts of completed, failed and lost tasks; lost tasks were
+    taken over by another worker after this one's lease expired, and their
+    results were discarded.
+    """
+    stats = {"completed": 0, "failed": 0, "lost": 0}
+    idle_since = time.monotonic()
+    while max_tasks is None or sum(stats.values()) < max_tasks:
+        task = backend.receive(visibility_timeout)
+        if task is None:
+            if idle_timeout is not None and time.monotonic() - idle_since >= idle_timeout:
+                break
+            time.sleep(poll_interval)
+            continue
+        with _Heartbeat(backend, task, visibility_timeout):
+            try:
+                result = handler(task.payload)
+                error = None
+            except Exception as e:
+                error = str(e) or type(e).__name__
+        if error is not None:
+            stats["failed" if backend.fail(task, error, retry_delay) else "lost"] += 1
+            print(f"⚠️ Task {task.task_id} failed (attempt {task.attempts}): {error}")
+        elif backend.complete(task, result):
+            stats["completed"] += 1
+        else:
+            stats["lost"] += 1
+            print(f"⚠️ Lost the lease on task {task.task_id}; its result was discarded")
+        idle_since = time.monotonic()
+    return stats